@@ -1,6 +1,5 @@
 import sys
 import os
-import tempfile
 import json
 
 sys.path.append(os.path.dirname(__file__))
@@ -8,8 +7,8 @@ sys.path.append(os.path.dirname(__file__))
 import streamlit as st
 from dotenv import load_dotenv
 
-from run_route import gerar_rota
-from export_route_kmlcsv import exportar_kml_csv
+from instrumentation import painel_streamlit
+from pipeline import processar_csv, verificacao_salva, salvar_verificacao
 from rag import RouteVerifier
 
 import folium
@@ -74,23 +73,17 @@ if st.sidebar.button("Processar CSV"):
         st.stop()
 
     with st.spinner("Calculando rota…"):
-        # salva CSV temporário
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".csv")
-        tmp.write(arquivo.getbuffer())
-        tmp.flush()
-        tmp.close()
+        # lido direto da memória; mesmo arquivo + mesmas semanas = cache em disco
+        resultado = processar_csv(arquivo.getvalue(), num_semanas=num_semanas)
+        rota_json, full_json = resultado["rota_json"], resultado["full_json"]
+        kml_bytes, csv_bytes = resultado["kml"], resultado["csv"]
 
-        # Passa num_semanas para gerar_rota!
-        df_rota, rota_json, full_json = gerar_rota(tmp.name, num_semanas=num_semanas)
-
-        # validação IA
-        feedback = RouteVerifier().verify(rota_json)
-
-        # gera arquivos para download
-        kml_bytes, csv_bytes = exportar_kml_csv(rota_json)
+        # validação IA em segundo plano: a rota aparece antes da resposta
+        feedback = verificacao_salva(resultado["chave"])
+        feedback_futuro = None if feedback else RouteVerifier().verify_async(rota_json)
 
     # seção de downloads
-    st.success("✨ Pronto! Faça o download:")
+    st.success("✨ Pronto! Faça o download:" + (" (rota reaproveitada)" if resultado["do_cache"] else ""))
     c1, c2, c3 = st.columns(3)
     with c1:
         st.download_button("📥 Baixar rota.csv", csv_bytes, "rota.csv", "text/csv")
@@ -109,11 +102,20 @@ if st.sidebar.button("Processar CSV"):
             "application/json"
         )
 
-    # feedback da IA
+    # feedback da IA (placeholder preenchido quando a verificação terminar)
     st.subheader("🛡️ Verificação IA")
-    st.text(feedback)
+    feedback_slot = st.empty()
 
     # opção de visualizar no mapa
     if st.checkbox("🔍 Visualizar rota no mapa"):
         mapa = build_map(rota_json)
         st_folium(mapa, width=800, height=500)
+
+    if feedback_futuro is not None:
+        with feedback_slot, st.spinner("Verificando rota…"):
+            feedback = feedback_futuro.result()
+        salvar_verificacao(resultado["chave"], feedback)
+    feedback_slot.text(feedback)
+
+# tempos por etapa e chamadas externas deste processo
+painel_streamlit(st)
@@ -0,0 +1,171 @@
+"""
+Roteia as carteiras de vários representantes de uma vez: cada CSV vira uma
+pasta em --saida (rota.json, agenda_full.json, rota.csv, rota.kml e
+metricas.json), processada num pool de processos. Os processos dividem a
+cota do ORS (rate_limit.TokenBucketCompartilhado) e o cache em disco.
+Um arquivo só é refeito se o conteúdo ou os parâmetros mudaram: depois de
+uma queda, rodar de novo continua de onde parou.
+
+    python batch_route.py carteiras/ --saida rotas/ --processos 4
+    python batch_route.py lista.txt --saida rotas/ --solver ortools
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from day_solvers import SOLVERS
+from instrumentation import METRICAS
+from pipeline import chave_entrada, processar_csv
+
+load_dotenv()
+
+MARCADOR = "concluido.json"
+
+
+def listar_entradas(origem: str) -> List[Tuple[str, str]]:
+    """
+    (representante, caminho do CSV) de uma pasta (*.csv) ou de um manifesto
+    (um caminho por linha, relativo ao manifesto; '#' comenta). O nome do
+    representante é o nome do arquivo sem extensão.
+    """
+    if os.path.isdir(origem):
+        caminhos = [os.path.join(origem, f) for f in sorted(os.listdir(origem)) if f.lower().endswith(".csv")]
+    else:
+        base = os.path.dirname(os.path.abspath(origem))
+        with open(origem, encoding="utf-8") as f:
+            linhas = [l.split("#", 1)[0].strip() for l in f]
+        caminhos = [os.path.join(base, l) for l in linhas if l]
+    entradas, vistos = [], {}
+    for c in caminhos:
+        rep = os.path.splitext(os.path.basename(c))[0]
+        if rep in vistos:
+            raise ValueError(f"Representante repetido: {rep!r} ({vistos[rep]} e {c})")
+        vistos[rep] = c
+        entradas.append((rep, c))
+    return entradas
+
+
+def _gravar(path: str, dados: bytes):
+    """Grava via arquivo temporário + rename: nunca deixa um arquivo pela metade."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(dados)
+    os.replace(tmp, path)
+
+
+def _json(obj) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def concluido(pasta: str, k: str) -> bool:
+    """A pasta já tem o resultado da chave `k` (mesmo arquivo, mesmos parâmetros)."""
+    try:
+        with open(os.path.join(pasta, MARCADOR), encoding="utf-8") as f:
+            return json.load(f).get("chave") == k
+    except (OSError, ValueError):
+        return False
+
+
+def processar_rep(rep: str, caminho: str, saida: str, params: Dict,
+                  max_concorrencia: Optional[int] = None, refazer: bool = False) -> Dict:
+    """
+    Roteia uma carteira e grava a pasta do representante. Roda no processo
+    do pool. Só `params` (o que muda a rota) entram na chave de retomada.
+    Com `refazer`, ignora o marcador e o cache do pipeline: roteia de novo.
+    """
+    t = time.perf_counter()
+    pasta = os.path.join(saida, rep)
+    try:
+        with open(caminho, "rb") as f:
+            dados = f.read()
+        k = chave_entrada(dados, **params)
+        if not refazer and concluido(pasta, k):
+            return {"rep": rep, "status": "pulado"}
+        METRICAS.zerar()
+        res = processar_csv(dados, max_concorrencia=max_concorrencia, refazer=refazer, **params)
+        os.makedirs(pasta, exist_ok=True)
+        _gravar(os.path.join(pasta, "rota.json"), _json(res["rota_json"]))
+        _gravar(os.path.join(pasta, "agenda_full.json"), _json(res["full_json"]))
+        _gravar(os.path.join(pasta, "rota.csv"), res["csv"])
+        _gravar(os.path.join(pasta, "rota.kml"), res["kml"])
+        _gravar(os.path.join(pasta, "metricas.json"), METRICAS.para_json().encode("utf-8"))
+        resumo = {
+            "rep": rep,
+            "status": "ok",
+            "visitas": sum(len(d["visitas"]) for d in res["rota_json"]),
+            "s": round(time.perf_counter() - t, 3),
+            "do_cache": res["do_cache"],
+        }
+        # o marcador vai por último: sem ele, a pasta é refeita na próxima rodada
+        _gravar(os.path.join(pasta, MARCADOR), _json({**resumo, "chave": k, "arquivo": os.path.abspath(caminho)}))
+        return resumo
+    except Exception as e:
+        return {"rep": rep, "status": "erro", "erro": f"{type(e).__name__}: {e}",
+                "s": round(time.perf_counter() - t, 3)}
+
+
+def rodar_lote(
+    entradas: List[Tuple[str, str]],
+    saida: str,
+    processos: Optional[int] = None,
+    max_concorrencia: Optional[int] = None,
+    refazer: bool = False,
+    **params
+) -> List[Dict]:
+    """
+    Roteia todas as `entradas` (listar_entradas) em `processos` processos
+    (padrão: todos os núcleos); `params` vão para o gerar_rota e identificam
+    o resultado. Configurações de execução (`processos`, `max_concorrencia`
+    por carteira) ficam fora da chave: mudá-las não refaz o que já está
+    pronto. `refazer` roteia tudo de novo (sem marcador nem cache do
+    pipeline). A cota do ORS é compartilhada por um arquivo em `saida` (ou
+    ORS_LIMITE_COMPARTILHADO).
+    Retorna um resumo por representante, também gravado em <saida>/lote.json.
+    """
+    os.makedirs(saida, exist_ok=True)
+    # herdado pelos processos do pool: limitador_ors() passa a usar o arquivo
+    os.environ.setdefault("ORS_LIMITE_COMPARTILHADO", os.path.join(saida, ".limite_ors.sqlite"))
+    resultados = []
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = [pool.submit(processar_rep, rep, c, saida, params, max_concorrencia, refazer) for rep, c in entradas]
+        for i, fut in enumerate(as_completed(futuros), start=1):
+            r = fut.result()
+            resultados.append(r)
+            detalhe = r.get("erro") or (f"{r['visitas']} visitas, {r['s']}s" if r["status"] == "ok" else "")
+            print(f"[{i}/{len(futuros)}] {r['rep']}: {r['status']} {detalhe}", flush=True)
+    resultados.sort(key=lambda r: r["rep"])
+    _gravar(os.path.join(saida, "lote.json"), _json(resultados))
+    return resultados
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera as rotas de vários representantes em paralelo.")
+    parser.add_argument("origem", help="pasta com os CSVs ou manifesto (um caminho por linha)")
+    parser.add_argument("--saida", default="rotas", help="pasta de saída (uma subpasta por representante)")
+    parser.add_argument("--processos", type=int, default=None, help="carteiras em paralelo (padrão: núcleos)")
+    parser.add_argument("--semanas", type=int, default=2)
+    parser.add_argument("--solver", choices=SOLVERS, default="ors")
+    parser.add_argument("--concorrencia", type=int, default=None,
+                        help="por carteira: chamadas ORS simultâneas / processos dos solvers locais")
+    parser.add_argument("--tempo-dia-ms", type=int, default=1000)
+    parser.add_argument("--refazer", action="store_true",
+                        help="roteia tudo de novo, ignorando os resultados concluídos e o cache do pipeline")
+    args = parser.parse_args()
+
+    entradas = listar_entradas(args.origem)
+    params = {"num_semanas": args.semanas, "solver": args.solver, "tempo_dia_ms": args.tempo_dia_ms}
+    concorrencia = args.concorrencia
+    if concorrencia is None and args.solver != "ors":
+        # as carteiras já ocupam os núcleos: um processo por carteira
+        concorrencia = 1
+    resultados = rodar_lote(entradas, args.saida, args.processos, max_concorrencia=concorrencia,
+                            refazer=args.refazer, **params)
+    contagem = {s: sum(r["status"] == s for r in resultados) for s in ("ok", "pulado", "erro")}
+    print(f"✅ {contagem['ok']} geradas, {contagem['pulado']} já prontas, {contagem['erro']} com erro.")
+    if contagem["erro"]:
+        raise SystemExit(1)
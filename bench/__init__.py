@@ -0,0 +1,4 @@
+"""
+Benchmarks do pipeline de rotas: carteiras sintéticas (bench.sinteticos),
+ORS local (ors_stub) e relatório por etapa (bench.executar).
+"""
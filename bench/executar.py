@@ -0,0 +1,208 @@
+"""
+Mede cada etapa do pipeline em carteiras sintéticas, com o ORS substituído
+pelo servidor local (ors_stub) e sem cache, e grava um relatório JSON
+(tempo, pico de memória, km da rota) para comparar entre commits.
+
+    python -m bench.executar --tamanhos 100,1000,10000 --latencia 0.05
+    python -m bench.executar --comparar bench/resultados/antes.json bench/resultados/depois.json
+
+Tempo: melhor de `--repeticoes` execuções. Memória: pico do tracemalloc numa
+execução à parte (o rastreamento deixa o código mais lento).
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from bench.sinteticos import CENARIOS, caminho_csv  # noqa: E402
+from ors_stub import ORSStub  # noqa: E402
+
+ETAPAS = ("csv", "tour_nn", "melhoria", "matriz", "gerar_rota", "optimize_route",
+          "kml", "kml_parse", "verificacao")
+MAX_MATRIZ = 5000     # n×n int32: acima disso a etapa "matriz" é pulada
+
+
+def _medir(fn, repeticoes: int, memoria: bool):
+    """Executa `fn`; retorna (resultado, melhor tempo em s, pico em MB ou None)."""
+    melhor, res = float("inf"), None
+    for _ in range(max(1, repeticoes)):
+        t = time.perf_counter()
+        res = fn()
+        melhor = min(melhor, time.perf_counter() - t)
+    pico = None
+    if memoria:
+        tracemalloc.start()
+        fn()
+        pico = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return res, melhor, pico
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "?"
+
+
+def bench_cenario(cenario: str, n: int, args, stub: ORSStub) -> list:
+    """Todas as etapas para uma carteira; uma linha de relatório por etapa."""
+    import numpy as np
+    from export_route_kmlcsv import iter_kml
+    from kml_loader import parse_kml
+    from processor.client_table import load_clients
+    from route_checks import AnaliseRota
+    from route_matrix import matriz_metros, trechos_km
+    from route_optimizer import optimize_route
+    from run_route import gerar_rota
+    from spatial_index import rota_vizinho_mais_proximo
+    from tour_improvement import melhorar_rota
+
+    path = caminho_csv(cenario, n, args.dados, args.seed)
+    linhas = []
+
+    def registrar(etapa, fn, km=None, extra=None):
+        if args.etapas and etapa not in args.etapas:
+            return None
+        res, s, pico = _medir(fn, args.repeticoes, not args.sem_memoria)
+        linha = {"cenario": cenario, "n": n, "etapa": etapa, "s": round(s, 4),
+                 "pico_mb": None if pico is None else round(pico, 2),
+                 "km": None if km is None else round(float(km(res)), 2)}
+        if extra:
+            linha.update(extra(res))
+        linhas.append(linha)
+        print(f"{cenario:>9} {n:>6} {etapa:<15} {s:8.3f}s"
+              + ("" if pico is None else f" {pico:9.1f}MB")
+              + ("" if linha["km"] is None else f" {linha['km']:12.1f}km"), flush=True)
+        return res
+
+    def km_tour(route):
+        return trechos_km(tabela.lat[route], tabela.lon[route]).sum()
+
+    tabela = load_clients(path)
+    registrar("csv", lambda: load_clients(path))
+    route = registrar("tour_nn", lambda: rota_vizinho_mais_proximo(tabela.lat, tabela.lon), km=km_tour) \
+        or rota_vizinho_mais_proximo(tabela.lat, tabela.lon)
+    registrar("melhoria", lambda: melhorar_rota(route, tabela.lat, tabela.lon,
+                                                tempo_limite_s=args.tempo_melhoria), km=km_tour)
+    if n <= MAX_MATRIZ:
+        registrar("matriz", lambda: matriz_metros(tabela.lat, tabela.lon))
+
+    def rodar_gerar_rota():
+        antes = sum(stub.chamadas.values())
+        _, rota, _ = gerar_rota(path, num_semanas=args.semanas, solver=args.solver,
+                                tempo_dia_ms=args.tempo_dia_ms)
+        return rota, sum(stub.chamadas.values()) - antes
+
+    res = registrar("gerar_rota", rodar_gerar_rota,
+                    km=lambda r: AnaliseRota(r[0]).km_dia.sum(),
+                    extra=lambda r: {"chamadas_ors": r[1]})
+    rota = res[0] if res else gerar_rota(path, num_semanas=args.semanas, solver="heuristica")[1]
+
+    dia = next((d["visitas"] for d in rota if d["visitas"]), [])[:args.max_dia]
+    pts = [{"id": i, "lat": v["latitude"], "lon": v["longitude"]} for i, v in enumerate(dia)]
+
+    def km_dia(ids):
+        lat = np.array([dia[i]["latitude"] for i in ids + ids[:1]])
+        lon = np.array([dia[i]["longitude"] for i in ids + ids[:1]])
+        return trechos_km(lat, lon).sum()
+
+    if len(pts) >= 3:
+        registrar("optimize_route", lambda: optimize_route(pts, time_limit_ms=args.tempo_dia_ms),
+                  km=km_dia, extra=lambda r: {"clientes": len(pts)})
+    kml = registrar("kml", lambda: b"".join(iter_kml(rota)), extra=lambda b: {"bytes": len(b)}) \
+        or b"".join(iter_kml(rota))
+    registrar("kml_parse", lambda: parse_kml(io.BytesIO(kml)))
+    registrar("verificacao", lambda: AnaliseRota(rota).issues(incluir_outliers=True),
+              extra=lambda issues: {"issues": len(issues)})
+    return linhas
+
+
+def comparar(antes_path: str, depois_path: str):
+    """Tabela lado a lado de dois relatórios (mesmo cenário/n/etapa)."""
+    with open(antes_path, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(depois_path, encoding="utf-8") as f:
+        depois = json.load(f)
+    idx = {(r["cenario"], r["n"], r["etapa"]): r for r in antes["resultados"]}
+    print(f"{antes['meta']['commit']} → {depois['meta']['commit']}")
+    print(f"{'cenário':>9} {'n':>6} {'etapa':<15} {'antes':>9} {'depois':>9} {'razão':>7} {'km antes':>12} {'km depois':>12}")
+    for r in depois["resultados"]:
+        a = idx.get((r["cenario"], r["n"], r["etapa"]))
+        if not a:
+            continue
+        razao = r["s"] / a["s"] if a["s"] else float("nan")
+        km_a = "" if a.get("km") is None else f"{a['km']:.1f}"
+        km_d = "" if r.get("km") is None else f"{r['km']:.1f}"
+        print(f"{r['cenario']:>9} {r['n']:>6} {r['etapa']:<15} {a['s']:9.3f} {r['s']:9.3f} "
+              f"{razao:7.2f} {km_a:>12} {km_d:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de rotas.")
+    parser.add_argument("--cenarios", default=",".join(CENARIOS))
+    parser.add_argument("--tamanhos", default="100,1000,10000",
+                        help="tamanhos das carteiras, separados por vírgula (até 50000)")
+    parser.add_argument("--etapas", default="", help=f"subconjunto de {','.join(ETAPAS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeticoes", type=int, default=1)
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--latencia", type=float, default=0.0, help="latência do ORS falso (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variação da latência (fração)")
+    parser.add_argument("--solver", default="ors", help="solver dos dias no gerar_rota")
+    parser.add_argument("--semanas", type=int, default=2)
+    parser.add_argument("--tempo-melhoria", type=float, default=2.0)
+    parser.add_argument("--tempo-dia-ms", type=int, default=300)
+    parser.add_argument("--max-dia", type=int, default=70, help="clientes no teste do optimize_route")
+    parser.add_argument("--dados", default=os.path.join(RAIZ, "bench", "dados"))
+    parser.add_argument("--saida", default=None, help="relatório JSON (padrão: bench/resultados/<commit>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"))
+    args = parser.parse_args()
+
+    if args.comparar:
+        return comparar(*args.comparar)
+
+    args.etapas = {e for e in args.etapas.split(",") if e}
+    stub = ORSStub(latencia=args.latencia, jitter=args.jitter, seed=args.seed).iniciar()
+    # o pipeline fala com o ORS falso, sem cache e sem limite de cota
+    os.environ["ORS_BASE_URL"] = stub.url
+    os.environ.setdefault("ORS_API_KEY", "bench")
+    os.environ["ORS_CACHE"] = "false"
+    os.environ["ORS_REQ_POR_MIN"] = "1000000"
+
+    resultados = []
+    for cenario in args.cenarios.split(","):
+        for n in (int(x) for x in args.tamanhos.split(",")):
+            resultados += bench_cenario(cenario, n, args, stub)
+
+    commit = _commit()
+    relatorio = {
+        "meta": {
+            "commit": commit,
+            "data": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: (sorted(v) if isinstance(v, set) else v) for k, v in vars(args).items()},
+        },
+        "resultados": resultados,
+    }
+    saida = args.saida or os.path.join(RAIZ, "bench", "resultados", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    print(f"✅ Relatório em {saida}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Carteiras de clientes sintéticas e reprodutíveis (mesma semente → mesmo CSV),
+no formato do run_route (codcli, nomcli, clilatitude, clilongitude).
+
+    python -m bench.sinteticos urbano 10000 --saida bench/dados
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+CENARIOS = ("urbano", "rural", "clusters")
+CENTRO = (-23.55, -46.63)       # São Paulo
+
+
+def _urbano(n, rng):
+    """Capital densa (~25 km de lado), 10% dos clientes no mesmo prédio de outro."""
+    lat = CENTRO[0] + rng.uniform(-0.12, 0.12, n)
+    lon = CENTRO[1] + rng.uniform(-0.12, 0.12, n)
+    dup = np.flatnonzero(rng.random(n) < 0.10)
+    if len(dup) and n > 1:
+        alvo = rng.integers(0, n, len(dup))
+        lat[dup], lon[dup] = lat[alvo], lon[alvo]
+    return lat, lon
+
+
+def _rural(n, rng):
+    """Interior esparso (~300 km de lado)."""
+    lat = CENTRO[0] + rng.uniform(-1.5, 1.5, n)
+    lon = CENTRO[1] + rng.uniform(-1.5, 1.5, n)
+    return lat, lon
+
+
+def _clusters(n, rng, cidades=20):
+    """Cidades de tamanhos desiguais espalhadas numa região (~220 km de lado)."""
+    centros = np.column_stack([CENTRO[0] + rng.uniform(-1, 1, cidades),
+                               CENTRO[1] + rng.uniform(-1, 1, cidades)])
+    cidade = rng.choice(cidades, n, p=rng.dirichlet(np.full(cidades, 0.7)))
+    raio = rng.uniform(0.005, 0.04, cidades)[cidade]
+    lat = centros[cidade, 0] + rng.normal(0, 1, n) * raio
+    lon = centros[cidade, 1] + rng.normal(0, 1, n) * raio
+    return lat, lon
+
+
+_GERADORES = {"urbano": _urbano, "rural": _rural, "clusters": _clusters}
+
+
+def gerar_clientes(cenario: str, n: int, seed: int = 0) -> pd.DataFrame:
+    """DataFrame de `n` clientes do `cenario` (ver CENARIOS)."""
+    if cenario not in _GERADORES:
+        raise ValueError(f"Cenário desconhecido: {cenario!r} (use {CENARIOS})")
+    rng = np.random.default_rng([seed, CENARIOS.index(cenario), n])
+    lat, lon = _GERADORES[cenario](n, rng)
+    return pd.DataFrame({
+        "codcli": np.arange(1, n + 1),
+        "nomcli": [f"Cliente {i}" for i in range(1, n + 1)],
+        "clilatitude": np.round(lat, 7),
+        "clilongitude": np.round(lon, 7),
+    })
+
+
+def caminho_csv(cenario: str, n: int, pasta: str, seed: int = 0) -> str:
+    """Grava o CSV (se ainda não existir) e devolve o caminho."""
+    os.makedirs(pasta, exist_ok=True)
+    path = os.path.join(pasta, f"{cenario}_{n}_s{seed}.csv")
+    if not os.path.exists(path):
+        gerar_clientes(cenario, n, seed).to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera carteiras sintéticas de clientes.")
+    parser.add_argument("cenario", choices=CENARIOS)
+    parser.add_argument("n", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--saida", default=os.path.join(os.path.dirname(__file__), "dados"))
+    args = parser.parse_args()
+    print(caminho_csv(args.cenario, args.n, args.saida, args.seed))
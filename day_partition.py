@@ -0,0 +1,143 @@
+import math
+import numpy as np
+
+from spatial_index import projetar_km, rota_vizinho_mais_proximo
+
+
+def _kmeans_pp(pts, k, rng):
+    """Sementes k-means++ (vetorizado)."""
+    n = len(pts)
+    centros = np.empty((k, 2))
+    centros[0] = pts[rng.integers(n)]
+    d2 = ((pts - centros[0]) ** 2).sum(axis=1)
+    for c in range(1, k):
+        tot = d2.sum()
+        i = rng.choice(n, p=d2 / tot) if tot > 0 else rng.integers(n)
+        centros[c] = pts[i]
+        d2 = np.minimum(d2, ((pts - centros[c]) ** 2).sum(axis=1))
+    return centros
+
+
+def _atribuir_balanceado(D, cap, pesos=None):
+    """
+    Atribui cada ponto a um cluster respeitando a capacidade `cap` (soma dos
+    pesos; sem `pesos`, número de pontos) por cluster.
+    D: n×k distâncias ao quadrado. Os pontos com maior "arrependimento"
+    (diferença entre o melhor e o 2º melhor centro) escolhem primeiro; os que
+    sobram num cluster cheio vão para o próximo centro com vaga.
+    """
+    n, k = D.shape
+    pesos = np.ones(n, dtype=np.int64) if pesos is None else np.asarray(pesos, dtype=np.int64)
+    rotulo = np.full(n, -1, dtype=np.int64)
+    vagas = np.asarray(cap, dtype=np.int64).copy()
+    pref = np.argsort(D, axis=1)                      # n×k, centros em ordem de preferência
+    if k > 1:
+        ds = np.take_along_axis(D, pref[:, :2], axis=1)
+        arrep = ds[:, 1] - ds[:, 0]
+    else:
+        arrep = np.zeros(n)
+    ordem = np.argsort(-arrep, kind="stable")
+    rank = np.zeros(n, dtype=np.int64)                # posição atual em `pref` de cada ponto
+    pendentes = ordem
+    while len(pendentes):
+        alvo = pref[pendentes, rank[pendentes]]
+        sem_vaga = vagas[alvo] <= 0
+        aceitos = np.zeros(len(pendentes), dtype=bool)
+        for c in np.unique(alvo[~sem_vaga]):
+            idx = np.flatnonzero((alvo == c) & ~sem_vaga)              # já em ordem de prioridade
+            idx = idx[np.cumsum(pesos[pendentes[idx]]) <= vagas[c]]
+            aceitos[idx] = True
+            vagas[c] -= pesos[pendentes[idx]].sum()
+        rotulo[pendentes[aceitos]] = alvo[aceitos]
+        pendentes = pendentes[~aceitos]
+        rank[pendentes] += 1
+        # todos os centros preferidos lotaram (não deveria ocorrer com soma(cap) >= n)
+        estourou = rank[pendentes] >= k
+        if estourou.any():
+            livres = np.flatnonzero(vagas > 0)
+            for p in pendentes[estourou]:
+                c = livres[np.argmin(D[p, livres])]
+                rotulo[p] = c
+                vagas[c] -= pesos[p]
+                if vagas[c] <= 0:
+                    livres = livres[livres != c]
+            pendentes = pendentes[~estourou]
+    return rotulo
+
+
+def clusters_balanceados(
+    lats,
+    lons,
+    k: int,
+    max_iter: int = 30,
+    folga: float = 0.0,
+    seed: int = 0,
+    pesos=None
+) -> np.ndarray:
+    """
+    K-means balanceado (capacitado) sobre coordenadas projetadas.
+    Cada cluster recebe no máximo ceil(n/k)*(1+folga) pontos — ou, com
+    `pesos` (ex.: visitas de uma parada agrupada), essa soma de pesos.
+    Sem folga e com pesos unitários, as capacidades somam exatamente n
+    (n % k clusters com ceil(n/k), os demais com floor): os tamanhos
+    diferem em no máximo 1.
+    Retorna o rótulo (0..k-1) de cada ponto.
+    """
+    n = len(lats)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    k = max(1, min(k, n))
+    xs, ys = projetar_km(lats, lons)
+    pts = np.column_stack([xs, ys])
+    rng = np.random.default_rng(seed)
+    total = n if pesos is None else int(np.sum(pesos))
+    if folga == 0 and (pesos is None or np.all(np.asarray(pesos) == 1)):
+        cap = np.full(k, total // k, dtype=np.int64)
+        cap[:total % k] += 1
+    else:
+        cap = np.full(k, math.ceil(math.ceil(total / k) * (1 + folga)), dtype=np.int64)
+
+    centros = _kmeans_pp(pts, k, rng)
+    rotulo = None
+    for _ in range(max_iter):
+        D = ((pts[:, None, :] - centros[None, :, :]) ** 2).sum(axis=2)
+        novo = _atribuir_balanceado(D, cap, pesos)
+        if rotulo is not None and np.array_equal(novo, rotulo):
+            break
+        rotulo = novo
+        cont = np.bincount(rotulo, minlength=k)
+        somas = np.zeros((k, 2))
+        np.add.at(somas, rotulo, pts)
+        ok = cont > 0
+        centros[ok] = somas[ok] / cont[ok, None]
+    return rotulo
+
+
+def particionar_dias(lats, lons, route, dias: int, **kwargs) -> list[list[int]]:
+    """
+    Divide os clientes em `dias` grupos geográficos compactos e de tamanho
+    equilibrado. Os dias são ordenados pela posição média dos seus clientes
+    na rota global `route`, e cada dia é sequenciado de forma independente
+    (vizinho mais próximo a partir do cliente que vem primeiro na rota global).
+    Retorna `dias` listas de índices (dias vazios quando há menos clientes).
+    """
+    n = len(route)
+    if n == 0:
+        return [[] for _ in range(dias)]
+    rotulo = clusters_balanceados(lats, lons, dias, **kwargs)
+    pos = np.empty(n, dtype=np.int64)
+    pos[np.asarray(route)] = np.arange(n)
+
+    k = int(rotulo.max()) + 1
+    cont = np.bincount(rotulo, minlength=k)
+    media = np.bincount(rotulo, weights=pos, minlength=k) / np.maximum(cont, 1)
+    ordem_dias = np.argsort(media, kind="stable")
+
+    slices = []
+    for c in ordem_dias:
+        membros = np.flatnonzero(rotulo == c)
+        membros = membros[np.argsort(pos[membros], kind="stable")]
+        ordem = rota_vizinho_mais_proximo(np.asarray(lats)[membros], np.asarray(lons)[membros])
+        slices.append(membros[ordem].tolist())
+    slices += [[] for _ in range(dias - len(slices))]
+    return slices
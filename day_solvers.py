@@ -0,0 +1,286 @@
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+from openrouteservice import Client as ORSClient
+from openrouteservice.optimization import Job, Vehicle
+
+from ors_cache import com_cache
+from day_partition import clusters_balanceados
+from jornada import SERVICO_PADRAO_S, jornada_s
+from rate_limit import TokenBucket, limitador_ors
+from route_matrix import VELOCIDADE_KMH, trechos_km
+from spatial_index import projetar_km, rota_vizinho_mais_proximo
+from tour_improvement import melhorar_rota
+
+SOLVERS = ("ors", "ortools", "heuristica")
+ORS_MAX_JOBS = 70        # limite de jobs por chamada do ORS Optimization (plano público)
+ORS_PERFIL = "driving-car"
+
+
+def criar_cliente_ors() -> ORSClient:
+    """
+    Cliente ORS (com cache persistente) a partir do .env. ORS_BASE_URL
+    permite apontar para um servidor local (ex.: ors_stub.py) em testes.
+    """
+    base_url = os.getenv("ORS_BASE_URL")
+    if base_url:
+        return com_cache(ORSClient(key=os.getenv("ORS_API_KEY"), base_url=base_url.rstrip("/")))
+    return com_cache(ORSClient(key=os.getenv("ORS_API_KEY")))
+
+
+def resolver_dia_ors(ors, vid: int, day: List[int], clientes: List[Dict],
+                     inicio: Optional[int] = None, fim: Optional[int] = None,
+                     janela: Optional[Tuple[int, int]] = None) -> List[int]:
+    """
+    Ordena os clientes de um dia (índices em `clientes`) com o ORS
+    Optimization. Retorna os índices na ordem de visita. Um cliente pode
+    trazer "servico" (s) — ex.: paradas agrupadas somam o dos seus membros —
+    e "janela" ([abre, fecha], s desde 0h); o veículo trabalha na jornada
+    do .env (jornada_s). Jobs que o ORS não consegue encaixar na jornada
+    vão para o fim do dia (vizinho mais próximo a partir do último), para
+    nenhum cliente sumir da rota.
+    Sem `inicio`/`fim` o veículo sai e volta ao primeiro cliente do dia;
+    com eles, parte da coordenada do cliente `inicio` e termina na de `fim`
+    (usado nos trechos de um dia dividido). `janela` substitui a jornada
+    como horário do veículo (a fatia da jornada de cada trecho).
+    """
+    if not day:
+        return []
+    # criar jobs
+    jobs = [
+        Job(
+            id=client_idx+1,
+            service=clientes[client_idx].get("servico", SERVICO_PADRAO_S),
+            amount=[1],
+            location=(clientes[client_idx]["longitude"], clientes[client_idx]["latitude"]),
+            time_windows=[list(clientes[client_idx]["janela"])] if clientes[client_idx].get("janela") else None
+        )
+        for client_idx in day
+    ]
+    # veículo único
+    depot = (clientes[day[0]]["longitude"], clientes[day[0]]["latitude"])
+    if inicio is not None:
+        depot = (clientes[inicio]["longitude"], clientes[inicio]["latitude"])
+    destino = depot
+    if fim is not None:
+        destino = (clientes[fim]["longitude"], clientes[fim]["latitude"])
+    vehicle = Vehicle(
+        id=vid,
+        profile=ORS_PERFIL,
+        start=depot,
+        end=destino,
+        capacity=[len(jobs)],
+        time_window=list(janela or jornada_s())
+    )
+
+    res = ors.optimization(jobs=jobs, vehicles=[vehicle])
+
+    # Extrai lista de job-ids dos steps (type=="job"); os não atendidos no fim
+    steps = res["routes"][0].get("steps", []) if res.get("routes") else []
+    ordem = [s["job"] - 1 for s in steps if s.get("type") == "job"]
+    return _anexar_restantes(ordem, [u["id"] - 1 for u in res.get("unassigned", [])], clientes)
+
+
+def _anexar_restantes(ordem: List[int], restantes: List[int], clientes: List[Dict]) -> List[int]:
+    """Acrescenta `restantes` ao fim de `ordem`, por vizinho mais próximo a partir do último."""
+    if not restantes:
+        return ordem
+    pts = ordem[-1:] + restantes
+    seq = rota_vizinho_mais_proximo([clientes[i]["latitude"] for i in pts],
+                                    [clientes[i]["longitude"] for i in pts])
+    if ordem:
+        seq = seq[1:]
+    return ordem + [pts[k] for k in seq]
+
+
+class Trecho(NamedTuple):
+    """Sub-problema de um dia dividido: entra por `entrada`, sai por `saida`."""
+    jobs: List[int]
+    entrada: int
+    saida: Optional[int]    # None: o último trecho volta ao início do dia
+    fim: int                # cliente cuja coordenada é o destino do veículo
+
+
+def dividir_dia(day: List[int], clientes: List[Dict], max_jobs: int) -> List[Trecho]:
+    """
+    Divide um dia com mais de `max_jobs` clientes em grupos geográficos
+    (k-means balanceado) de até `max_jobs`. Os grupos são encadeados por
+    vizinho mais próximo entre centroides, a partir do grupo do primeiro
+    cliente do dia; entre grupos vizinhos, a saída de um e a entrada do
+    próximo são o par de clientes mais próximo. Cada trecho pode então ser
+    resolvido de forma independente (e em paralelo).
+    """
+    lats = np.array([clientes[i]["latitude"] for i in day])
+    lons = np.array([clientes[i]["longitude"] for i in day])
+    k = math.ceil(len(day) / max_jobs)
+    rotulo = clusters_balanceados(lats, lons, k)
+    k = int(rotulo.max()) + 1
+    grupos = [np.flatnonzero(rotulo == c) for c in range(k)]
+
+    cont = np.bincount(rotulo, minlength=k)
+    c_lat = np.bincount(rotulo, weights=lats, minlength=k) / cont
+    c_lon = np.bincount(rotulo, weights=lons, minlength=k) / cont
+    ordem = rota_vizinho_mais_proximo(c_lat, c_lon, inicio=int(rotulo[0]))
+
+    xs, ys = projetar_km(lats, lons)
+    pts = np.column_stack([xs, ys])
+    entradas = [0]
+    saidas = []
+    for a, b in zip(ordem, ordem[1:]):
+        cand = grupos[a][grupos[a] != entradas[-1]]
+        if not len(cand):                       # grupo de um só cliente
+            cand = grupos[a]
+        dist, viz = cKDTree(pts[grupos[b]]).query(pts[cand])
+        m = int(np.argmin(dist))
+        saidas.append(int(cand[m]))
+        entradas.append(int(grupos[b][viz[m]]))
+    saidas.append(None)
+
+    trechos = []
+    for c, ent, sai in zip(ordem, entradas, saidas):
+        meio = [day[i] for i in grupos[c] if i != ent and i != sai]
+        trechos.append(Trecho(
+            meio, day[ent],
+            None if sai is None else day[sai],
+            day[0] if sai is None else day[sai]
+        ))
+    return trechos
+
+
+def janelas_trechos(trechos: List[Trecho], clientes: List[Dict],
+                    jornada: Optional[Tuple[int, int]] = None) -> List[Tuple[int, int]]:
+    """
+    Fatia a jornada entre os trechos de um dia dividido, em sequência e
+    proporcional à carga estimada de cada um: atendimento dos seus clientes
+    (entrada e saída incluídas) + deslocamento do vizinho mais próximo da
+    entrada ao destino, a VELOCIDADE_KMH. Assim o dia costurado cabe na
+    jornada em vez de cada trecho ganhar a jornada inteira.
+    """
+    ini, fim = jornada or jornada_s()
+    cargas = []
+    for t in trechos:
+        pts = [t.entrada] + t.jobs + [t.fim]
+        lats = [clientes[i]["latitude"] for i in pts]
+        lons = [clientes[i]["longitude"] for i in pts]
+        ordem = rota_vizinho_mais_proximo(lats[:-1], lons[:-1]) + [len(pts) - 1]
+        viagem = trechos_km(np.take(lats, ordem), np.take(lons, ordem)).sum() / VELOCIDADE_KMH * 3600
+        atendidos = [t.entrada] + t.jobs + ([t.saida] if t.saida not in (None, t.entrada) else [])
+        cargas.append(viagem + sum(clientes[i].get("servico", SERVICO_PADRAO_S) for i in atendidos))
+    total = sum(cargas) or 1.0
+    limites = [ini + round((fim - ini) * c / total) for c in np.cumsum([0.0] + cargas)]
+    limites[-1] = fim
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def costurar(trechos: List[Trecho], ordens: List[List[int]]) -> List[int]:
+    """Junta as ordens dos trechos: entrada, miolo resolvido, saída."""
+    rota = []
+    for t, ordem in zip(trechos, ordens):
+        rota.append(t.entrada)
+        rota += ordem
+        if t.saida is not None and t.saida != t.entrada:
+            rota.append(t.saida)
+    return rota
+
+
+def resolver_dias_ors(ors, slices: List[List[int]], clientes: List[Dict],
+                      max_concorrencia: Optional[int] = None,
+                      limitador: Optional[TokenBucket] = None,
+                      max_jobs: Optional[int] = None) -> List[List[int]]:
+    """
+    Resolve todos os dias em paralelo (no máximo `max_concorrencia` chamadas
+    simultâneas, respeitando o token-bucket) e devolve as ordens na mesma
+    ordem de `slices`. Dias com mais de `max_jobs` clientes (padrão:
+    ORS_MAX_JOBS) são divididos em trechos (dividir_dia), cada um com a sua
+    fatia da jornada (janelas_trechos), resolvidos no mesmo pool e costurados.
+    """
+    max_concorrencia = max_concorrencia or int(os.getenv("ORS_MAX_CONCORRENCIA", 4))
+    max_jobs = max_jobs or int(os.getenv("ORS_MAX_JOBS", ORS_MAX_JOBS))
+    # a cota só é gasta nas idas à rede (com_cache): dias em cache não esperam
+    ors = com_cache(ors, limitador or limitador_ors())
+    with ThreadPoolExecutor(max_workers=max_concorrencia) as pool:
+        planos = []
+        for vid, day in enumerate(slices, start=1):
+            if len(day) <= max_jobs:
+                planos.append((None, pool.submit(resolver_dia_ors, ors, vid, day, clientes)))
+                continue
+            trechos = dividir_dia(day, clientes, max_jobs)
+            planos.append((trechos, [
+                pool.submit(resolver_dia_ors, ors, vid, t.jobs, clientes, t.entrada, t.fim, janela)
+                for t, janela in zip(trechos, janelas_trechos(trechos, clientes))
+            ]))
+        return [
+            futuros.result() if trechos is None else costurar(trechos, [f.result() for f in futuros])
+            for trechos, futuros in planos
+        ]
+
+
+def resolver_dia_ortools(pontos: List[tuple], tempo_ms: int = 1000) -> List[int]:
+    """
+    Ordena um dia localmente com OR-Tools (route_optimizer), partindo do
+    primeiro ponto. `pontos` = [(lat, lon, servico, janela), ...]; a rota
+    respeita a jornada do .env (jornada_s), como no ORS, e as janelas de
+    quem as tiver. Retorna posições em `pontos`.
+    """
+    if len(pontos) < 3:
+        return list(range(len(pontos)))
+    from route_optimizer import optimize_route
+    ids = optimize_route(
+        [{"id": i, "lat": lat, "lon": lon, "service": servico, "window": janela}
+         for i, (lat, lon, servico, janela) in enumerate(pontos)],
+        time_limit_ms=tempo_ms,
+        workday=jornada_s()
+    )
+    return list(ids)
+
+
+def resolver_dia_heuristica(pontos: List[tuple], tempo_ms: int = 1000) -> List[int]:
+    """Vizinho mais próximo + 2-opt/Or-opt, partindo do primeiro ponto."""
+    if len(pontos) < 3:
+        return list(range(len(pontos)))
+    lats = [p[0] for p in pontos]
+    lons = [p[1] for p in pontos]
+    ordem = rota_vizinho_mais_proximo(lats, lons)
+    return melhorar_rota(ordem, lats, lons, tempo_limite_s=tempo_ms / 1000)
+
+
+_LOCAIS = {
+    "ortools": resolver_dia_ortools,
+    "heuristica": resolver_dia_heuristica,
+}
+
+
+def resolver_dias_local(slices: List[List[int]], clientes: List[Dict], solver: str = "ortools",
+                        tempo_ms: int = 1000, max_processos: Optional[int] = None) -> List[List[int]]:
+    """
+    Sequencia os dias sem rede, um dia por tarefa num pool de processos
+    (padrão: todos os núcleos). Retorna as ordens na mesma ordem de `slices`.
+    """
+    fn = _LOCAIS[solver]
+    pontos = [
+        [(clientes[i]["latitude"], clientes[i]["longitude"],
+          clientes[i].get("servico", SERVICO_PADRAO_S), clientes[i].get("janela")) for i in day]
+        for day in slices
+    ]
+    with ProcessPoolExecutor(max_workers=max_processos) as pool:
+        ordens = list(pool.map(fn, pontos, [tempo_ms] * len(pontos)))
+    return [[day[k] for k in ordem] for day, ordem in zip(slices, ordens)]
+
+
+def resolver_dias(slices: List[List[int]], clientes: List[Dict], solver: str = "ors",
+                  max_concorrencia: Optional[int] = None, tempo_ms: int = 1000) -> List[List[int]]:
+    """
+    Sequencia cada dia com o backend escolhido:
+      "ors"        → ORS Optimization (rede, paralelo com limite de cota)
+      "ortools"    → route_optimizer.optimize_route local, pool de processos
+      "heuristica" → vizinho mais próximo + 2-opt/Or-opt local, pool de processos
+    """
+    if solver == "ors":
+        return resolver_dias_ors(criar_cliente_ors(), slices, clientes, max_concorrencia=max_concorrencia)
+    if solver in _LOCAIS:
+        return resolver_dias_local(slices, clientes, solver, tempo_ms=tempo_ms, max_processos=max_concorrencia)
+    raise ValueError(f"Solver desconhecido: {solver!r} (use {SOLVERS})")
@@ -1,99 +1,177 @@
 import json
 import csv
 import io
-from typing import List, Dict, Tuple
-import html  
+from typing import List, Dict, Tuple, Iterator, BinaryIO
+import html
+import numpy as np
+
+from instrumentation import contar, span
 
 def load_json(path: str) -> List[Dict]:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def generate_kml(rota: List[Dict]) -> str:
-    header = (
-        '<?xml version="1.0" encoding="UTF-8"?>\n'
-        '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
-        '  <Document>\n'
-        '    <name>Roteiro de Visitas</name>\n'
-    )
-    footer = '  </Document>\n</kml>'
-
-    # 1 - gera uma pasta por dia
-    day_folders = []
-    for day in rota:
-        day_name = html.escape(f"Dia_{day['dia']}")
-        placemarks = []
-        for v in day.get("visitas", []):
-            # ESCAPA o nome COMPLETO
-            nome_completo = html.escape(f"{v['id']} - {v.get('nome', '')}".strip(" -"))
-            placemarks.append(
-                f"    <Placemark>\n"
-                f"      <name>{nome_completo}</name>\n"
-                f"      <Point>\n"
-                f"        <coordinates>{v['longitude']},{v['latitude']},0</coordinates>\n"
-                f"      </Point>\n"
-                f"    </Placemark>\n"
-            )
-        day_folders.append(
-            f"    <Folder>\n"
-            f"      <name>{day_name}</name>\n"
-            + "".join(placemarks) +
-            "    </Folder>\n"
-        )
+KML_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+    '  <Document>\n'
+    '    <name>Roteiro de Visitas</name>\n'
+)
+KML_FOOTER = '  </Document>\n</kml>'
+WEEK_DAYS = 5
+CHUNK_BYTES = 64 * 1024
 
-    # 2) Agrupa em semanas de 5 dias úteis
-    WEEK_DAYS = 5
-    week_folders = []
-    for w in range(0, len(day_folders), WEEK_DAYS):
+def _iter_kml_text(rota: List[Dict]) -> Iterator[str]:
+    """Gera o KML em pedaços de texto, uma pasta de semana/dia por vez."""
+    yield KML_HEADER
+    # Agrupa em semanas de 5 dias úteis (pela posição do dia na rota)
+    for w in range(0, len(rota), WEEK_DAYS):
         semana = w // WEEK_DAYS + 1
-        content = "".join(day_folders[w : w + WEEK_DAYS])
         semana_nome = html.escape(f"Semana_{semana}")
-        week_folders.append(
+        yield (
             f"  <Folder>\n"
             f"    <name>{semana_nome}</name>\n"
-            + content +
-            "  </Folder>\n"
         )
+        # uma pasta por dia
+        for day in rota[w : w + WEEK_DAYS]:
+            day_name = html.escape(f"Dia_{day['dia']}")
+            yield (
+                f"    <Folder>\n"
+                f"      <name>{day_name}</name>\n"
+            )
+            for v in day.get("visitas", []):
+                # ESCAPA o nome COMPLETO
+                nome_completo = html.escape(f"{v['id']} - {v.get('nome', '')}".strip(" -"))
+                yield (
+                    f"    <Placemark>\n"
+                    f"      <name>{nome_completo}</name>\n"
+                    f"      <Point>\n"
+                    f"        <coordinates>{v['longitude']},{v['latitude']},0</coordinates>\n"
+                    f"      </Point>\n"
+                    f"    </Placemark>\n"
+                )
+            yield "    </Folder>\n"
+        yield "  </Folder>\n"
+    yield KML_FOOTER
+
+def iter_kml(rota: List[Dict], chunk_bytes: int = CHUNK_BYTES) -> Iterator[bytes]:
+    """
+    KML em pedaços de bytes UTF-8 de ~`chunk_bytes`, sem montar o documento
+    inteiro em memória.
+    """
+    buf, tam = [], 0
+    for parte in _iter_kml_text(rota):
+        buf.append(parte)
+        tam += len(parte)
+        if tam >= chunk_bytes:
+            yield "".join(buf).encode("utf-8")
+            buf, tam = [], 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+def write_kml(rota: List[Dict], fileobj: BinaryIO) -> int:
+    """Escreve o KML em qualquer arquivo binário; retorna o total de bytes."""
+    total = 0
+    for chunk in iter_kml(rota):
+        fileobj.write(chunk)
+        total += len(chunk)
+    return total
+
+def generate_kml(rota: List[Dict]) -> str:
+    return "".join(_iter_kml_text(rota))
 
-    return header + "".join(week_folders) + footer
+ROUTE_COLUMNS = ["cod", "numero_semana", "dia_semana", "ordem_visita"]
+CSV_CHUNK_ROWS = 50_000
 
-def export_csv_to_bytes(rota: List[Dict]) -> bytes:
+def tabela_rota(rota: List[Dict]) -> Dict[str, np.ndarray]:
+    """
+    Tabela da rota em colunas (uma linha por visita), montada uma única vez:
+    cod (str), numero_semana, dia_semana e ordem_visita (int32).
+    """
+    cont = np.fromiter((len(day.get("visitas", [])) for day in rota), dtype=np.int64, count=len(rota))
+    dias = np.fromiter((int(day["dia"]) for day in rota), dtype=np.int64, count=len(rota))
+    total = int(cont.sum())
+    dia = np.repeat(dias, cont)
+    inicio = np.repeat(np.cumsum(cont) - cont, cont)
+    return {
+        "cod": np.array([v["id"] for day in rota for v in day.get("visitas", [])], dtype=object),
+        "numero_semana": ((dia - 1) // WEEK_DAYS + 1).astype(np.int32),
+        "dia_semana": ((dia - 1) % WEEK_DAYS + 1).astype(np.int32),
+        "ordem_visita": (np.arange(total) - inicio + 1).astype(np.int32),
+    }
+
+def tabela_do_df(df_rota) -> Dict[str, np.ndarray]:
+    """
+    A tabela já montada dentro do df_rota do gerar_rota (as colunas do
+    DataFrame, sem cópia), para CSV/Parquet não a refazerem do rota_json.
+    """
+    return {c: df_rota[c].to_numpy() for c in ROUTE_COLUMNS}
+
+def iter_csv(rota: List[Dict], chunk_rows: int = CSV_CHUNK_ROWS, tabela: Dict = None) -> Iterator[bytes]:
+    """CSV (sep ';') em pedaços de bytes de até `chunk_rows` linhas."""
+    tab = tabela if tabela is not None else tabela_rota(rota)
+    cols = [tab[c] for c in ROUTE_COLUMNS]
     buf = io.StringIO()
-    writer = csv.DictWriter(
-        buf,
-        fieldnames=["cod", "numero_semana", "dia_semana", "ordem_visita"],
-        delimiter=";"
-    )
-    writer.writeheader()
-
-    WEEK_DAYS = 5
-    for day in rota:
-        dia = int(day["dia"])
-        numero_semana = (dia - 1) // WEEK_DAYS + 1
-        dia_semana = (dia - 1) % WEEK_DAYS + 1
-        for idx, v in enumerate(day.get("visitas", []), start=1):
-            writer.writerow({
-                "cod": v["id"],
-                "numero_semana": numero_semana,
-                "dia_semana": dia_semana,
-                "ordem_visita": idx
-            })
-
-    return buf.getvalue().encode("utf-8")
-
-def exportar_kml_csv(rota: List[Dict]) -> Tuple[bytes, bytes]:
+    writer = csv.writer(buf, delimiter=";")
+    writer.writerow(ROUTE_COLUMNS)
+    n = len(cols[0])
+    for ini in range(0, n, chunk_rows):
+        writer.writerows(zip(*(c[ini:ini + chunk_rows].tolist() for c in cols)))
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if n == 0:
+        yield buf.getvalue().encode("utf-8")
+
+def write_csv(rota: List[Dict], fileobj: BinaryIO, tabela: Dict = None) -> int:
+    """Escreve o CSV em qualquer arquivo binário; retorna o total de bytes."""
+    total = 0
+    for chunk in iter_csv(rota, tabela=tabela):
+        fileobj.write(chunk)
+        total += len(chunk)
+    return total
+
+def export_csv_to_bytes(rota: List[Dict], tabela: Dict = None) -> bytes:
+    return b"".join(iter_csv(rota, tabela=tabela))
+
+def tabela_arrow(rota: List[Dict], tabela: Dict = None):
+    """A tabela da rota como pyarrow.Table (para Parquet/Arrow/BI)."""
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("Exportar Arrow/Parquet requer o pacote 'pyarrow'") from e
+    tab = tabela if tabela is not None else tabela_rota(rota)
+    return pa.table({
+        "cod": pa.array(tab["cod"].tolist(), type=pa.string()),
+        "numero_semana": tab["numero_semana"],
+        "dia_semana": tab["dia_semana"],
+        "ordem_visita": tab["ordem_visita"],
+    })
+
+def write_parquet(rota: List[Dict], destino, tabela: Dict = None):
+    """Grava a tabela da rota em Parquet (`destino`: caminho ou arquivo binário)."""
+    import pyarrow.parquet as pq
+    with span("export", formato="parquet"):
+        pq.write_table(tabela_arrow(rota, tabela), destino)
+
+def exportar_kml_csv(rota: List[Dict], tabela: Dict = None) -> Tuple[bytes, bytes]:
     """
     Retorna (kml_bytes, csv_bytes) para download,
-    agrupando em semanas de 5 dias úteis.
+    agrupando em semanas de 5 dias úteis. `tabela`: a tabela da rota já
+    montada (tabela_do_df), para o CSV não a refazer.
     """
-    kml_bytes = generate_kml(rota).encode("utf-8")
-    csv_bytes = export_csv_to_bytes(rota)
+    with span("export", formato="kml"):
+        kml_bytes = b"".join(iter_kml(rota))
+    with span("export", formato="csv"):
+        csv_bytes = export_csv_to_bytes(rota, tabela)
+    contar("bytes_exportados", len(kml_bytes), formato="kml")
+    contar("bytes_exportados", len(csv_bytes), formato="csv")
     return kml_bytes, csv_bytes
 
 if __name__ == "__main__":
     rota = load_json("rota.json")
-    kml, csv_b = exportar_kml_csv(rota)
     with open("test.kml", "wb") as f:
-        f.write(kml)
+        write_kml(rota, f)
     with open("test.csv", "wb") as f:
-        f.write(csv_b)
+        f.write(export_csv_to_bytes(rota))
     print("✅ test.kml e test.csv criados.")
@@ -0,0 +1,179 @@
+"""
+Instrumentação leve do pipeline: spans (tempo por etapa), contadores e
+chamadas externas (ORS, LLM, Nominatim) com latência, erros e bytes.
+Tudo fica num agregador do processo (METRICAS), exportável como JSON ou
+como texto no formato Prometheus. Com INSTRUMENTACAO_LOG=<arquivo>, cada
+observação também é gravada como uma linha JSON.
+
+    from instrumentation import span, chamada_externa
+    with span("tour_nn"):
+        ...
+    with chamada_externa("ors", "optimization") as c:
+        res = ors.optimization(...)
+        c.bytes = len(json.dumps(res))
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIXO = "rota"
+
+
+def _escapar(valor: str) -> str:
+    """Valor de rótulo no formato de exposição: escapa \\, " e quebra de linha."""
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Chamada:
+    """O que a chamada externa informa ao terminar (além do tempo)."""
+    __slots__ = ("bytes",)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+class Metricas:
+    """Agregador thread-safe: observações (contagem/soma/máx. em s) e contadores."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._obs = {}          # (nome, rótulos) → [contagem, soma, máximo]
+        self._contadores = {}   # (nome, rótulos) → valor
+
+    @staticmethod
+    def _chave(nome, rotulos):
+        return nome, tuple(sorted((k, str(v)) for k, v in rotulos.items()))
+
+    def _log(self, evento: dict):
+        path = os.getenv("INSTRUMENTACAO_LOG")
+        if not path:
+            return
+        linha = json.dumps({"ts": round(time.time(), 3), **evento}, ensure_ascii=False)
+        with self._lock, open(path, "a", encoding="utf-8") as f:
+            f.write(linha + "\n")
+
+    def observar(self, nome: str, segundos: float, **rotulos):
+        k = self._chave(nome, rotulos)
+        with self._lock:
+            o = self._obs.setdefault(k, [0, 0.0, 0.0])
+            o[0] += 1
+            o[1] += segundos
+            o[2] = max(o[2], segundos)
+        self._log({"tipo": nome, "s": round(segundos, 6), **rotulos})
+
+    def contar(self, nome: str, n: float = 1, **rotulos):
+        k = self._chave(nome, rotulos)
+        with self._lock:
+            self._contadores[k] = self._contadores.get(k, 0) + n
+
+    @contextmanager
+    def span(self, etapa: str, **rotulos):
+        """Mede o bloco como uma etapa (observação "span")."""
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar("span", time.perf_counter() - t, etapa=etapa, **rotulos)
+
+    @contextmanager
+    def chamada_externa(self, servico: str, operacao: str):
+        """Conta a chamada, sua latência, erros e os bytes informados em `.bytes`."""
+        c = _Chamada()
+        t = time.perf_counter()
+        try:
+            yield c
+        except Exception:
+            self.contar("erros", servico=servico, operacao=operacao)
+            raise
+        finally:
+            self.observar("chamada", time.perf_counter() - t, servico=servico, operacao=operacao)
+            self.contar("chamadas", servico=servico, operacao=operacao)
+            if c.bytes:
+                self.contar("bytes", c.bytes, servico=servico, operacao=operacao)
+
+    def falha(self, servico: str, operacao: str, erro: BaseException, **detalhes):
+        """
+        Registra uma falha definitiva (depois das tentativas): conta em
+        "falhas" e grava o erro no log (INSTRUMENTACAO_LOG), se ligado.
+        """
+        self.contar("falhas", servico=servico, operacao=operacao)
+        self._log({"tipo": "falha", "servico": servico, "operacao": operacao,
+                   "erro": f"{type(erro).__name__}: {erro}", **detalhes})
+
+    def snapshot(self) -> dict:
+        """{"observacoes": [...], "contadores": [...]} com os rótulos como dict."""
+        with self._lock:
+            obs = [
+                {"nome": n, **dict(r), "contagem": o[0], "soma_s": round(o[1], 6),
+                 "max_s": round(o[2], 6)}
+                for (n, r), o in sorted(self._obs.items())
+            ]
+            cont = [{"nome": n, **dict(r), "valor": v} for (n, r), v in sorted(self._contadores.items())]
+        return {"observacoes": obs, "contadores": cont}
+
+    def para_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def para_prometheus(self) -> str:
+        """Texto no formato de exposição do Prometheus."""
+        def rot(r):
+            if not r:
+                return ""
+            return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in r) + "}"
+
+        linhas = []
+        with self._lock:
+            obs = sorted(self._obs.items())
+            cont = sorted(self._contadores.items())
+        for nome in sorted({n for (n, _), _ in obs}):
+            m = f"{PREFIXO}_{nome}_segundos"
+            linhas.append(f"# TYPE {m} summary")
+            for (n, r), o in obs:
+                if n == nome:
+                    linhas.append(f"{m}_count{rot(r)} {o[0]}")
+                    linhas.append(f"{m}_sum{rot(r)} {o[1]:.6f}")
+            linhas.append(f"# TYPE {m}_max gauge")
+            for (n, r), o in obs:
+                if n == nome:
+                    linhas.append(f"{m}_max{rot(r)} {o[2]:.6f}")
+        for nome in sorted({n for (n, _), _ in cont}):
+            m = f"{PREFIXO}_{nome}_total"
+            linhas.append(f"# TYPE {m} counter")
+            for (n, r), v in cont:
+                if n == nome:
+                    linhas.append(f"{m}{rot(r)} {v:g}")
+        return "\n".join(linhas) + "\n"
+
+    def zerar(self):
+        with self._lock:
+            self._obs.clear()
+            self._contadores.clear()
+
+
+METRICAS = Metricas()
+span = METRICAS.span
+contar = METRICAS.contar
+observar = METRICAS.observar
+chamada_externa = METRICAS.chamada_externa
+falha = METRICAS.falha
+
+
+def painel_streamlit(st, metricas: Metricas = METRICAS):
+    """Painel de depuração (expander na sidebar) com as métricas do processo."""
+    with st.sidebar.expander("🐞 Depuração: tempos e chamadas"):
+        snap = metricas.snapshot()
+        if not snap["observacoes"] and not snap["contadores"]:
+            st.caption("Nada medido ainda.")
+            return
+        if snap["observacoes"]:
+            st.dataframe(snap["observacoes"], use_container_width=True)
+        if snap["contadores"]:
+            st.dataframe(snap["contadores"], use_container_width=True)
+        st.download_button("metricas.json", metricas.para_json().encode("utf-8"),
+                           "metricas.json", "application/json")
+        st.download_button("metricas.prom", metricas.para_prometheus().encode("utf-8"),
+                           "metricas.prom", "text/plain")
+        if st.button("Zerar métricas"):
+            metricas.zerar()
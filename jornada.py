@@ -0,0 +1,52 @@
+import math
+import os
+from typing import Optional, Tuple
+
+SERVICO_PADRAO_S = 300      # tempo de atendimento por cliente (s)
+JORNADA_INICIO = "08:00"
+JORNADA_FIM = "16:00"       # 8 h de jornada
+
+
+def hora_em_s(valor) -> Optional[int]:
+    """
+    "HH:MM" / "HH:MM:SS" (ou só a hora, ex.: 9 ou "9" = 09:00) → segundos
+    desde 0h. None para vazio ou inválido.
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return None if math.isnan(valor) else int(valor * 3600)
+    texto = str(valor).strip()
+    if not texto:
+        return None
+    try:
+        partes = [int(p) for p in texto.split(":")]
+    except ValueError:
+        return None
+    if len(partes) == 1:
+        return partes[0] * 3600
+    h, m, *s = partes
+    return h * 3600 + m * 60 + (s[0] if s else 0)
+
+
+def jornada_s() -> Tuple[int, int]:
+    """Início e fim da jornada (s desde 0h), do .env: JORNADA_INICIO / JORNADA_FIM."""
+    ini = hora_em_s(os.getenv("JORNADA_INICIO", JORNADA_INICIO))
+    fim = hora_em_s(os.getenv("JORNADA_FIM", JORNADA_FIM))
+    return ini, fim
+
+
+def intersecao(janelas) -> Optional[Tuple[int, int]]:
+    """
+    Janela comum a várias janelas (abre, fecha), ignorando None; None se
+    nenhuma foi informada. Janelas sem interseção levantam ValueError: os
+    clientes não podem ser atendidos juntos (stop_merge.separar_por_janela).
+    """
+    janelas = [j for j in janelas if j]
+    if not janelas:
+        return None
+    abre = max(j[0] for j in janelas)
+    fecha = min(j[1] for j in janelas)
+    if abre > fecha:
+        raise ValueError(f"Janelas sem horário comum: {janelas}")
+    return abre, fecha
@@ -0,0 +1,136 @@
+import hashlib
+import io
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from collections.abc import Sequence
+from typing import Dict
+
+import numpy as np
+
+CACHE_MAX = 8   # KMLs distintos mantidos em memória
+
+
+KML_NS = "{http://www.opengis.net/kml/2.2}"
+
+
+def _tag(elem):
+    """Nome local das tags do namespace KML 2.2; None para as de outros (ou sem namespace)."""
+    return elem.tag[len(KML_NS):] if elem.tag.startswith(KML_NS) else None
+
+
+class DiaKML(Sequence):
+    """
+    Placemarks de um dia em arrays compactos (nomes + lat/lon float64).
+    Indexar devolve o dict {"name", "lat", "lon"} usado pelas páginas.
+    """
+
+    __slots__ = ("nomes", "lat", "lon")
+
+    def __init__(self, nomes, lats, lons):
+        self.nomes = nomes
+        self.lat = np.asarray(lats, dtype=np.float64)
+        self.lon = np.asarray(lons, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(*i.indices(len(self)))]
+        return {"name": self.nomes[i], "lat": float(self.lat[i]), "lon": float(self.lon[i])}
+
+
+def parse_kml(fonte) -> Dict[str, Dict[str, DiaKML]]:
+    """
+    Lê um KML Semanas→Dias→Placemarks de forma incremental (iterparse).
+    Cada elemento sai da árvore assim que termina: a memória não cresce com
+    o número de Placemarks. `fonte`: caminho ou arquivo binário.
+    Retorna {semana: {dia: DiaKML}}; nomes com espaço viram "_".
+    Mesmas regras do antigo findtext com namespace: só tags do KML 2.2,
+    vale o primeiro <name> de cada pasta/Placemark e a coordenada de um
+    <Point> filho direto do Placemark.
+    Levanta ValueError se não houver <Document>.
+    """
+    semanas = {}
+    pilha = []            # (tag, elemento) abertos a partir de <kml>
+    pastas = []           # nomes das pastas abertas (dentro do Document; None = sem <name> ainda)
+    tem_doc = False
+    dias_semana = {}
+    nomes, lats, lons = [], [], []
+    pm_nome = pm_coord = None
+
+    for evento, elem in ET.iterparse(fonte, events=("start", "end")):
+        tag = _tag(elem)
+        if evento == "start":
+            pilha.append((tag, elem))
+            if tag == "Document" and len(pilha) == 2:
+                tem_doc = True
+            elif tag == "Folder" and tem_doc:
+                pastas.append(None)
+                if len(pastas) == 1:
+                    dias_semana = {}
+                elif len(pastas) == 2:
+                    nomes, lats, lons = [], [], []
+            elif tag == "Placemark":
+                pm_nome = pm_coord = None
+            continue
+
+        pilha.pop()
+        pai = pilha[-1][0] if pilha else None
+        if tag == "name":
+            texto = (elem.text or "").strip()
+            if pai == "Folder" and pastas and pastas[-1] is None:
+                pastas[-1] = texto.replace(" ", "_")
+            elif pai == "Placemark" and pm_nome is None:
+                pm_nome = texto
+        elif tag == "coordinates" and pai == "Point" and len(pilha) > 1 and pilha[-2][0] == "Placemark":
+            if pm_coord is None:
+                pm_coord = (elem.text or "").strip()
+        elif tag == "Placemark":
+            # só Placemarks diretamente dentro de um dia (Semana/Dia)
+            if pai == "Folder" and len(pastas) == 2 and pm_nome and pm_coord:
+                lon, lat, *_ = pm_coord.split(",")
+                nomes.append(pm_nome)
+                lats.append(float(lat))
+                lons.append(float(lon))
+        elif tag == "Folder" and pastas:
+            nome = pastas.pop() or ""
+            if len(pastas) == 1:
+                dias_semana[nome] = DiaKML(nomes, lats, lons)
+            elif not pastas:
+                semanas[nome] = dias_semana
+        # já lido: sai da árvore (o pai fica sem filhos acumulados)
+        elem.clear()
+        if pilha:
+            pilha[-1][1].remove(elem)
+
+    if not tem_doc:
+        raise ValueError("KML inválido: <Document> não encontrado")
+    return semanas
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def carregar_kml(raw: bytes) -> Dict[str, Dict[str, DiaKML]]:
+    """
+    parse_kml com cache em memória pelo sha256 do conteúdo: reenviar ou
+    re-renderizar o mesmo arquivo não reprocessa o XML. Tenta UTF-8 (ou a
+    codificação declarada) e cai para latin1 se o XML não decodificar.
+    """
+    digest = hashlib.sha256(raw).hexdigest()
+    with _cache_lock:
+        if digest in _cache:
+            _cache.move_to_end(digest)
+            return _cache[digest]
+    try:
+        semanas = parse_kml(io.BytesIO(raw))
+    except ET.ParseError:
+        semanas = parse_kml(io.BytesIO(raw.decode("latin1").encode("utf-8")))
+    with _cache_lock:
+        _cache[digest] = semanas
+        while len(_cache) > CACHE_MAX:
+            _cache.popitem(last=False)
+    return semanas
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from instrumentation import chamada_externa, contar
+
+CASAS_COORD = 6   # ~11 cm: coordenadas iguais até aqui compartilham a mesma entrada
+
+
+def _normalizar(obj):
+    """Arredonda floats e converte tuplas/objetos para uma forma JSON estável."""
+    if isinstance(obj, float):
+        return round(obj, CASAS_COORD)
+    if isinstance(obj, (list, tuple)):
+        return [_normalizar(v) for v in obj]
+    if isinstance(obj, dict):
+        return {str(k): _normalizar(v) for k, v in obj.items()}
+    if hasattr(obj, "__dict__"):
+        return _normalizar(vars(obj))
+    return obj
+
+
+def chave(tipo: str, **params) -> str:
+    """Chave de conteúdo: sha256 do tipo de requisição + parâmetros normalizados."""
+    bruto = json.dumps([tipo, _normalizar(params)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(bruto.encode("utf-8")).hexdigest()
+
+
+class CacheSQLite:
+    """
+    Armazém chave → valor persistente (SQLite), compartilhado entre
+    processos: valores JSON (get/put, comprimidos) ou BLOBs crus
+    (get_bytes/put_bytes). Nada nele é específico do ORS: guarda as
+    respostas ORS (cache_padrao), as do LLM (rag.cache_feedback) e os
+    artefatos do pipeline (pipeline.cache_pipeline), cada um no seu arquivo.
+    Entradas expiram após `ttl_s` e, ao passar de `max_mb`, as menos usadas
+    recentemente são removidas.
+    """
+
+    def __init__(self, path: str, ttl_s: float = 30 * 24 * 3600, max_mb: float = 200,
+                 evict_cada: int = 32):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        # a soma dos tamanhos varre a tabela: com respostas pequenas, verifica
+        # o limite só a cada `evict_cada` gravações; com artefatos grandes, 1
+        self.evict_cada = max(1, evict_cada)
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._con = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            " chave TEXT PRIMARY KEY, tipo TEXT, criado REAL, acesso REAL,"
+            " tamanho INTEGER, valor BLOB)"
+        )
+        self._con.execute("CREATE INDEX IF NOT EXISTS idx_acesso ON respostas(acesso)")
+
+    def _ler(self, k: str):
+        agora = time.time()
+        with self._lock:
+            row = self._con.execute(
+                "SELECT criado, valor FROM respostas WHERE chave = ?", (k,)
+            ).fetchone()
+            if row is None or agora - row[0] > self.ttl_s:
+                if row is not None:
+                    self._con.execute("DELETE FROM respostas WHERE chave = ?", (k,))
+                self.misses += 1
+                return None
+            self._con.execute("UPDATE respostas SET acesso = ? WHERE chave = ?", (agora, k))
+            self.hits += 1
+        return row[1]
+
+    def get(self, k: str):
+        dados = self._ler(k)
+        return None if dados is None else json.loads(zlib.decompress(dados))
+
+    def get_bytes(self, k: str):
+        """Bytes gravados com put_bytes, sem cópia extra (ou None)."""
+        return self._ler(k)
+
+    def put(self, k: str, tipo: str, valor):
+        self._gravar(k, tipo, zlib.compress(json.dumps(valor, separators=(",", ":")).encode("utf-8")))
+
+    def put_bytes(self, k: str, tipo: str, dados: bytes):
+        """Guarda bytes como BLOB cru (ex.: um KML/CSV pronto), sem JSON nem zlib."""
+        self._gravar(k, tipo, dados)
+
+    def _gravar(self, k: str, tipo: str, dados: bytes):
+        agora = time.time()
+        with self._lock:
+            self._con.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?, ?)",
+                (k, tipo, agora, agora, len(dados), dados)
+            )
+            self._puts += 1
+            if (self._puts - 1) % self.evict_cada == 0:
+                self._evict()
+
+    def _evict(self):
+        total = self._con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self._con.execute("DELETE FROM respostas WHERE criado < ?", (time.time() - self.ttl_s,))
+        excesso = self._con.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0] - self.max_bytes
+        if excesso <= 0:
+            return
+        # remove as menos acessadas até liberar o excesso (+10% de folga)
+        alvo = excesso + self.max_bytes // 10
+        liberado = 0
+        chaves = []
+        for k, tam in self._con.execute("SELECT chave, tamanho FROM respostas ORDER BY acesso"):
+            chaves.append((k,))
+            liberado += tam
+            if liberado >= alvo:
+                break
+        self._con.executemany("DELETE FROM respostas WHERE chave = ?", chaves)
+
+    def obter_ou_calcular(self, tipo: str, params: dict, fn):
+        """Devolve a resposta em cache para (tipo, params) ou chama `fn()` e guarda."""
+        k = chave(tipo, **params)
+        valor = self.get(k)
+        contar("cache", tipo=tipo, resultado="miss" if valor is None else "hit")
+        if valor is None:
+            valor = fn()
+            self.put(k, tipo, valor)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._con.execute("DELETE FROM respostas")
+
+
+ORSCache = CacheSQLite   # nome antigo
+
+
+class CachedORSClient:
+    """
+    Envolve um openrouteservice.Client: optimization, distance_matrix e
+    directions passam pelo CacheSQLite (se houver) e cada ida à rede é medida
+    (instrumentation: chamadas, latência e bytes); o resto é repassado ao cliente.
+    O `limitador` (rate_limit) só é consultado na ida à rede: resposta em
+    cache não gasta cota nem espera.
+    """
+
+    def __init__(self, client, cache: CacheSQLite = None, limitador=None):
+        self._client = client
+        self.cache = cache
+        self.limitador = limitador
+
+    def __getattr__(self, nome):
+        return getattr(self._client, nome)
+
+    def _chamar(self, tipo: str, params: dict, fn):
+        def rede():
+            if self.limitador:
+                self.limitador.adquirir()
+            with chamada_externa("ors", tipo) as c:
+                res = fn()
+                c.bytes = len(json.dumps(res, separators=(",", ":")))
+            return res
+        if self.cache is None:
+            return rede()
+        return self.cache.obter_ou_calcular(tipo, params, rede)
+
+    def optimization(self, jobs=None, vehicles=None, **kwargs):
+        params = dict(jobs=jobs, vehicles=vehicles, **kwargs)
+        return self._chamar(
+            "optimization", params,
+            lambda: self._client.optimization(jobs=jobs, vehicles=vehicles, **kwargs)
+        )
+
+    def distance_matrix(self, locations, profile="driving-car", **kwargs):
+        params = dict(locations=locations, profile=profile, **kwargs)
+        return self._chamar(
+            "matrix", params,
+            lambda: self._client.distance_matrix(locations=locations, profile=profile, **kwargs)
+        )
+
+    def directions(self, coordinates, profile="driving-car", **kwargs):
+        params = dict(coordinates=coordinates, profile=profile, **kwargs)
+        return self._chamar(
+            "directions", params,
+            lambda: self._client.directions(coordinates=coordinates, profile=profile, **kwargs)
+        )
+
+
+_caches = {}      # prefixo → (pid, CacheSQLite)
+_cache_lock = threading.Lock()
+
+
+def cache_do_env(prefixo: str, arquivo: str, max_mb: float = 200, evict_cada: int = 32):
+    """
+    CacheSQLite do processo configurado pelo .env com o `prefixo`:
+    <prefixo> (true/false), <prefixo>_PATH (padrão .cache/<arquivo>),
+    <prefixo>_TTL_DIAS e <prefixo>_MAX_MB. None se desligado.
+    """
+    if os.getenv(prefixo, "true").lower() != "true":
+        return None
+    with _cache_lock:
+        pid, cache = _caches.get(prefixo, (None, None))
+        # conexões SQLite não podem atravessar fork: cada processo abre a sua
+        if cache is None or pid != os.getpid():
+            path = os.getenv(
+                f"{prefixo}_PATH",
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", arquivo)
+            )
+            cache = CacheSQLite(
+                path,
+                ttl_s=float(os.getenv(f"{prefixo}_TTL_DIAS", 30)) * 24 * 3600,
+                max_mb=float(os.getenv(f"{prefixo}_MAX_MB", max_mb)),
+                evict_cada=evict_cada
+            )
+            _caches[prefixo] = (os.getpid(), cache)
+    return cache
+
+
+def cache_padrao():
+    """
+    Cache de respostas ORS do processo, configurado pelo .env: ORS_CACHE
+    (true/false), ORS_CACHE_PATH, ORS_CACHE_TTL_DIAS, ORS_CACHE_MAX_MB.
+    None se desligado.
+    """
+    return cache_do_env("ORS_CACHE", "ors.sqlite", 200)
+
+
+def com_cache(client, limitador=None):
+    """
+    Aplica o cache padrão (se ligado), a medição e, opcionalmente, um
+    limitador de cota a um cliente ORS; None fica None. Um cliente já
+    envolvido é reaproveitado (mesmo cliente e cache) com o novo limitador.
+    """
+    if client is None:
+        return None
+    if isinstance(client, CachedORSClient):
+        return CachedORSClient(client._client, client.cache, limitador or client.limitador)
+    return CachedORSClient(client, cache_padrao(), limitador)
@@ -0,0 +1,151 @@
+"""
+Servidor local que imita os endpoints /optimization, /v2/matrix e
+/v2/directions do openrouteservice, para testar e medir o pipeline sem rede
+e sem consumir cota. Tempos e distâncias são haversine × DESVIO a 40 km/h.
+
+    python ors_stub.py --porta 8089 --latencia 0.5 --jitter 0.2
+    ORS_BASE_URL=http://127.0.0.1:8089 python run_route.py clientes.csv
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from route_matrix import VELOCIDADE_KMH, haversine_km
+from spatial_index import rota_vizinho_mais_proximo
+
+DESVIO = 1.3    # ruas não são linha reta: distância de rota ≈ 1,3 × haversine
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ORSStub/1.0"
+
+    def log_message(self, fmt, *args):
+        if self.server.verbose:
+            super().log_message(fmt, *args)
+
+    def _responder(self, status, corpo):
+        dados = json.dumps(corpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_POST(self):
+        tam = int(self.headers.get("Content-Length", 0))
+        corpo = json.loads(self.rfile.read(tam) or b"{}")
+        self.server.registrar(self.path)
+        self.server.esperar()
+        caminho = self.path.rstrip("/")
+        if caminho == "/optimization":
+            return self._responder(200, otimizar(corpo))
+        if caminho.startswith("/v2/matrix/"):
+            return self._responder(200, matriz(corpo))
+        if caminho.startswith("/v2/directions/"):
+            return self._responder(200, direcoes(corpo, geojson=caminho.endswith("/geojson")))
+        self._responder(404, {"error": f"endpoint não suportado: {self.path}"})
+
+
+def otimizar(corpo: dict) -> dict:
+    """Resposta no formato do ORS/VROOM: jobs em ordem de vizinho mais próximo."""
+    jobs = corpo.get("jobs", [])
+    veiculo = corpo.get("vehicles", [{}])[0]
+    pts = [veiculo.get("start")] + [j["location"] for j in jobs] if veiculo.get("start") else [j["location"] for j in jobs]
+    ordem = rota_vizinho_mais_proximo([p[1] for p in pts], [p[0] for p in pts]) if pts else []
+    if veiculo.get("start"):
+        ordem = [i - 1 for i in ordem if i != 0]
+    steps = [{"type": "start", "location": veiculo.get("start")}]
+    steps += [{"type": "job", "job": jobs[i]["id"], "location": jobs[i]["location"]} for i in ordem]
+    steps.append({"type": "end", "location": veiculo.get("end")})
+    return {
+        "code": 0,
+        "summary": {"routes": 1, "unassigned": 0},
+        "unassigned": [],
+        "routes": [{"vehicle": veiculo.get("id"), "steps": steps}],
+    }
+
+
+def _km(a, b):
+    """Distância de rota (km) entre pontos [lon, lat] (arrays k×2)."""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return haversine_km(a[..., 1], a[..., 0], b[..., 1], b[..., 0]) * DESVIO
+
+
+def matriz(corpo: dict) -> dict:
+    """Resposta de /v2/matrix: durations (s) e, se pedido, distances (m)."""
+    locs = np.asarray(corpo["locations"], dtype=np.float64)
+    src = locs[corpo.get("sources") or list(range(len(locs)))]
+    dst = locs[corpo.get("destinations") or list(range(len(locs)))]
+    km = _km(src[:, None, :], dst[None, :, :])
+    res = {"durations": np.round(km / VELOCIDADE_KMH * 3600, 2).tolist()}
+    if "distance" in (corpo.get("metrics") or []):
+        res["distances"] = np.round(km * 1000, 2).tolist()
+    return res
+
+
+def direcoes(corpo: dict, geojson: bool) -> dict:
+    """Resposta de /v2/directions: a linha reta entre as coordenadas pedidas."""
+    coords = corpo["coordinates"]
+    km = float(_km(coords[:-1], coords[1:]).sum()) if len(coords) > 1 else 0.0
+    resumo = {"distance": round(km * 1000, 1), "duration": round(km / VELOCIDADE_KMH * 3600, 1)}
+    if geojson:
+        return {
+            "type": "FeatureCollection",
+            "features": [{
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": coords},
+                "properties": {"summary": resumo},
+            }],
+        }
+    return {"routes": [{"summary": resumo, "geometry": coords}]}
+
+
+class ORSStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, porta: int = 0, latencia: float = 0.0, verbose: bool = False,
+                 jitter: float = 0.0, seed: int = 0):
+        super().__init__(("127.0.0.1", porta), _Handler)
+        self.latencia = latencia
+        self.jitter = jitter
+        self.verbose = verbose
+        self._rng = random.Random(seed)
+        self.chamadas = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def registrar(self, caminho):
+        with self._lock:
+            self.chamadas[caminho] = self.chamadas.get(caminho, 0) + 1
+
+    def esperar(self):
+        """Latência simulada: `latencia` s ± `jitter` (fração, uniforme)."""
+        if self.latencia <= 0:
+            return
+        with self._lock:
+            fator = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(self.latencia * fator)
+
+    def iniciar(self):
+        """Sobe o servidor numa thread daemon e retorna self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor ORS falso para testes locais.")
+    parser.add_argument("--porta", type=int, default=8089)
+    parser.add_argument("--latencia", type=float, default=0.0, help="atraso por requisição, em segundos")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variação da latência (fração, ex.: 0.2)")
+    args = parser.parse_args()
+    srv = ORSStub(args.porta, args.latencia, verbose=True, jitter=args.jitter)
+    print(f"ORS falso em {srv.url}")
+    srv.serve_forever()
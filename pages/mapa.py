@@ -4,10 +4,13 @@ import streamlit as st
 import xml.etree.ElementTree as ET
 import folium
 from streamlit_folium import folium_static
-import io, json, openai, requests
+import hashlib, io, json, openai, requests
 import pandas as pd
 import openrouteservice
-from route_optimizer import optimize_route
+from route_optimizer import optimize_route, optimize_days
+from ors_cache import com_cache
+from instrumentation import chamada_externa, painel_streamlit
+from kml_loader import carregar_kml
 from streamlit_sortables import sort_items
 
 # 0) Carrega variáveis de ambiente
@@ -19,15 +22,11 @@ if not openai.api_key:
     st.stop()
 if not ors_key:
     st.sidebar.warning("⚠️ ORS_API_KEY não encontrado — rotas serão traçadas em linha reta")
-ors_client = openrouteservice.Client(key=ors_key) if ors_key else None
-
-if "ors_count" not in st.session_state:
-    st.session_state["ors_count"] = 0
+ors_client = com_cache(openrouteservice.Client(key=ors_key)) if ors_key else None
 
+# chamadas ao ORS (com latência e bytes) ficam no painel de depuração
 @st.cache_data(ttl=24*3600)
 def get_route_geojson(coords: tuple) -> dict:
-    st.session_state["ors_count"] += 1
-    print(f"➡️ ORS chamadas: {st.session_state['ors_count']}")
     return ors_client.directions(
         coordinates=list(coords),
         profile="driving-car",
@@ -44,7 +43,9 @@ def buscar_endereco(query):
         "limit": 5
     }
     headers = {"User-Agent": "StreamlitApp/1.0"}
-    r = requests.get(url, params=params, headers=headers)
+    with chamada_externa("nominatim", "search") as c:
+        r = requests.get(url, params=params, headers=headers)
+        c.bytes = len(r.content)
     if r.status_code == 200:
         return r.json()
     return []
@@ -58,40 +59,29 @@ if not uploaded:
     st.sidebar.info("Envie um .kml para começar")
     st.stop()
 
-raw = uploaded.read()
+# Parse incremental (iterparse) com cache pelo hash do conteúdo:
+# reruns do Streamlit não reprocessam o XML
+NS = {"k": "http://www.opengis.net/kml/2.2"}
 try:
-    kml_str = raw.decode("utf-8")
-except UnicodeDecodeError:
-    kml_str = raw.decode("latin1")  # fallback
-
-# ET.fromstring espera sempre string
-root = ET.fromstring(kml_str)
-NS   = {"k": "http://www.opengis.net/kml/2.2"}
-doc  = root.find("k:Document", NS)
-if doc is None:
-    st.sidebar.error("KML inválido: <Document> não encontrado")
+    semanas = carregar_kml(uploaded.getvalue())
+except ValueError as e:
+    st.sidebar.error(str(e))
     st.stop()
 
-# --- Extrai Semanas→Dias→Placemarks + lista de todos os clientes
-semanas     = {}
-all_clients = set()
-for wk in doc.findall("k:Folder", NS):
-    wkname = (wk.findtext("k:name", namespaces=NS) or "").strip().replace(" ", "_")
-    dias = {}
-    for day in wk.findall("k:Folder", NS):
-        dname = (day.findtext("k:name", namespaces=NS) or "").strip().replace(" ", "_")
-        pts = []
-        for pm in day.findall("k:Placemark", NS):
-            nm = (pm.findtext("k:name", namespaces=NS) or "").strip()
-            co = (pm.findtext("k:Point/k:coordinates", namespaces=NS) or "").strip()
-            if not nm or not co:
-                continue
-            lon, lat, *_ = co.split(",")
-            pts.append({"name": nm, "lat": float(lat), "lon": float(lon)})
-            all_clients.add(nm)
-        dias[dname] = pts
-    semanas[wkname] = dias
+# "Otimizar todas" pode mover clientes entre dias: a nova divisão fica na
+# sessão (para este KML) e substitui a do arquivo
+kml_hash = hashlib.sha256(uploaded.getvalue()).hexdigest()
+override = st.session_state.get("semanas_otimizadas")
+if override and override[0] == kml_hash:
+    semanas = override[1]
+    fora = st.session_state.get("nao_atendidos")
+    if fora and fora[0] == kml_hash and fora[1]:
+        st.sidebar.warning(
+            f"{len(fora[1])} cliente(s) não couberam na jornada/capacidade e foram "
+            "encaixados onde custa menos: " + ", ".join(fora[1])
+        )
 
+# --- Semanas→Dias→Placemarks (cada dia é um DiaKML: sequência de {"name","lat","lon"})
 if not semanas:
     st.sidebar.error("Nenhuma rota encontrada no KML.")
     st.stop()
@@ -99,7 +89,7 @@ if not semanas:
 # --- Seleção de Semana / Dia
 sem_sel    = st.sidebar.selectbox("Semana", sorted(semanas.keys()))
 dia_sel    = st.sidebar.selectbox("Dia",    sorted(semanas[sem_sel].keys()))
-placemarks = semanas[sem_sel][dia_sel]
+placemarks = list(semanas[sem_sel][dia_sel])
 if not placemarks:
     st.sidebar.warning("Nenhum cliente neste dia")
     st.stop()
@@ -184,32 +174,34 @@ st.subheader(f"Centralizando: **{sem_sel} / {dia_sel} → {first_name}**")
 # --- Botão: recalcular apenas este dia
 if st.sidebar.button("🚀 Recalcular rota deste dia"):
     with st.spinner("Otimizando o dia selecionado…"):
-        resp = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role":"system","content":"Decida boa estratégia e tempo (≤300ms)."},
-                {"role":"user","content":f"Otimize este dia começando em {placemarks[init_idx]['name']}."}
-            ],
-            functions=[{
-                "name":"optimize_route",
-                "description":"Reordena rota minimizando distância",
-                "parameters":{
-                    "type":"object",
-                    "properties":{
-                        "strategy":{"type":"string","enum":["PATH_CHEAPEST_ARC","PARALLEL_CHEAPEST_INSERTION","AUTOMATIC"]},
-                        "time_limit_ms":{"type":"integer","minimum":0}
-                    },
-                    "required":["strategy","time_limit_ms"]
-                }
-            }],
-            function_call={"name":"optimize_route"}
-        )
+        with chamada_externa("llm", "gpt-3.5-turbo"):
+            resp = openai.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role":"system","content":"Decida boa estratégia e tempo (≤300ms)."},
+                    {"role":"user","content":f"Otimize este dia começando em {placemarks[init_idx]['name']}."}
+                ],
+                functions=[{
+                    "name":"optimize_route",
+                    "description":"Reordena rota minimizando distância",
+                    "parameters":{
+                        "type":"object",
+                        "properties":{
+                            "strategy":{"type":"string","enum":["PATH_CHEAPEST_ARC","PARALLEL_CHEAPEST_INSERTION","AUTOMATIC"]},
+                            "time_limit_ms":{"type":"integer","minimum":0}
+                        },
+                        "required":["strategy","time_limit_ms"]
+                    }
+                }],
+                function_call={"name":"optimize_route"}
+            )
         args = json.loads(resp.choices[0].message.function_call.arguments)
         ids = optimize_route(
             [{"id":p["name"],"lat":p["lat"],"lon":p["lon"]} for p in placemarks],
             strategy=args["strategy"],
             time_limit_ms=args["time_limit_ms"],
-            start_index=init_idx
+            start_index=init_idx,
+            initial_order=[placemarks[i]["name"] for i in order_full]
         )
         idx_map = {p["name"]: i for i, p in enumerate(placemarks)}
         st.session_state[order_key] = [idx_map[nm] for nm in ids]
@@ -221,46 +213,64 @@ start_global = next((p["name"] for wk in semanas.values() for d in wk.values() f
 # --- Botão: otimizar todas as semanas/dias
 if st.sidebar.button("🚀 Otimizar todas as rotas com IA"):
     with st.spinner("Otimizando tudo…"):
-        resp = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role":"system","content":"Decida estratégia e tempo (≤300ms)."},
-                {"role":"user","content":f"Otimize todo o roteiro começando em {start_global} para cada dia."}
-            ],
-            functions=[{
-                "name":"optimize_route",
-                "description":"Reordena rota minimizando distância",
-                "parameters":{
-                    "type":"object",
-                    "properties":{
-                        "strategy":{"type":"string","enum":["PATH_CHEAPEST_ARC","PARALLEL_CHEAPEST_INSERTION","AUTOMATIC"]},
-                        "time_limit_ms":{"type":"integer","minimum":0}
-                    },
-                    "required":["strategy","time_limit_ms"]
-                }
-            }],
-            function_call={"name":"optimize_route"}
-        )
+        with chamada_externa("llm", "gpt-3.5-turbo"):
+            resp = openai.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role":"system","content":"Decida estratégia e tempo (≤300ms)."},
+                    {"role":"user","content":f"Otimize todo o roteiro começando em {start_global} para cada dia."}
+                ],
+                functions=[{
+                    "name":"optimize_route",
+                    "description":"Reordena rota minimizando distância",
+                    "parameters":{
+                        "type":"object",
+                        "properties":{
+                            "strategy":{"type":"string","enum":["PATH_CHEAPEST_ARC","PARALLEL_CHEAPEST_INSERTION","AUTOMATIC"]},
+                            "time_limit_ms":{"type":"integer","minimum":0}
+                        },
+                        "required":["strategy","time_limit_ms"]
+                    }
+                }],
+                function_call={"name":"optimize_route"}
+            )
         args = json.loads(resp.choices[0].message.function_call.arguments)
-        total = sum(len(d) for d in semanas.values())
-        bar   = st.progress(0)
-        cnt   = 0
+        # um único VRP (um veículo por dia): clientes podem trocar de dia
+        chaves, dias_atuais, por_id = [], [], {}
         for wk, dias in semanas.items():
             for dy, pts in dias.items():
-                if not pts: continue
-                pts2 = pts.copy()
+                # parte da ordem atual do dia (da tela, se já houver, ou do KML)
+                atual = st.session_state.get(f"order_{wk}_{dy}")
+                if not atual or len(atual) != len(pts):
+                    atual = range(len(pts))
+                pts2 = [pts[i] for i in atual]
                 if start_global in [p["name"] for p in pts2]:
                     j = next(i for i, p in enumerate(pts2) if p["name"] == start_global)
-                    pts2[0], pts2[j] = pts2[j], pts2[0]
-                ids = optimize_route(
-                    [{"id":p["name"],"lat":p["lat"],"lon":p["lon"]} for p in pts2],
-                    strategy=args["strategy"],
-                    time_limit_ms=args["time_limit_ms"]
-                )
-                mp = {p["name"]: i for i, p in enumerate(pts2)}
-                st.session_state[f"order_{wk}_{dy}"] = [mp[nm] for nm in ids]
-                cnt += 1; bar.progress(cnt/total)
-        st.success("✅ Todas as rotas otimizadas!")
+                    pts2.insert(0, pts2.pop(j))
+                dia = []
+                for i, p in enumerate(pts2):
+                    pid = f"{wk}|{dy}|{i}"
+                    por_id[pid] = p
+                    dia.append({"id": pid, "lat": p["lat"], "lon": p["lon"]})
+                chaves.append((wk, dy))
+                dias_atuais.append(dia)
+        n_dias = sum(1 for d in dias_atuais if d)
+        res, stats = optimize_days(
+            dias_atuais,
+            strategy=args["strategy"],
+            time_limit_ms=max(1000, args["time_limit_ms"] * n_dias),
+            return_stats=True
+        )
+        # fora da capacidade/jornada: inseridos onde custa menos, mas avisados
+        st.session_state["nao_atendidos"] = (
+            kml_hash, [por_id[i]["name"] for i in stats.get("nao_atendidos", [])]
+        )
+        novas = {}
+        for (wk, dy), ids in zip(chaves, res):
+            novas.setdefault(wk, {})[dy] = [por_id[i] for i in ids]
+            st.session_state[f"order_{wk}_{dy}"] = list(range(len(ids)))
+        st.session_state["semanas_otimizadas"] = (kml_hash, novas)
+        st.rerun()
 
 # --- Monta CSV unificado (com proteção de índice e só o CÓDIGO do cliente)
 def extrair_cod_cliente(name):
@@ -343,3 +353,5 @@ st.sidebar.markdown("---")
 if st.sidebar.button("📏 Salvar KML Ajustado"):
     kb = build_kml(placemarks, visible)
     st.sidebar.download_button("📅 Baixar KML", kb, f"rota_{sem_sel}_{dia_sel}.kml", "application/vnd.google-earth.kml+xml")
+
+painel_streamlit(st)
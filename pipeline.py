@@ -0,0 +1,108 @@
+"""
+Pipeline da tela principal (app.py): CSV enviado → rota → exportações, com
+os artefatos guardados em disco pela chave (sha256 do arquivo + parâmetros).
+Reenviar o mesmo CSV com os mesmos parâmetros (e a mesma configuração do
+.env) não recalcula nada. O cache é um CacheSQLite próprio
+(.cache/pipeline.sqlite), com TTL e remoção LRU.
+"""
+import hashlib
+import io
+import os
+from typing import Dict, Optional
+
+from export_route_kmlcsv import exportar_kml_csv, tabela_do_df
+from instrumentation import contar
+from day_solvers import ORS_MAX_JOBS, ORS_PERFIL
+from jornada import jornada_s
+from ors_cache import cache_do_env, chave
+from run_route import gerar_rota
+
+VERSAO = 2   # suba ao mudar o algoritmo ou o formato dos artefatos
+
+
+def cache_pipeline():
+    """
+    Cache de artefatos do .env: PIPELINE_CACHE, PIPELINE_CACHE_PATH, _TTL_DIAS,
+    _MAX_MB. Os artefatos são grandes: o limite de tamanho é verificado a
+    cada gravação.
+    """
+    return cache_do_env("PIPELINE_CACHE", "pipeline.sqlite", 500, evict_cada=1)
+
+
+def configuracao() -> Dict:
+    """Configurações do .env que mudam a rota gerada (entram na chave)."""
+    return {
+        "jornada": jornada_s(),
+        "ors_max_jobs": int(os.getenv("ORS_MAX_JOBS", ORS_MAX_JOBS)),
+        "ors_perfil": ORS_PERFIL,
+        "ors_base_url": os.getenv("ORS_BASE_URL"),
+    }
+
+
+def chave_entrada(dados: bytes, **params) -> str:
+    """
+    Chave do pipeline: conteúdo do arquivo + parâmetros + configuração do
+    .env + versão. Mudar a jornada ou o servidor ORS gera outra chave, em
+    vez de servir a rota antiga.
+    """
+    return chave("pipeline", versao=VERSAO, arquivo=hashlib.sha256(dados).hexdigest(),
+                 config=configuracao(), **params)
+
+
+def processar_csv(dados: bytes, max_concorrencia: Optional[int] = None,
+                  refazer: bool = False, **params) -> Dict:
+    """
+    Gera (ou recupera do cache) a rota de um CSV em memória. `params` vão
+    para o gerar_rota (ex.: num_semanas) e entram na chave; max_concorrencia
+    só muda a velocidade, não o resultado, e fica fora dela. Com `refazer`,
+    ignora o que está no cache, recalcula e grava por cima. Retorna
+    {"chave", "rota_json", "full_json", "kml", "csv", "do_cache"}; kml/csv em bytes.
+
+    No cache, KML e CSV ficam como BLOBs crus (chave + ":kml"/":csv") e a
+    rota numa linha JSON à parte, gravada por último: sem ela (ou sem um dos
+    BLOBs, se a remoção LRU levou) o resultado é recalculado.
+    """
+    k = chave_entrada(dados, **params)
+    cache = cache_pipeline()
+    salvo = cache.get(k) if cache and not refazer else None
+    if salvo is not None:
+        kml_bytes, csv_bytes = cache.get_bytes(k + ":kml"), cache.get_bytes(k + ":csv")
+        if kml_bytes is not None and csv_bytes is not None:
+            contar("cache", tipo="pipeline", resultado="hit")
+            return {
+                "chave": k,
+                "rota_json": salvo["rota_json"],
+                "full_json": salvo["full_json"],
+                "kml": kml_bytes,
+                "csv": csv_bytes,
+                "do_cache": True,
+            }
+    contar("cache", tipo="pipeline", resultado="miss")
+
+    df_rota, rota_json, full_json = gerar_rota(io.BytesIO(dados), max_concorrencia=max_concorrencia, **params)
+    kml_bytes, csv_bytes = exportar_kml_csv(rota_json, tabela_do_df(df_rota))
+    if cache:
+        cache.put_bytes(k + ":kml", "pipeline_kml", kml_bytes)
+        cache.put_bytes(k + ":csv", "pipeline_csv", csv_bytes)
+        cache.put(k, "pipeline", {"rota_json": rota_json, "full_json": full_json})
+    return {
+        "chave": k,
+        "rota_json": rota_json,
+        "full_json": full_json,
+        "kml": kml_bytes,
+        "csv": csv_bytes,
+        "do_cache": False,
+    }
+
+
+def verificacao_salva(k: str) -> Optional[str]:
+    """Texto da verificação IA já feita para a rota da chave `k` (ou None)."""
+    cache = cache_pipeline()
+    return cache.get(k + ":verificacao") if cache else None
+
+
+def salvar_verificacao(k: str, texto: str):
+    """Guarda a verificação da rota `k`; erros do LLM não são guardados."""
+    cache = cache_pipeline()
+    if cache and texto and not texto.startswith("Erro"):
+        cache.put(k + ":verificacao", "verificacao", texto)
@@ -0,0 +1,201 @@
+"""
+Atualização incremental de um plano já gerado (rota.json + agenda_full.json):
+remove clientes, insere os novos pela inserção mais barata e re-sequencia
+só os dias tocados — sem reler o CSV inteiro nem refazer os outros dias.
+
+    python plan_update.py --adicionar novos.csv --remover 123,456
+    python plan_update.py --remover 789 --solver ortools
+"""
+import argparse
+import json
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from day_solvers import SOLVERS, resolver_dias
+from export_route_kmlcsv import ROUTE_COLUMNS, tabela_rota
+from processor.client_table import load_clients
+from route_matrix import insercao_mais_barata
+from run_route import montar_agenda
+
+load_dotenv()
+
+
+def _visita(c: Dict) -> Dict:
+    """Registro de cliente (formato de `clientes`) → visita do rota_json."""
+    return {
+        "id": c["cod_cliente"],
+        "nome": c["nome"],
+        "latitude": c["latitude"],
+        "longitude": c["longitude"]
+    }
+
+
+def remover_clientes(rota_json: List[Dict], ids: Iterable[str]) -> Tuple[List[Dict], Set[int]]:
+    """
+    Tira as visitas de `ids`; o dia só fecha o buraco. Retorna (rota, dias
+    alterados). O 1º cliente de cada dia é o seu ponto de partida (e de
+    chegada) no re-sequenciamento: se ele sai, o seguinte passa a ser a
+    partida do dia. A inserção nunca troca a partida (entra depois dela).
+    """
+    ids = {str(i) for i in ids}
+    nova, afetados = [], set()
+    for day in rota_json:
+        visitas = [v for v in day["visitas"] if str(v["id"]) not in ids]
+        if len(visitas) != len(day["visitas"]):
+            afetados.add(day["dia"])
+        nova.append({**day, "visitas": visitas})
+    return nova, afetados
+
+
+def _melhor_insercao(rota_json: List[Dict], lat: float, lon: float,
+                     max_visitas: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Posição de menor acréscimo de distância, com cada dia visto como circuito
+    (o último volta ao primeiro, como no ORS): route_matrix.insercao_mais_barata.
+    Dias lotados (`max_visitas`) ficam de fora; dias vazios só se não houver outro.
+    Retorna (posição do dia em rota_json, índice de inserção).
+    """
+    return insercao_mais_barata(
+        [([v["latitude"] for v in day["visitas"]], [v["longitude"] for v in day["visitas"]])
+         for day in rota_json],
+        lat, lon, max_visitas
+    )
+
+
+def inserir_clientes(rota_json: List[Dict], novos: Iterable[Dict],
+                     max_visitas: Optional[int] = None) -> Tuple[List[Dict], Set[int]]:
+    """Insere cada cliente novo (um a um) na posição mais barata. Retorna (rota, dias alterados)."""
+    nova = [{**day, "visitas": list(day["visitas"])} for day in rota_json]
+    afetados = set()
+    for c in novos:
+        d, k = _melhor_insercao(nova, c["latitude"], c["longitude"], max_visitas)
+        nova[d]["visitas"].insert(k, _visita(c))
+        afetados.add(nova[d]["dia"])
+    return nova, afetados
+
+
+def resequenciar(rota_json: List[Dict], dias: Iterable[int], extras: Optional[Dict[str, Dict]] = None,
+                 solver: str = "ors", max_concorrencia: Optional[int] = None,
+                 tempo_ms: int = 1000) -> List[Dict]:
+    """
+    Re-sequencia só os `dias` indicados com o solver de dias (o 1º cliente
+    de cada dia continua sendo o ponto de partida). `extras`: atributos de
+    roteamento por id ("servico", "janela") que a visita não guarda.
+    """
+    extras = extras or {}
+    dias = set(dias)
+    alvo = [i for i, day in enumerate(rota_json) if day["dia"] in dias and day["visitas"]]
+    if not alvo:
+        return rota_json
+    clientes, slices = [], []
+    for i in alvo:
+        ini = len(clientes)
+        for v in rota_json[i]["visitas"]:
+            clientes.append({**v, **extras.get(str(v["id"]), {})})
+        slices.append(list(range(ini, len(clientes))))
+    ordens = resolver_dias(slices, clientes, solver=solver,
+                           max_concorrencia=max_concorrencia, tempo_ms=tempo_ms)
+    nova = list(rota_json)
+    for i, day, ordem in zip(alvo, slices, ordens):
+        visitas = rota_json[i]["visitas"]
+        nova[i] = {**rota_json[i], "visitas": [visitas[k - day[0]] for k in ordem]}
+    return nova
+
+
+def atualizar_rota(
+    rota_json: List[Dict],
+    adicionados: Iterable[Dict] = (),
+    removidos: Iterable[str] = (),
+    solver: Optional[str] = "ors",
+    max_visitas: Optional[int] = None,
+    max_concorrencia: Optional[int] = None,
+    tempo_dia_ms: int = 1000,
+    clientes: Iterable[Dict] = ()
+) -> Tuple[List[Dict], List[int]]:
+    """
+    Aplica a mudança na carteira a um rota_json existente:
+      adicionados: registros de cliente (formato de `clientes` do gerar_rota);
+                   um id que já está no plano é tratado como mudança de endereço
+      removidos:   códigos de cliente a tirar
+      solver:      re-sequenciamento dos dias tocados ("ors", "ortools",
+                   "heuristica") ou None para ficar só com o reparo local
+      max_visitas: limite de visitas por dia na inserção
+      clientes:    registros dos clientes já no plano (full_json["clientes"]),
+                   para o re-sequenciamento manter o atendimento e a janela
+                   de quem continua nos dias tocados
+    Retorna (novo rota_json, dias alterados).
+    """
+    adicionados = list(adicionados)
+    remover = {str(i) for i in removidos} | {str(c["cod_cliente"]) for c in adicionados}
+    rota, afetados = remover_clientes(rota_json, remover)
+    rota, inseridos = inserir_clientes(rota, adicionados, max_visitas)
+    afetados |= inseridos
+    if solver:
+        # os novos vêm por último: sobrescrevem o registro antigo do mesmo id
+        extras = {
+            str(c["cod_cliente"]): {k: c[k] for k in ("servico", "janela") if c.get(k) is not None}
+            for c in list(clientes) + adicionados
+        }
+        rota = resequenciar(rota, afetados, extras, solver=solver,
+                            max_concorrencia=max_concorrencia, tempo_ms=tempo_dia_ms)
+    return rota, sorted(afetados)
+
+
+def atualizar_plano(
+    full_json: Dict,
+    rota_json: List[Dict],
+    adicionados: Iterable[Dict] = (),
+    removidos: Iterable[str] = (),
+    **kwargs
+) -> Tuple[pd.DataFrame, List[Dict], Dict]:
+    """
+    atualizar_rota + lista de clientes e agenda: mesmo retorno do
+    gerar_rota (df_rota, rota_json, full_json).
+    """
+    adicionados = list(adicionados)
+    rota, _ = atualizar_rota(rota_json, adicionados, removidos,
+                             clientes=full_json.get("clientes", []), **kwargs)
+    fora = {str(i) for i in removidos} | {str(c["cod_cliente"]) for c in adicionados}
+    clientes = [c for c in full_json.get("clientes", []) if str(c["cod_cliente"]) not in fora]
+    clientes += adicionados
+    full = {**full_json, "clientes": clientes, "agenda": montar_agenda(rota)}
+    df_rota = pd.DataFrame(tabela_rota(rota), columns=ROUTE_COLUMNS)
+    return df_rota, rota, full
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Atualiza rota.json/agenda_full.json sem gerar tudo de novo.")
+    parser.add_argument("--rota", default="rota.json")
+    parser.add_argument("--agenda", default="agenda_full.json")
+    parser.add_argument("--adicionar", metavar="CSV", default=None,
+                        help="CSV com os clientes novos (mesmo formato do run_route)")
+    parser.add_argument("--remover", default="", help="códigos separados por vírgula")
+    parser.add_argument("--solver", choices=SOLVERS + ("nenhum",), default="ors",
+                        help="re-sequenciamento dos dias alterados (nenhum = só inserção/remoção)")
+    parser.add_argument("--max-visitas", type=int, default=None, help="limite de visitas por dia")
+    parser.add_argument("--tempo-dia-ms", type=int, default=1000)
+    args = parser.parse_args()
+
+    with open(args.rota, encoding="utf-8") as f:
+        rota_json = json.load(f)
+    try:
+        with open(args.agenda, encoding="utf-8") as f:
+            full_json = json.load(f)
+    except FileNotFoundError:
+        full_json = {"clientes": []}
+    novos = load_clients(args.adicionar).registros() if args.adicionar else []
+    removidos = [c.strip() for c in args.remover.split(",") if c.strip()]
+
+    df_rota, rota_json, full_json = atualizar_plano(
+        full_json, rota_json, novos, removidos,
+        solver=None if args.solver == "nenhum" else args.solver,
+        max_visitas=args.max_visitas,
+        tempo_dia_ms=args.tempo_dia_ms
+    )
+    print(f"✅ {len(novos)} inseridos, {len(removidos)} removidos; {len(df_rota)} visitas no plano.")
+    with open(args.rota, "w", encoding="utf-8") as f:
+        json.dump(rota_json, f, ensure_ascii=False, indent=2)
+    with open(args.agenda, "w", encoding="utf-8") as f:
+        json.dump(full_json, f, ensure_ascii=False, indent=2)
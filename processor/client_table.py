@@ -0,0 +1,194 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from jornada import SERVICO_PADRAO_S
+
+COLUNAS = ["codcli", "nomcli", "clilatitude", "clilongitude"]
+# opcionais: atendimento (min) e horário de funcionamento ("HH:MM")
+OPCIONAIS = ["cliservico", "cliabertura", "clifechamento"]
+DTYPES = {c: "string" for c in COLUNAS + OPCIONAIS}
+DIA_S = 24 * 3600
+
+
+class ClientTable:
+    """
+    Clientes como struct-of-arrays: cod e nome (object/str), latitude e
+    longitude (float64), já filtrados. Usado pelo roteador (run_route) e
+    pelo construtor de documentos (excel_to_docs).
+    servico: atendimento em s (int64); abre/fecha: janela de horário em s
+    desde 0h (float64, NaN = sem janela).
+    """
+
+    __slots__ = ("cod", "nome", "lat", "lon", "servico", "abre", "fecha")
+
+    def __init__(self, cod, nome, lat, lon, servico=None, abre=None, fecha=None):
+        self.cod = np.asarray(cod, dtype=object)
+        self.nome = np.asarray(nome, dtype=object)
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        n = len(self.cod)
+        self.servico = np.full(n, SERVICO_PADRAO_S, dtype=np.int64) if servico is None \
+            else np.asarray(servico, dtype=np.int64)
+        self.abre = np.full(n, np.nan) if abre is None else np.asarray(abre, dtype=np.float64)
+        self.fecha = np.full(n, np.nan) if fecha is None else np.asarray(fecha, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.cod)
+
+    def janelas(self) -> List[Optional[List[int]]]:
+        """[abre, fecha] de cada cliente (None sem horário informado)."""
+        tem = ~(np.isnan(self.abre) & np.isnan(self.fecha))
+        abre = np.where(np.isnan(self.abre), 0, self.abre).astype(np.int64)
+        fecha = np.where(np.isnan(self.fecha), DIA_S, self.fecha).astype(np.int64)
+        return [[a, f] if t else None for t, a, f in zip(tem.tolist(), abre.tolist(), fecha.tolist())]
+
+    def registros(self) -> List[Dict]:
+        """Lista de dicts no formato de `clientes` do gerar_rota."""
+        return [
+            {"cod_cliente": c, "nome": n, "latitude": la, "longitude": lo, "servico": s, "janela": j}
+            for c, n, la, lo, s, j in zip(self.cod.tolist(), self.nome.tolist(),
+                                          self.lat.tolist(), self.lon.tolist(),
+                                          self.servico.tolist(), self.janelas())
+        ]
+
+
+def _horas_s(serie: pd.Series) -> np.ndarray:
+    """
+    Coluna "HH:MM[:SS]" (ou só a hora, ex.: "9" = 09:00) → segundos desde
+    0h; NaN se vazio/inválido.
+    """
+    if len(serie) == 0:
+        return np.full(0, np.nan)
+    partes = serie.str.strip().str.split(":", expand=True)
+    num = [pd.to_numeric(partes[c], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+           for c in partes.columns][:3]
+    if len(num) == 1:
+        return num[0] * 3600
+    seg = num[2] if len(num) > 2 else np.zeros(len(serie))
+    s = num[0] * 3600 + num[1] * 60 + np.where(np.isnan(seg), 0, seg)
+    # sem ":" (só um número) é a hora cheia
+    return np.where(np.isnan(num[1]), num[0] * 3600, s)
+
+
+def _codigos(cod: pd.Series, modo: str, tem_vazio: bool) -> np.ndarray:
+    """
+    Códigos de cliente (texto, já sem espaços nas pontas) no formato pedido:
+      "inteiro":  str(int(...)) como o roteador sempre fez ("00123" e
+                  "123.0" → "123"); código não numérico levanta ValueError
+      "inferido": como o pandas leria a coluna: numérica → "123" (ou
+                  "123.0", se a coluna tem código vazio); com algum texto,
+                  tudo fica como está. É o que os documentos sempre usaram
+      "texto":    como está no arquivo, só sem um ".0" no fim (zeros à
+                  esquerda e letras são mantidos)
+    """
+    if modo == "texto":
+        return cod.str.replace(r"\.0+$", "", regex=True).to_numpy(dtype=object)
+    num = pd.to_numeric(cod, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    texto = np.isnan(num)
+    if modo == "inteiro":
+        if texto.any():
+            raise ValueError(f"Códigos de cliente não numéricos: {cod[texto].head(5).tolist()}")
+        return np.array([str(int(x)) for x in num.tolist()], dtype=object)
+    if modo == "inferido":
+        if texto.any():
+            return cod.to_numpy(dtype=object)
+        if tem_vazio or (num != np.floor(num)).any():
+            return np.array([str(x) for x in num.tolist()], dtype=object)
+        return np.array([str(int(x)) for x in num.tolist()], dtype=object)
+    raise ValueError(f"Formato de código desconhecido: {modo!r} (use 'inteiro', 'inferido' ou 'texto')")
+
+
+def _filtrar(df: pd.DataFrame, exigir_nome: bool, zero: str, faixa: bool, codigo: str) -> pd.DataFrame:
+    lat = pd.to_numeric(df["clilatitude"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    lon = pd.to_numeric(df["clilongitude"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    cod = df["codcli"].str.strip()
+    ok = cod.notna().to_numpy() & (cod != "").fillna(False).to_numpy()
+    tem_vazio = not ok.all()
+    ok &= ~np.isnan(lat) & ~np.isnan(lon)
+    if faixa:
+        ok &= (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+    if zero == "qualquer":
+        ok &= (lat != 0) & (lon != 0)
+    else:
+        ok &= ~((lat == 0) & (lon == 0))
+    if exigir_nome:
+        ok &= df["nomcli"].notna().to_numpy()
+    servico = pd.to_numeric(df["cliservico"], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan) * 60
+    servico = np.where(np.isnan(servico), SERVICO_PADRAO_S, servico)
+    return pd.DataFrame({
+        "cod": _codigos(cod[ok], codigo, tem_vazio),
+        "nome": df["nomcli"][ok].fillna("").str.strip().to_numpy(dtype=object),
+        "lat": lat[ok],
+        "lon": lon[ok],
+        "servico": servico[ok].astype(np.int64),
+        "abre": _horas_s(df["cliabertura"])[ok],
+        "fecha": _horas_s(df["clifechamento"])[ok],
+    })
+
+
+def load_clients(
+    fonte,
+    exigir_nome: bool = True,
+    zero: str = "qualquer",
+    engine: Optional[str] = None,
+    chunksize: Optional[int] = None,
+    faixa: bool = False,
+    codigo: str = "inteiro"
+) -> ClientTable:
+    """
+    Lê o CSV de clientes (caminho ou arquivo/buffer) só com as colunas
+    necessárias, como texto, e filtra coordenadas de forma vetorizada:
+    descarta código/coordenada ausente ou inválida.
+    Colunas opcionais: cliservico (atendimento, min) e cliabertura /
+    clifechamento (horário, "HH:MM").
+
+    exigir_nome: descarta linhas sem nomcli (o roteador exige; docs não)
+    zero:        "qualquer" descarta lat==0 ou lon==0; "ambos" só (0, 0)
+    engine:      engine do pandas (ex.: "pyarrow" para arquivos grandes)
+    chunksize:   lê em blocos de N linhas (memória limitada); no modo
+                 "inferido", cada bloco é inferido à parte
+    faixa:       também descarta |lat| > 90 ou |lon| > 180
+    codigo:      formato do código do cliente (_codigos): "inteiro" (padrão,
+                 o do roteador), "inferido" (o dos documentos) ou "texto"
+    """
+    kwargs = dict(usecols=lambda c: c in DTYPES, dtype=DTYPES)
+    if engine == "pyarrow":
+        # o engine pyarrow não aceita usecols chamável nem leitura em blocos
+        kwargs = dict(engine="pyarrow", dtype=DTYPES, usecols=[c for c in _cabecalho(fonte) if c in DTYPES])
+        chunksize = None
+    elif engine:
+        kwargs["engine"] = engine
+
+    if chunksize:
+        partes = [
+            _filtrar(_completar(bloco), exigir_nome, zero, faixa, codigo)
+            for bloco in pd.read_csv(fonte, chunksize=chunksize, **kwargs)
+        ]
+        if not partes:
+            return ClientTable([], [], [], [])
+        df = pd.concat(partes, ignore_index=True)
+    else:
+        df = _filtrar(_completar(pd.read_csv(fonte, **kwargs)), exigir_nome, zero, faixa, codigo)
+    return ClientTable(df["cod"], df["nome"], df["lat"], df["lon"],
+                       df["servico"], df["abre"], df["fecha"])
+
+
+def _cabecalho(fonte) -> List[str]:
+    """Nomes das colunas do CSV (volta o buffer ao início, se for arquivo)."""
+    pos = fonte.tell() if hasattr(fonte, "tell") else None
+    colunas = list(pd.read_csv(fonte, nrows=0).columns)
+    if pos is not None:
+        fonte.seek(pos)
+    return colunas
+
+
+def _completar(df: pd.DataFrame) -> pd.DataFrame:
+    """Garante todas as colunas (nomcli e as opcionais podem faltar)."""
+    faltando = [c for c in COLUNAS + OPCIONAIS if c not in df.columns]
+    if "codcli" in faltando or "clilatitude" in faltando or "clilongitude" in faltando:
+        raise KeyError(f"CSV de clientes sem as colunas obrigatórias: {faltando}")
+    for c in faltando:
+        df[c] = pd.Series(pd.NA, index=df.index, dtype="string")
+    return df[COLUNAS + OPCIONAIS].astype("string")
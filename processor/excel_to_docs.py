@@ -1,29 +1,22 @@
-import pandas as pd
 from langchain.schema import Document
 
+from processor.client_table import load_clients
+
 def excel_para_docs(caminho: str) -> list[Document]:
     
-    df = pd.read_csv(caminho)
+    # só (0, 0) é descartado aqui; o nome não é obrigatório para os docs e
+    # o código fica como o pandas o lê (ex.: "123.0" numa coluna com vazios)
+    tabela = load_clients(caminho, exigir_nome=False, zero="ambos", codigo="inferido")
 
     docs: list[Document] = []
-    for _, row in df.iterrows():
-        cod = row["codcli"]
-        lat = row["clilatitude"]
-        lon = row["clilongitude"]
-
-        if pd.isna(cod) or pd.isna(lat) or pd.isna(lon):
-            continue
-
-        if lat == 0 and lon == 0:
-            continue
-
+    for cod, lat, lon in zip(tabela.cod.tolist(), tabela.lat.tolist(), tabela.lon.tolist()):
         texto = (
             f"Cliente: {cod}\n"
             f"Latitude: {lat}\n"
             f"Longitude: {lon}\n"
         )
         metadata = {
-            "cod_cliente": str(cod).strip(),
+            "cod_cliente": cod,
             "latitude": float(lat),
             "longitude": float(lon),
         }
@@ -1,6 +1,8 @@
 import os
-import math
 import json
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, Future
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,41 +10,116 @@ load_dotenv()
 from langchain_groq import ChatGroq
 import openrouteservice
 
+from instrumentation import chamada_externa, contar, span
+from ors_cache import cache_do_env, chave, com_cache
+from route_checks import AnaliseRota, Issue
+from route_matrix import haversine_km
+
+LLM_MODEL = "llama3-8b-8192"
+FEEDBACK_MEM_MAX = 256   # respostas do LLM guardadas em memória sem o cache em disco
+
+# Explicações determinísticas para os tipos de problema já conhecidos
+TEMPLATES = {
+    "salto": (
+        "Saltos longos dentro do mesmo dia:\n{itens}\n"
+        "Causa provável: coordenada errada no cadastro (latitude/longitude trocadas, "
+        "sinal invertido ou geocodificação falha) ou cliente de outra região "
+        "agrupado no dia.\n"
+        "Sugestão: conferir as coordenadas dos clientes citados; se estiverem "
+        "corretas, mover o cliente para um dia da sua região ou gerar a rota "
+        "com particao=\"clusters\"."
+    ),
+    "ors": (
+        "Tempo ORS muito diferente da estimativa em linha reta:\n{itens}\n"
+        "Causa provável: barreira geográfica (rio, serra, rodovia sem acesso) ou "
+        "ponto fora da malha viária, forçando um desvio na rota real.\n"
+        "Sugestão: conferir se as coordenadas caem sobre uma via acessível e "
+        "considerar o tempo do ORS ao dimensionar o dia."
+    ),
+}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="verify")
+
+# fallback quando o cache persistente está desligado: LRU do processo
+_feedback_mem = OrderedDict()
+_feedback_lock = threading.Lock()
+
+
+def cache_feedback():
+    """
+    Cache das respostas do LLM, separado do das respostas ORS:
+    FEEDBACK_CACHE (true/false), FEEDBACK_CACHE_PATH, _TTL_DIAS, _MAX_MB.
+    None se desligado.
+    """
+    return cache_do_env("FEEDBACK_CACHE", "feedback.sqlite", 20)
+
+
+def _mem_get(k):
+    with _feedback_lock:
+        texto = _feedback_mem.get(k)
+        if texto is not None:
+            _feedback_mem.move_to_end(k)
+        return texto
+
+
+def _mem_put(k, texto):
+    with _feedback_lock:
+        _feedback_mem[k] = texto
+        _feedback_mem.move_to_end(k)
+        while len(_feedback_mem) > FEEDBACK_MEM_MAX:
+            _feedback_mem.popitem(last=False)
+
+
+def explicar_por_regra(issues):
+    """
+    Explicação templada quando todos os problemas são de tipos conhecidos;
+    None se houver algum caso novo (que precisa do LLM).
+    """
+    por_tipo = defaultdict(list)
+    for i in issues:
+        if i.tipo not in TEMPLATES:
+            return None
+        por_tipo[i.tipo].append(f"- {i}")
+    return "\n\n".join(
+        TEMPLATES[t].format(itens="\n".join(itens)) for t, itens in por_tipo.items()
+    )
+
+
+def chave_issues(issues) -> str:
+    """Hash estável da lista de problemas (ordem e casas decimais normalizadas)."""
+    normal = sorted(
+        (i.tipo, i.dia, str(i.origem), str(i.destino), round(i.valor, 1), round(i.referencia, 1))
+        for i in issues
+    )
+    return chave("llm", modelo=LLM_MODEL, issues=normal)
+
+
 class RouteVerifier:
-    def __init__(self):
+    def __init__(self, usar_templates: bool = True):
+        self.usar_templates = usar_templates
         self.ors_api_key = os.getenv("ORS_API_KEY")
-        self.ors = openrouteservice.Client(key=self.ors_api_key) if self.ors_api_key else None
+        self.ors = com_cache(openrouteservice.Client(key=self.ors_api_key)) if self.ors_api_key else None
         self.llm = ChatGroq(
             groq_api_key=os.getenv("GROQ_API_KEY"),
-            model_name="llama3-8b-8192",
+            model_name=LLM_MODEL,
             temperature=0.0
         )
 
     @staticmethod
     def haversine(coord1, coord2):
-        R = 6371
-        lat1, lon1 = coord1
-        lat2, lon2 = coord2
-        φ1, φ2 = math.radians(lat1), math.radians(lat2)
-        dφ = math.radians(lat2 - lat1)
-        dλ = math.radians(lon2 - lon1)
-        a = math.sin(dφ/2)**2 + math.cos(φ1)*math.cos(φ2)*math.sin(dλ/2)**2
-        return R * 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-
-    def check_sequence(self, rota):
-        issues = []
-        for day in rota:
-            visitas = day.get('visitas', [])
-            for i in range(len(visitas)-1):
-                c1 = (visitas[i]['latitude'], visitas[i]['longitude'])
-                c2 = (visitas[i+1]['latitude'], visitas[i+1]['longitude'])
-                dist = self.haversine(c1, c2)
-                if dist > 100:
-                    issues.append(f"Dia {day['dia']}: salto de {dist:.1f} km entre {visitas[i]['id']} e {visitas[i+1]['id']}")
-        return issues
+        return float(haversine_km(coord1[0], coord1[1], coord2[0], coord2[1]))
+
+    def check_issues(self, rota, incluir_outliers=False):
+        """Lista de Issue (saltos > 100 km e, opcionalmente, trechos atípicos)."""
+        return AnaliseRota(rota, max_salto_km=100).issues(incluir_outliers=incluir_outliers)
+
+    def check_sequence(self, rota, incluir_outliers=False):
+        """Os mesmos problemas de check_issues, como texto (formato de sempre)."""
+        return [str(i) for i in self.check_issues(rota, incluir_outliers)]
 
+    @span("verificacao")
     def verify(self, rota):
-        issues = self.check_sequence(rota)
+        issues = self.check_issues(rota)
 
         # ORS check se disponível
         if self.ors and rota and rota[0].get('visitas', []):
@@ -58,17 +135,56 @@ class RouteVerifier:
                     (first_two[1]['latitude'], first_two[1]['longitude'])
                 ) / 40 * 60
                 if abs(dur/60 - d_hav) > 30:
-                    issues.append(
-                        f"Inconsistência entre {first_two[0]['id']} e {first_two[1]['id']}: "
-                        f"ORS {dur/60:.1f}min vs haversine {d_hav:.1f}min"
-                    )
+                    issues.append(Issue(
+                        "ors", rota[0]['dia'], first_two[0]['id'], first_two[1]['id'],
+                        dur/60, d_hav
+                    ))
 
         if not issues:
             return "Rota validada sem inconsistências detectadas."
 
-        print("👉 UTILIZANDO A IA LLM para verificar erros e sugerir correções…")
+        return self.feedback(issues)
+
+    def verify_async(self, rota) -> Future:
+        """
+        Roda verify() em segundo plano; a UI pode mostrar a rota e só depois
+        esperar o Future com o feedback.
+        """
+        return _executor.submit(self.verify, rota)
+
+    def feedback(self, issues):
+        """
+        Texto de feedback para a lista de problemas: template determinístico
+        para tipos conhecidos, senão LLM — com cache pela chave das issues.
+        Com os templates ligados, só chegam ao LLM listas com algum tipo sem
+        template (ex.: "outlier", de check_issues(incluir_outliers=True)).
+        """
+        if self.usar_templates:
+            texto = explicar_por_regra(issues)
+            if texto is not None:
+                contar("feedback", origem="template")
+                return texto
+
+        k = chave_issues(issues)
+        cache = cache_feedback()
+        texto = cache.get(k) if cache else _mem_get(k)
+        if texto is not None:
+            contar("feedback", origem="cache")
+            return texto
 
-        summary = "\n".join(issues)
+        contar("feedback", origem="llm")
+        try:
+            texto = self._llm_feedback(issues)
+        except Exception as e:
+            return f"Erro LLM na verificação: {e}"
+        if cache:
+            cache.put(k, "llm", texto)
+        else:
+            _mem_put(k, texto)
+        return texto
+
+    def _llm_feedback(self, issues):
+        summary = "\n".join(str(i) for i in issues)
         system = (
             "Você é um assistente de validação de rotas. "
             "Aponte as causas dos problemas abaixo e sugira correções."
@@ -77,11 +193,10 @@ class RouteVerifier:
             {"role": "system", "content": system},
             {"role": "user",   "content": f"Problemas:\n{summary}"}
         ]
-        try:
+        with chamada_externa("llm", LLM_MODEL) as c:
             resp = self.llm.invoke(messages)
-            return resp.content
-        except Exception as e:
-            return f"Erro LLM na verificação: {e}"
+            c.bytes = len(resp.content.encode("utf-8"))
+        return resp.content
 
 if __name__ == "__main__":
     rota = json.load(open("rota.json", "r", encoding="utf-8"))
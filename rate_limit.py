@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Limitador token-bucket thread-safe: `taxa_por_min` requisições por
+    minuto em regime, com rajadas de até `rajada` requisições.
+    """
+
+    def __init__(self, taxa_por_min: float, rajada: int = None):
+        self.taxa = taxa_por_min / 60.0
+        self.capacidade = float(rajada if rajada is not None else max(1, int(taxa_por_min // 6)))
+        self.tokens = self.capacidade
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _repor(self, agora):
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+        self.ultimo = agora
+
+    def adquirir(self, n: float = 1.0):
+        """Bloqueia até haver `n` tokens disponíveis e os consome."""
+        while True:
+            with self.lock:
+                self._repor(time.monotonic())
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                espera = (n - self.tokens) / self.taxa
+            time.sleep(espera)
+
+    def __enter__(self):
+        self.adquirir()
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class TokenBucketCompartilhado(TokenBucket):
+    """
+    Token-bucket com o estado num arquivo SQLite: vários processos (ex.: o
+    lote do batch_route) dividem a mesma cota. Usa o relógio de parede,
+    comum a todos, e uma transação IMMEDIATE por tentativa.
+    """
+
+    def __init__(self, path: str, taxa_por_min: float, rajada: int = None, nome: str = "ors"):
+        super().__init__(taxa_por_min, rajada)
+        self.path = path
+        self.nome = nome
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._conectar() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS baldes (nome TEXT PRIMARY KEY, tokens REAL, ultimo REAL)")
+
+    def _conectar(self):
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    def adquirir(self, n: float = 1.0):
+        """Bloqueia até haver `n` tokens no balde compartilhado e os consome."""
+        while True:
+            con = self._conectar()
+            try:
+                con.execute("BEGIN IMMEDIATE")
+                agora = time.time()
+                row = con.execute("SELECT tokens, ultimo FROM baldes WHERE nome = ?", (self.nome,)).fetchone()
+                tokens = self.capacidade if row is None else min(
+                    self.capacidade, row[0] + max(0.0, agora - row[1]) * self.taxa)
+                espera = 0.0 if tokens >= n else (n - tokens) / self.taxa
+                if not espera:
+                    tokens -= n
+                con.execute("INSERT OR REPLACE INTO baldes VALUES (?, ?, ?)", (self.nome, tokens, agora))
+                con.execute("COMMIT")
+            finally:
+                con.close()
+            if not espera:
+                return
+            time.sleep(espera)
+
+
+def limitador_ors() -> TokenBucket:
+    """
+    Limitador com a cota do plano ORS (ORS_REQ_POR_MIN, padrão 40/min).
+    Com ORS_LIMITE_COMPARTILHADO=<arquivo>, a cota é dividida entre todos os
+    processos que apontam para o mesmo arquivo.
+    """
+    taxa = float(os.getenv("ORS_REQ_POR_MIN", 40))
+    path = os.getenv("ORS_LIMITE_COMPARTILHADO")
+    if path:
+        return TokenBucketCompartilhado(path, taxa)
+    return TokenBucket(taxa)
@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from route_matrix import haversine_km
+
+MAX_SALTO_KM = 100.0
+VELOCIDADE_KMH = 40.0
+OUTLIER_Z = 6.0
+
+
+@dataclass(frozen=True)
+class Issue:
+    """Problema encontrado numa rota (um trecho ou um dia)."""
+    tipo: str                      # "salto", "ors", "outlier"
+    dia: int
+    origem: Optional[str] = None
+    destino: Optional[str] = None
+    valor: float = 0.0             # km (salto/outlier) ou min ORS (ors)
+    referencia: float = 0.0        # limite (salto), min haversine (ors), z-score (outlier)
+
+    def __str__(self):
+        if self.tipo == "salto":
+            return f"Dia {self.dia}: salto de {self.valor:.1f} km entre {self.origem} e {self.destino}"
+        if self.tipo == "ors":
+            return (f"Inconsistência entre {self.origem} e {self.destino}: "
+                    f"ORS {self.valor:.1f}min vs haversine {self.referencia:.1f}min")
+        if self.tipo == "outlier":
+            return (f"Dia {self.dia}: trecho atípico de {self.valor:.1f} km entre "
+                    f"{self.origem} e {self.destino} (z={self.referencia:.1f})")
+        return f"Dia {self.dia}: {self.tipo}"
+
+
+class RotaArrays:
+    """
+    A rota inteira como arrays planos (uma posição por visita), montados
+    uma única vez: dia, lat, lon e ids. Os trechos válidos são os pares
+    (k, k+1) dentro da mesma entrada da rota (o mesmo dict de dia), seja
+    qual for a numeração de "dia" (com buracos, fora de ordem ou repetida).
+    """
+
+    def __init__(self, rota: List[Dict]):
+        visitas = [v for day in rota for v in day.get('visitas', [])]
+        n = len(visitas)
+        tamanhos = np.fromiter((len(day.get('visitas', [])) for day in rota), dtype=np.int64, count=len(rota))
+        self.dia = np.repeat(
+            np.fromiter((day['dia'] for day in rota), dtype=np.int64, count=len(rota)),
+            tamanhos
+        )
+        self.entrada = np.repeat(np.arange(len(rota), dtype=np.int64), tamanhos)
+        self.lat = np.fromiter((v['latitude'] for v in visitas), dtype=np.float64, count=n)
+        self.lon = np.fromiter((v['longitude'] for v in visitas), dtype=np.float64, count=n)
+        self.ids = [v['id'] for v in visitas]
+        # trecho k liga a visita k à k+1 (apenas se no mesmo dia)
+        self.trecho = np.flatnonzero(self.entrada[:-1] == self.entrada[1:])
+
+
+def _mediana_por_grupo(grupo, valores):
+    """
+    Mediana de `valores` (>= 0) por grupo. Os grupos vêm contíguos (um dia
+    após o outro), então uma única ordenação por (grupo, valor) resolve.
+    Retorna (medianas, índice do grupo de cada valor).
+    """
+    if not len(valores):
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    inv = np.concatenate([[0], np.cumsum(grupo[1:] != grupo[:-1])])
+    cont = np.bincount(inv)
+    ordem = np.argsort(inv * (float(valores.max()) + 1.0) + valores, kind="stable")
+    ordenados = valores[ordem]
+    inicio = np.concatenate([[0], np.cumsum(cont)[:-1]])
+    baixo = ordenados[inicio + (cont - 1) // 2]
+    alto = ordenados[inicio + cont // 2]
+    return (baixo + alto) / 2, inv
+
+
+class AnaliseRota:
+    """
+    Todas as métricas de uma rota numa única passada vetorizada:
+    distância e duração estimada de cada trecho, saltos, totais por dia e
+    z-score robusto (mediana/MAD do dia) de cada trecho.
+    """
+
+    def __init__(self, rota: List[Dict], max_salto_km: float = MAX_SALTO_KM,
+                 velocidade_kmh: float = VELOCIDADE_KMH):
+        arr = RotaArrays(rota)
+        self.arr = arr
+        k = arr.trecho
+        self.km = haversine_km(arr.lat[k], arr.lon[k], arr.lat[k + 1], arr.lon[k + 1])
+        self.minutos = self.km / velocidade_kmh * 60
+        self.dia = arr.dia[k]
+        self.salto = self.km > max_salto_km
+        self.max_salto_km = max_salto_km
+
+        self.dias = np.unique(arr.dia)
+        pos = np.searchsorted(self.dias, self.dia)
+        self.km_dia = np.bincount(pos, weights=self.km, minlength=len(self.dias))
+        self.minutos_dia = np.bincount(pos, weights=self.minutos, minlength=len(self.dias))
+        self.visitas_dia = np.bincount(np.searchsorted(self.dias, arr.dia), minlength=len(self.dias))
+
+        entrada = arr.entrada[k]
+        med, inv = _mediana_por_grupo(entrada, self.km)
+        dev = np.abs(self.km - med[inv])
+        mad, _ = _mediana_por_grupo(entrada, dev)
+        escala = 1.4826 * mad[inv]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.z = np.where(escala > 0, dev / escala, 0.0)
+
+    def issues(self, incluir_outliers: bool = False, z_limite: float = OUTLIER_Z) -> List[Issue]:
+        """Registros de problema: saltos e, opcionalmente, trechos atípicos."""
+        ids, k = self.arr.ids, self.arr.trecho
+        out = []
+        for t in np.flatnonzero(self.salto):
+            out.append(Issue("salto", int(self.dia[t]), ids[k[t]], ids[k[t] + 1],
+                             float(self.km[t]), self.max_salto_km))
+        if incluir_outliers:
+            for t in np.flatnonzero((self.z > z_limite) & ~self.salto):
+                out.append(Issue("outlier", int(self.dia[t]), ids[k[t]], ids[k[t] + 1],
+                                 float(self.km[t]), float(self.z[t])))
+        return out
+
+    def resumo_dias(self) -> List[Dict]:
+        """Totais por dia: visitas, km e minutos estimados de deslocamento."""
+        return [
+            {"dia": int(d), "visitas": int(n), "km": float(km), "minutos": float(mi)}
+            for d, n, km, mi in zip(self.dias, self.visitas_dia, self.km_dia, self.minutos_dia)
+        ]
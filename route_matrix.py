@@ -0,0 +1,182 @@
+import numpy as np
+
+R_TERRA_KM = 6371.0
+VELOCIDADE_KMH = 40.0   # velocidade média usada para converter km → minutos
+BLOCO_PADRAO = 1024     # linhas por bloco no cálculo da matriz
+
+
+def _as_rad(lats, lons):
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return lat, lon
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Distância haversine em km, vetorizada (aceita escalares ou arrays
+    com broadcasting). Mesma fórmula das antigas funções hav()/haversine().
+    """
+    φ1, λ1 = _as_rad(lat1, lon1)
+    φ2, λ2 = _as_rad(lat2, lon2)
+    h = np.sin((φ2 - φ1) / 2) ** 2 + np.cos(φ1) * np.cos(φ2) * np.sin((λ2 - λ1) / 2) ** 2
+    return R_TERRA_KM * 2 * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def equirect_km(lat1, lon1, lat2, lon2):
+    """
+    Aproximação equiretangular em km (mais barata; precisa para distâncias
+    urbanas/regionais). Também vetorizada.
+    """
+    φ1, λ1 = _as_rad(lat1, lon1)
+    φ2, λ2 = _as_rad(lat2, lon2)
+    x = (λ2 - λ1) * np.cos((φ1 + φ2) / 2)
+    y = φ2 - φ1
+    return R_TERRA_KM * np.hypot(x, y)
+
+
+METODOS = {
+    "haversine": haversine_km,
+    "equirect": equirect_km,
+}
+
+
+def _metodo(nome):
+    try:
+        return METODOS[nome]
+    except KeyError:
+        raise ValueError(f"Método de distância desconhecido: {nome!r} (use {list(METODOS)})")
+
+
+def iter_blocos_km(lats, lons, metodo: str = "haversine", bloco: int = BLOCO_PADRAO):
+    """
+    Gera (inicio, bloco) com as linhas [inicio:inicio+len(bloco)] da matriz
+    de distâncias em km (float32). Útil para entradas muito grandes, em que
+    a matriz completa não cabe na memória.
+    """
+    fn = _metodo(metodo)
+    lat = np.asarray(lats, dtype=np.float64)
+    lon = np.asarray(lons, dtype=np.float64)
+    n = len(lat)
+    for ini in range(0, n, bloco):
+        fim = min(ini + bloco, n)
+        d = fn(lat[ini:fim, None], lon[ini:fim, None], lat[None, :], lon[None, :])
+        yield ini, d.astype(np.float32, copy=False)
+
+
+def matriz_km(lats, lons, metodo: str = "haversine", bloco: int = BLOCO_PADRAO, out=None) -> np.ndarray:
+    """
+    Matriz n×n de distâncias em km (float32), calculada em blocos de linhas.
+    `out` permite passar um array pré-alocado (ex.: np.memmap) para o modo
+    em disco com entradas muito grandes.
+    """
+    n = len(lats)
+    if out is None:
+        out = np.empty((n, n), dtype=np.float32)
+    for ini, d in iter_blocos_km(lats, lons, metodo, bloco):
+        out[ini:ini + len(d)] = d
+    return out
+
+
+def matriz_minutos(lats, lons, velocidade_kmh: float = VELOCIDADE_KMH,
+                   metodo: str = "haversine", bloco: int = BLOCO_PADRAO, out=None) -> np.ndarray:
+    """Matriz n×n de tempos de viagem em minutos (float32)."""
+    n = len(lats)
+    if out is None:
+        out = np.empty((n, n), dtype=np.float32)
+    fator = np.float32(60.0 / velocidade_kmh)
+    for ini, d in iter_blocos_km(lats, lons, metodo, bloco):
+        out[ini:ini + len(d)] = d * fator
+    return out
+
+
+def matriz_metros(lats, lons, metodo: str = "haversine", bloco: int = BLOCO_PADRAO, out=None) -> np.ndarray:
+    """Matriz n×n de distâncias em metros inteiros (int32), formato do OR-Tools."""
+    n = len(lats)
+    if out is None:
+        out = np.empty((n, n), dtype=np.int32)
+    for ini, d in iter_blocos_km(lats, lons, metodo, bloco):
+        out[ini:ini + len(d)] = (d * 1000).astype(np.int32)
+    return out
+
+
+def trechos_km(lats, lons, metodo: str = "haversine") -> np.ndarray:
+    """Distâncias (km) entre pontos consecutivos: len(lats)-1 trechos."""
+    lat = np.asarray(lats, dtype=np.float64)
+    lon = np.asarray(lons, dtype=np.float64)
+    if len(lat) < 2:
+        return np.zeros(0, dtype=np.float64)
+    return _metodo(metodo)(lat[:-1], lon[:-1], lat[1:], lon[1:])
+
+
+
+def insercao_mais_barata(dias, lat: float, lon: float, max_visitas=None):
+    """
+    Posição de menor acréscimo de distância para o ponto (lat, lon), com
+    cada dia ((lats, lons) na ordem de visita) visto como circuito: o
+    último volta ao primeiro. Custo d(a,x) + d(x,b) - d(a,b) para todos os
+    trechos (a, b) de todos os dias de uma vez; nunca antes do 1º ponto,
+    que é a partida do dia. Dias com `max_visitas` pontos ficam de fora;
+    dias vazios só se não houver outro.
+    Retorna (índice do dia, índice de inserção).
+    """
+    dia_idx, pos, lat_a, lon_a, lat_b, lon_b = [], [], [], [], [], []
+    for d, (lats, lons) in enumerate(dias):
+        m = len(lats)
+        if not m or (max_visitas is not None and m >= max_visitas):
+            continue
+        dia_idx += [d] * m
+        pos += range(1, m + 1)
+        lat_a += list(lats)
+        lon_a += list(lons)
+        lat_b += list(lats[1:]) + [lats[0]]
+        lon_b += list(lons[1:]) + [lons[0]]
+    if not dia_idx:
+        vazios = [d for d, (lats, _) in enumerate(dias) if not len(lats)]
+        if not vazios:
+            raise ValueError("Nenhum dia com vaga para inserir o cliente")
+        return vazios[0], 0
+    lat_a, lon_a, lat_b, lon_b = map(np.asarray, (lat_a, lon_a, lat_b, lon_b))
+    delta = (haversine_km(lat_a, lon_a, lat, lon) + haversine_km(lat, lon, lat_b, lon_b)
+             - haversine_km(lat_a, lon_a, lat_b, lon_b))
+    m = int(np.argmin(delta))
+    return dia_idx[m], pos[m]
+
+def empacotar_trechos(trechos, max_locs: int = 50, max_elems: int = 3500):
+    """
+    Agrupa trechos (chave, (lon,lat) origem, (lon,lat) destino) em lotes de
+    matriz ORS: cada lote tem `locations` sem repetição, `sources` e
+    `destinations` como índices nelas, respeitando o número máximo de
+    locais e de elementos (sources × destinations) por requisição.
+    Trechos consecutivos compartilham o ponto do meio, então um lote de
+    L trechos seguidos usa só L+1 locais.
+    """
+    lotes = []
+    atual = None
+    for chave, a, b in trechos:
+        a, b = tuple(a), tuple(b)
+        if atual is not None:
+            idx = atual["_idx"]
+            novos = len({a, b} - idx.keys())
+            n_src = len(atual["_src"]) + (a not in idx or idx[a] not in atual["_src"])
+            n_dst = len(atual["_dst"]) + (b not in idx or idx[b] not in atual["_dst"])
+            if len(atual["locations"]) + novos > max_locs or n_src * n_dst > max_elems:
+                atual = None
+        if atual is None:
+            atual = {"locations": [], "sources": [], "destinations": [], "trechos": [],
+                     "_idx": {}, "_src": set(), "_dst": set()}
+            lotes.append(atual)
+        locs, idx = atual["locations"], atual["_idx"]
+        for p in (a, b):
+            if p not in idx:
+                idx[p] = len(locs)
+                locs.append(list(p))
+        if idx[a] not in atual["_src"]:
+            atual["_src"].add(idx[a])
+            atual["sources"].append(idx[a])
+        if idx[b] not in atual["_dst"]:
+            atual["_dst"].add(idx[b])
+            atual["destinations"].append(idx[b])
+        atual["trechos"].append((chave, idx[a], idx[b]))
+    for lote in lotes:
+        del lote["_idx"], lote["_src"], lote["_dst"]
+    return lotes
@@ -1,49 +1,140 @@
 import math
+
+import numpy as np
 from ortools.constraint_solver import routing_enums_pb2, pywrapcp
 from google.protobuf.duration_pb2 import Duration
 
+from instrumentation import span
+from jornada import SERVICO_PADRAO_S, jornada_s
+from route_matrix import VELOCIDADE_KMH, haversine_km, insercao_mais_barata, matriz_metros
+
+DIA_S = 24 * 3600
+PENALIDADE_NAO_ATENDIDO = 10_000_000   # custo (m) de deixar um cliente fora de todos os dias
+PENALIDADE_ATRASO = 100                # custo (m) por segundo após o fechamento/fim da jornada
+PENALIDADE_VISITA_FALTANTE = 50_000    # custo (m) por visita abaixo do mínimo de um dia
+
 def haversine(a, b):
-    R = 6371  # raio da Terra em km
-    lat1, lon1 = map(math.radians, a)
-    lat2, lon2 = map(math.radians, b)
-    dlat, dlon = lat2 - lat1, lon2 - lon1
-    h = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    return 2 * R * math.asin(math.sqrt(h))
+    """Distância em km entre dois pares (lat, lon)."""
+    return float(haversine_km(a[0], a[1], b[0], b[1]))
+
+def _estatisticas(routing, sol) -> dict:
+    """Números da busca: soluções encontradas, vizinhanças aceitas, custo, tempo."""
+    solver = routing.solver()
+    return {
+        "status": int(routing.status()),
+        "custo": sol.ObjectiveValue() if sol is not None else None,
+        "solucoes": solver.Solutions(),
+        "vizinhos_aceitos": solver.AcceptedNeighbors(),
+        "ramificacoes": solver.Branches(),
+        "falhas": solver.Failures(),
+        "tempo_ms": solver.WallTime(),
+    }
+
+
+def _dimensao_tempo(routing, mgr, clients, M, velocidade_kmh, workday,
+                    service_s=SERVICO_PADRAO_S, fim_rigido=False):
+    """
+    Dimensão "Tempo" em s desde 0h: deslocamento (da mesma matriz M, a
+    `velocidade_kmh`) + atendimento do cliente de origem ("service").
+    Cada veículo sai dentro da jornada `workday` = (início, fim); chegar
+    antes da abertura ("window"[0]) vira espera. Passar do fechamento ou do
+    fim da jornada é penalizado por segundo — ou, com `fim_rigido`, o fim da
+    jornada é obrigatório.
+    """
+    servico = np.array([service_s if c.get("service") is None else c["service"] for c in clients],
+                       dtype=np.int64)
+    T = np.asarray(M, dtype=np.int64) * 36 // int(velocidade_kmh * 10) + servico[:, None]
+    ini, fim = workday
+    # horizonte em que qualquer ordem cabe: um dia longo demais fica caro
+    # (fim da jornada suave), não inviável
+    horizonte = int(max(DIA_S, fim + T.max(axis=1).sum()))
+    routing.AddDimension(routing.RegisterTransitMatrix(T.tolist()), horizonte, horizonte, False, "Tempo")
+    dim = routing.GetDimensionOrDie("Tempo")
+    for v in range(routing.vehicles()):
+        dim.CumulVar(routing.Start(v)).SetRange(ini, fim)
+        if fim_rigido:
+            dim.CumulVar(routing.End(v)).SetMax(fim)
+        else:
+            dim.SetCumulVarSoftUpperBound(routing.End(v), fim, PENALIDADE_ATRASO)
+    for node, c in enumerate(clients):
+        janela = c.get("window")
+        idx = mgr.NodeToIndex(node)
+        if not janela or routing.IsStart(idx):
+            continue
+        dim.CumulVar(idx).SetMin(int(janela[0]))
+        dim.SetCumulVarSoftUpperBound(idx, int(janela[1]), PENALIDADE_ATRASO)
+    return dim
+
+
+def _rota_inicial(routing, mgr, clients, initial_order, start_index, search_params):
+    """
+    Assignment com a ordem `initial_order` (ids), girada para começar no
+    cliente de partida; ids desconhecidos são ignorados e os que faltam vão
+    para o fim. Partindo de uma rota pronta, a busca é uma descida gulosa:
+    para no ótimo local (dezenas de ms) em vez de gastar o tempo todo.
+    """
+    if not initial_order:
+        return None
+    pos = {c["id"]: i for i, c in enumerate(clients)}
+    nos = list(dict.fromkeys(pos[i] for i in initial_order if i in pos))
+    nos += [i for i in range(len(clients)) if i not in set(nos)]
+    k = nos.index(start_index)
+    nos = nos[k + 1:] + nos[:k]
+
+    search_params.local_search_metaheuristic = (
+        routing_enums_pb2.LocalSearchMetaheuristic.GREEDY_DESCENT
+    )
+    routing.CloseModelWithParameters(search_params)
+    return routing.ReadAssignmentFromRoutes([[mgr.NodeToIndex(i) for i in nos]], True)
+
 
 def optimize_route(
     clients,
     strategy: str = "PATH_CHEAPEST_ARC",
     time_limit_ms: int = 1000,
-    start_index: int = 0
-) -> list[str]:
+    start_index: int = 0,
+    return_stats: bool = False,
+    initial_order=None,
+    workday=None,
+    velocidade_kmh: float = VELOCIDADE_KMH
+):
     """
-    clients:       [ {"id":str, "lat":float, "lon":float}, ... ]
+    clients:       [ {"id":str, "lat":float, "lon":float}, ... ] e, opcionais,
+                   "service" (s) e "window" ([abre, fecha] em s desde 0h)
+
     strategy:      FirstSolutionStrategy (string)
     time_limit_ms: tempo máximo de busca local (ms)
     start_index:   índice (0-based) do cliente de partida na lista `clients`
+    return_stats:  também devolve as estatísticas da busca (_estatisticas)
+    initial_order: ids na ordem atual (ex.: a do KML ou a arrastada na tela);
+                   a busca parte dessa rota em vez de construir uma do zero
+                   e para assim que deixa de melhorar
+    workday:       (início, fim) da jornada em s desde 0h. Com ele ou com
+                   alguma "window", a rota respeita horários (_dimensao_tempo);
+                   sem nenhum dos dois, minimiza só a distância
     retorna:       [id1, id2, ...] na ordem ótima, começando em clients[start_index]
+                   (ou (ids, stats) com return_stats)
     """
 
     n = len(clients)
     # Monta matriz de distâncias em metros
-    M = [[0]*n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i == j:
-                continue
-            a = (clients[i]["lat"],  clients[i]["lon"])
-            b = (clients[j]["lat"],  clients[j]["lon"])
-            M[i][j] = int(haversine(a, b) * 1000)
+    with span("matriz"):
+        M = matriz_metros(
+            [c["lat"] for c in clients],
+            [c["lon"] for c in clients]
+        ).tolist()
 
     # Manager com start_index variável
     mgr = pywrapcp.RoutingIndexManager(n, 1, start_index)
     routing = pywrapcp.RoutingModel(mgr)
 
-    transit_cb = routing.RegisterTransitCallback(
-        lambda i, j: M[mgr.IndexToNode(i)][mgr.IndexToNode(j)]
-    )
+    # Matriz registrada no próprio solver: sem callback Python por arco
+    transit_cb = routing.RegisterTransitMatrix(M)
     routing.SetArcCostEvaluatorOfAllVehicles(transit_cb)
 
+    if workday is not None or any(c.get("window") for c in clients):
+        _dimensao_tempo(routing, mgr, clients, M, velocidade_kmh, workday or jornada_s())
+
     # Parâmetros de busca
     search_params = pywrapcp.DefaultRoutingSearchParameters()
     # Estratégia inicial
@@ -60,11 +151,17 @@ def optimize_route(
     dur.FromMilliseconds(time_limit_ms)
     search_params.time_limit.CopyFrom(dur)
 
-    # Resolve
-    sol = routing.SolveWithParameters(search_params)
+    # Resolve (a partir da ordem atual, se houver)
+    with span("ortools", modelo="rota"):
+        inicial = _rota_inicial(routing, mgr, clients, initial_order, start_index, search_params)
+        if inicial is not None:
+            sol = routing.SolveFromAssignmentWithParameters(inicial, search_params)
+        else:
+            sol = routing.SolveWithParameters(search_params)
     if sol is None:
         # Sem solução, retorna ordem original de ids
-        return [c["id"] for c in clients]
+        ids = [c["id"] for c in clients]
+        return (ids, _estatisticas(routing, sol)) if return_stats else ids
 
     # Extrai sequência de IDs
     route = []
@@ -74,4 +171,130 @@ def optimize_route(
         route.append(clients[node]["id"])
         idx = sol.Value(routing.NextVar(idx))
 
+    if return_stats:
+        return route, _estatisticas(routing, sol)
     return route
+
+
+def optimize_days(
+    days,
+    max_visits_per_day: int = None,
+    min_visits_per_day: int = None,
+    workday=None,
+    service_s: int = SERVICO_PADRAO_S,
+    velocidade_kmh: float = VELOCIDADE_KMH,
+    strategy: str = "PARALLEL_CHEAPEST_INSERTION",
+    time_limit_ms: int = 5000,
+    return_stats: bool = False
+):
+    """
+    Resolve o período inteiro como um VRP com um veículo por dia: decide em
+    que dia fica cada cliente e a ordem das visitas numa única busca.
+
+    days:               [[{"id", "lat", "lon"}, ...], ...] — ordem atual de cada
+                        dia; o 1º cliente de cada dia é o seu ponto de partida e
+                        chegada (fica no dia). Dias vazios continuam vazios.
+                        "service" e "window" opcionais, como em optimize_route.
+    max_visits_per_day: capacidade (visitas) por dia; padrão: média + 20%
+    min_visits_per_day: mínimo suave por dia (padrão: média - 20%); cada visita
+                        a menos custa PENALIDADE_VISITA_FALTANTE, para a busca
+                        não esvaziar um dia só porque encurta a distância total
+    workday:            (início, fim) da jornada em s desde 0h (padrão: .env,
+                        jornada.jornada_s); o fim é obrigatório
+    service_s:          atendimento (s) de quem não traz "service"
+    retorna:            [[id, ...], ...] por dia (ou (dias, stats) com
+                        return_stats). Clientes que não cabem em nenhum dia
+                        entram pela inserção mais barata (num dia com vaga, se
+                        houver) e ficam listados em stats["nao_atendidos"]:
+                        o dia deles pode passar da jornada.
+    """
+    ativos = [d for d, pts in enumerate(days) if pts]
+    clients = [c for d in ativos for c in days[d]]
+    n, v = len(clients), len(ativos)
+    saida = [[] for _ in days]
+    if not v:
+        return (saida, {}) if return_stats else saida
+
+    # nó de partida de cada veículo = 1º cliente do dia
+    inicios, k = [], 0
+    for d in ativos:
+        inicios.append(k)
+        k += len(days[d])
+    eh_inicio = np.zeros(n, dtype=bool)
+    eh_inicio[inicios] = True
+
+    with span("matriz"):
+        M = matriz_metros([c["lat"] for c in clients], [c["lon"] for c in clients])
+
+    mgr = pywrapcp.RoutingIndexManager(n, v, inicios, inicios)
+    routing = pywrapcp.RoutingModel(mgr)
+    routing.SetArcCostEvaluatorOfAllVehicles(routing.RegisterTransitMatrix(M.tolist()))
+
+    demanda = routing.RegisterUnaryTransitVector((~eh_inicio).astype(int).tolist())
+    cap = max_visits_per_day or math.ceil((n - v) / v * 1.2)
+    routing.AddDimensionWithVehicleCapacity(demanda, 0, [cap] * v, True, "Visitas")
+    visitas = routing.GetDimensionOrDie("Visitas")
+    piso = min_visits_per_day if min_visits_per_day is not None else math.floor((n - v) / v * 0.8)
+    for veiculo in range(v):
+        visitas.SetCumulVarSoftLowerBound(routing.End(veiculo), piso, PENALIDADE_VISITA_FALTANTE)
+        # sem isto o solver ignora custos (e o mínimo) de um dia que ficou vazio
+        routing.SetVehicleUsedWhenEmpty(True, veiculo)
+    _dimensao_tempo(routing, mgr, clients, M, velocidade_kmh, workday or jornada_s(),
+                    service_s=service_s, fim_rigido=True)
+
+    for node in np.flatnonzero(~eh_inicio):
+        routing.AddDisjunction([mgr.NodeToIndex(int(node))], PENALIDADE_NAO_ATENDIDO)
+
+    search_params = pywrapcp.DefaultRoutingSearchParameters()
+    search_params.first_solution_strategy = getattr(
+        routing_enums_pb2.FirstSolutionStrategy,
+        strategy
+    )
+    search_params.local_search_metaheuristic = (
+        routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+    )
+    dur = Duration()
+    dur.FromMilliseconds(time_limit_ms)
+    search_params.time_limit.CopyFrom(dur)
+
+    # parte da divisão atual; se ela violar capacidade/jornada, do zero
+    with span("ortools", modelo="dias"):
+        routing.CloseModelWithParameters(search_params)
+        rotas = [list(range(ini + 1, ini + len(days[d]))) for ini, d in zip(inicios, ativos)]
+        inicial = routing.ReadAssignmentFromRoutes(
+            [[mgr.NodeToIndex(i) for i in r] for r in rotas], True
+        )
+        if inicial is not None:
+            sol = routing.SolveFromAssignmentWithParameters(inicial, search_params)
+        else:
+            sol = routing.SolveWithParameters(search_params)
+
+    stats = _estatisticas(routing, sol)
+    if sol is None:
+        saida = [[c["id"] for c in pts] for pts in days]
+        return (saida, stats) if return_stats else saida
+
+    nos = []
+    for veiculo in range(v):
+        idx, rota = routing.Start(veiculo), []
+        while not routing.IsEnd(idx):
+            rota.append(mgr.IndexToNode(idx))
+            idx = sol.Value(routing.NextVar(idx))
+        nos.append(rota)
+    # quem o solver deixou de fora entra pela inserção mais barata, de
+    # preferência num dia com vaga; a jornada desses dias não é verificada
+    visitados = np.zeros(n, dtype=bool)
+    visitados[[i for r in nos for i in r]] = True
+    fora = np.flatnonzero(~visitados)
+    for node in fora:
+        dias = [([clients[i]["lat"] for i in r], [clients[i]["lon"] for i in r]) for r in nos]
+        ponto = clients[node]["lat"], clients[node]["lon"]
+        try:
+            veiculo, k = insercao_mais_barata(dias, *ponto, max_visitas=cap + 1)
+        except ValueError:
+            veiculo, k = insercao_mais_barata(dias, *ponto)
+        nos[veiculo].insert(k, int(node))
+    for veiculo, d in enumerate(ativos):
+        saida[d] = [clients[i]["id"] for i in nos[veiculo]]
+    stats["nao_atendidos"] = [clients[i]["id"] for i in fora]
+    return (saida, stats) if return_stats else saida
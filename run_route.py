@@ -1,147 +1,202 @@
-import sys
-import os
+import argparse
 import json
 import math
 import pandas as pd
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Optional
 from collections import defaultdict
 from dotenv import load_dotenv
 
-from openrouteservice import Client as ORSClient
-from openrouteservice.optimization import Job, Vehicle
+from spatial_index import rota_vizinho_mais_proximo
+from day_partition import particionar_dias
+from tour_improvement import METODOS as METODOS_MELHORIA, melhorar_rota
+from day_solvers import SOLVERS, resolver_dias
+from jornada import intersecao
+from export_route_kmlcsv import ROUTE_COLUMNS, tabela_do_df, tabela_rota, write_parquet
+from instrumentation import METRICAS, span
+from processor.client_table import load_clients
+from stop_merge import Paradas, agrupar_paradas, separar_por_janela
 
 load_dotenv()
 
-def gerar_rota(path_csv: str, num_semanas: int = 2) -> Tuple[pd.DataFrame, List[Dict], Dict]:
-    # 1) Carrega e filtra CSV
-    df = pd.read_csv(path_csv)
-    df["clilatitude"]  = pd.to_numeric(df["clilatitude"], errors="coerce")
-    df["clilongitude"] = pd.to_numeric(df["clilongitude"], errors="coerce")
-    df = df.dropna(subset=["codcli","clilatitude","clilongitude", "nomcli"])
-    df = df[(df.clilatitude != 0) & (df.clilongitude != 0)]
-
-    # 2) Lista de clientes
-    clientes = [
-        {
-            "cod_cliente": str(int(r.codcli)),
-            "nome": str(r.nomcli).strip(),
-            "latitude": float(r.clilatitude),
-            "longitude": float(r.clilongitude)
-        }
-        for _, r in df.iterrows()
-    ]
-    n = len(clientes)
+DIAS_SEMANA = ["Segunda-feira","Terça-feira","Quarta-feira","Quinta-feira","Sexta-feira"]
 
-    # 3) Rota global via Haversine + Nearest Neighbor
-    def hav(a, b):
-        R = 6371
-        φ1, φ2 = math.radians(a[0]), math.radians(b[0])
-        dφ = math.radians(b[0] - a[0])
-        dλ = math.radians(b[1] - a[1])
-        h = math.sin(dφ/2)**2 + math.cos(φ1)*math.cos(φ2)*math.sin(dλ/2)**2
-        return R * 2 * math.atan2(math.sqrt(h), math.sqrt(1-h))
-
-    mat = [[0.0]*n for _ in range(n)]
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                a = (clientes[i]["latitude"], clientes[i]["longitude"])
-                b = (clientes[j]["latitude"], clientes[j]["longitude"])
-                mat[i][j] = hav(a, b)/40*60
-
-    unv = set(range(1, n))
-    route = [0]
-    cur = 0
-    while unv:
-        nxt = min(unv, key=lambda j: mat[cur][j])
-        unv.remove(nxt); route.append(nxt); cur = nxt
-
-    # 4) Fatiamento em dias úteis baseado nas semanas escolhidas
-    dias_uteis = num_semanas * 5  # 5 dias úteis por semana
-    por_dia = math.ceil(len(route)/dias_uteis)
-    slices = [route[i*por_dia:(i+1)*por_dia] for i in range(dias_uteis)]
+def montar_agenda(rota_json: List[Dict]) -> Dict:
+    """Agenda {"Semana N": {dia da semana: ["cod - nome", ...]}} dos dias com visitas."""
+    agenda = defaultdict(dict)
+    for day in rota_json:
+        vid, visitas = day["dia"], day["visitas"]
+        if visitas:
+            semana = ((vid - 1) // 5) + 1
+            dia_label = DIAS_SEMANA[(vid - 1) % 5]
+            agenda[f"Semana {semana}"][dia_label] = [f"{v['id']} - {v['nome']}" for v in visitas]  # pode ser só v['id'] se preferir
+    return dict(agenda)
+
+@span("gerar_rota")
+def gerar_rota(
+    path_csv: str,
+    num_semanas: int = 2,
+    melhoria: Optional[str] = None,
+    tempo_melhoria_s: float = 5.0,
+    particao: str = "clusters",
+    max_concorrencia: Optional[int] = None,
+    solver: str = "ors",
+    tempo_dia_ms: int = 1000,
+    agrupar: bool = False,
+    raio_agrupamento_m: Optional[float] = None
+) -> Tuple[pd.DataFrame, List[Dict], Dict]:
+    """
+    path_csv:         caminho do CSV ou arquivo/buffer já aberto (ex.: BytesIO)
+    melhoria:         None, "2opt", "oropt" ou "2opt+oropt" — refinamento da
+                      rota global antes do fatiamento em dias
+    tempo_melhoria_s: orçamento de tempo (s) para o refinamento
+    particao:         "clusters" (padrão: k-means balanceado, dias geográficos)
+                      ou "fatias" (fatias contíguas da rota global, o
+                      comportamento anterior)
+    max_concorrencia: chamadas ORS simultâneas (padrão: ORS_MAX_CONCORRENCIA);
+                      a cota é limitada por ORS_REQ_POR_MIN. Nos solvers locais,
+                      número de processos (padrão: todos os núcleos)
+    solver:           sequenciamento de cada dia: "ors", "ortools" ou "heuristica"
+    tempo_dia_ms:     tempo de busca por dia dos solvers locais
+    agrupar:          roteia clientes na mesma coordenada como uma só parada
+                      (tempo de atendimento somado); na rota eles saem como
+                      visitas consecutivas. Clientes sem horário em comum
+                      ficam em paradas separadas
+    raio_agrupamento_m: agrupa também clientes a até esta distância (m)
+    """
+    # 1) Carrega e filtra CSV (só as colunas usadas, filtros vetorizados)
+    with span("csv"):
+        tabela = load_clients(path_csv)
+
+        # 2) Lista de clientes
+        clientes = tabela.registros()
+    n = len(clientes)
 
-    # 5) Chama ORS Optimization por dia (cada fatia ≤70)
-    ors = ORSClient(key=os.getenv("ORS_API_KEY"))
-    weekdays = ["Segunda-feira","Terça-feira","Quarta-feira","Quinta-feira","Sexta-feira"]
+    # 2b) Paradas: clientes co-localizados viram um único nó (matriz, rota
+    #     global e jobs do ORS), com o tempo de atendimento somado e a janela
+    #     de horário comum aos clientes
+    with span("paradas"):
+        if agrupar:
+            paradas = separar_por_janela(
+                agrupar_paradas(tabela.lat, tabela.lon, raio_m=raio_agrupamento_m),
+                [c["janela"] for c in clientes], tabela.lat, tabela.lon
+            )
+        else:
+            paradas = Paradas(range(n), tabela.lat, tabela.lon)
+        lats, lons = paradas.lat, paradas.lon
+        nos = [
+            {
+                **clientes[m[0]],
+                "servico": sum(clientes[i]["servico"] for i in m),
+                "janela": intersecao(clientes[i]["janela"] for i in m)
+            }
+            for m in paradas.membros
+        ]
+
+    # 3) Rota global via Nearest Neighbor sobre índice espacial (KD-tree)
+    with span("tour_nn"):
+        route = rota_vizinho_mais_proximo(lats, lons)
+    if melhoria:
+        with span("melhoria", metodo=melhoria):
+            route = melhorar_rota(
+                route,
+                lats,
+                lons,
+                metodo=melhoria,
+                tempo_limite_s=tempo_melhoria_s
+            )
 
+    # 4) Divisão em dias úteis baseada nas semanas escolhidas
+    dias_uteis = num_semanas * 5  # 5 dias úteis por semana
+    if particao == "clusters":
+        with span("particao", particao=particao):
+            slices = particionar_dias(
+                lats,
+                lons,
+                route,
+                dias_uteis,
+                pesos=paradas.tamanhos
+            )
+    elif particao == "fatias":
+        por_dia = math.ceil(len(route)/dias_uteis)
+        slices = [route[i*por_dia:(i+1)*por_dia] for i in range(dias_uteis)]
+    else:
+        raise ValueError(f"Partição desconhecida: {particao!r} (use 'clusters' ou 'fatias')")
+
+    # 5) Sequencia cada dia (ORS Optimization ou solver local), em paralelo
+    with span("dias", solver=solver):
+        ordens = resolver_dias(
+            slices, nos,
+            solver=solver,
+            max_concorrencia=max_concorrencia,
+            tempo_ms=tempo_dia_ms
+        )
     rota_json: List[Dict] = []
-    agenda = defaultdict(dict)
-    df_rows = []
 
-    for vid, day in enumerate(slices, start=1):
+    for vid, (day, ordem_dia) in enumerate(zip(slices, ordens), start=1):
         visitas = []
-        if day:
-            # criar jobs
-            jobs = [
-                Job(
-                    id=client_idx+1,
-                    service=300,
-                    amount=[1],
-                    location=(clientes[client_idx]["longitude"], clientes[client_idx]["latitude"])
-                )
-                for client_idx in day
-            ]
-            # veículo único
-            depot = (clientes[day[0]]["longitude"], clientes[day[0]]["latitude"])
-            vehicle = Vehicle(
-                id=vid,
-                profile="driving-car",
-                start=depot,
-                end=depot,
-                capacity=[len(jobs)],
-                time_window=[0, 14*24*3600]
-            )
-
-            res = ors.optimization(jobs=jobs, vehicles=[vehicle])
-
-            # Extrai lista de job-ids dos steps (type=="job")
-            steps = res["routes"][0].get("steps", [])
-            job_steps = [s for s in steps if s.get("type") == "job"]
-            route_jobs = [s["job"] for s in job_steps]
-
-            # Monta visitas na ordem exata
-            for ordem, job_id in enumerate(route_jobs, start=1):
-                client_idx = job_id - 1
-                c = clientes[client_idx]
-                visitas.append({
-                    "id": c["cod_cliente"],
-                    "nome": c["nome"],
-                    "latitude": c["latitude"],
-                    "longitude": c["longitude"]
-                })
-                semana = ((vid - 1) // 5) + 1
-                dia_sem = (vid - 1) % 5 + 1
-                df_rows.append({
-                    "cod": c["cod_cliente"],
-                    "numero_semana": semana,
-                    "dia_semana": dia_sem,
-                    "ordem_visita": ordem
-                })
+        # Monta visitas na ordem exata (cada parada volta a ser seus clientes)
+        for client_idx in paradas.expandir(ordem_dia):
+            c = clientes[client_idx]
+            visitas.append({
+                "id": c["cod_cliente"],
+                "nome": c["nome"],
+                "latitude": c["latitude"],
+                "longitude": c["longitude"]
+            })
 
         rota_json.append({"dia": vid, "visitas": visitas})
 
-        if day:
-            semana = ((vid - 1) // 5) + 1
-            dia_label = weekdays[(vid - 1) % 5]
-            agenda[f"Semana {semana}"][dia_label] = [f"{v['id']} - {v['nome']}" for v in visitas]  # pode ser só v['id'] se preferir
-
-    full_json = {"clientes": clientes, "agenda": dict(agenda)}
-    df_rota = pd.DataFrame(df_rows, columns=["cod","numero_semana","dia_semana","ordem_visita"])
+    with span("agenda"):
+        full_json = {"clientes": clientes, "agenda": montar_agenda(rota_json)}
+        df_rota = pd.DataFrame(tabela_rota(rota_json), columns=ROUTE_COLUMNS, copy=False)
     return df_rota, rota_json, full_json
 
 
 if __name__ == "__main__":
-    if len(sys.argv) not in [2, 3]:
-        print("Uso: python run_route.py caminho/para/arquivo.csv [num_semanas]")
-        sys.exit(1)
-
-    path_csv = sys.argv[1]
-    num_semanas = int(sys.argv[2]) if len(sys.argv) == 3 else 2
-
-    df_rota, rota_json, full_json = gerar_rota(path_csv, num_semanas=num_semanas)
+    parser = argparse.ArgumentParser(description="Gera rota.json e agenda_full.json a partir de um CSV de clientes.")
+    parser.add_argument("path_csv", help="caminho/para/arquivo.csv")
+    parser.add_argument("num_semanas", nargs="?", type=int, default=2)
+    parser.add_argument("--melhoria", choices=METODOS_MELHORIA, default=None,
+                        help="refinamento da rota global (2-opt / Or-opt)")
+    parser.add_argument("--tempo-melhoria", type=float, default=5.0,
+                        help="orçamento de tempo do refinamento, em segundos")
+    parser.add_argument("--particao", choices=["clusters", "fatias"], default="clusters",
+                        help="divisão dos clientes em dias (fatias = fatias iguais da rota global, como antes)")
+    parser.add_argument("--concorrencia", type=int, default=None,
+                        help="chamadas ORS simultâneas / processos dos solvers locais")
+    parser.add_argument("--solver", choices=SOLVERS, default="ors",
+                        help="sequenciamento de cada dia (ors = API; ortools/heuristica = local)")
+    parser.add_argument("--tempo-dia-ms", type=int, default=1000,
+                        help="tempo de busca por dia dos solvers locais")
+    parser.add_argument("--agrupar", action="store_true",
+                        help="junta clientes na mesma coordenada numa só parada")
+    parser.add_argument("--raio-agrupamento", type=float, default=None, metavar="METROS",
+                        help="com --agrupar, junta também clientes a até METROS uns dos outros")
+    parser.add_argument("--parquet", metavar="ARQUIVO", default=None,
+                        help="também grava a tabela da rota em Parquet")
+    parser.add_argument("--metricas", metavar="ARQUIVO", default=None,
+                        help="grava tempos por etapa e chamadas externas (.prom = Prometheus, senão JSON)")
+    args = parser.parse_args()
+
+    df_rota, rota_json, full_json = gerar_rota(
+        args.path_csv,
+        num_semanas=args.num_semanas,
+        melhoria=args.melhoria,
+        tempo_melhoria_s=args.tempo_melhoria,
+        particao=args.particao,
+        max_concorrencia=args.concorrencia,
+        solver=args.solver,
+        tempo_dia_ms=args.tempo_dia_ms,
+        agrupar=args.agrupar,
+        raio_agrupamento_m=args.raio_agrupamento
+    )
     print(df_rota.head(), f"\n✅ Processados: {len(df_rota)} registros.")
     with open("rota.json","w",encoding="utf-8") as f:
         json.dump(rota_json, f, ensure_ascii=False, indent=2)
     with open("agenda_full.json","w",encoding="utf-8") as f:
         json.dump(full_json, f, ensure_ascii=False, indent=2)
+    if args.parquet:
+        write_parquet(rota_json, args.parquet, tabela_do_df(df_rota))
+    if args.metricas:
+        with open(args.metricas, "w", encoding="utf-8") as f:
+            f.write(METRICAS.para_prometheus() if args.metricas.endswith(".prom") else METRICAS.para_json())
@@ -0,0 +1,104 @@
+import math
+import numpy as np
+from scipy.spatial import cKDTree
+
+from route_matrix import R_TERRA_KM
+
+
+def projetar_km(lats, lons, lat_ref: float = None):
+    """
+    Projeção equiretangular de (lat, lon) para (x, y) em km, centrada na
+    latitude média (ou `lat_ref`). Boa o bastante para ordenar vizinhos
+    numa carteira urbana/regional.
+    """
+    lat = np.asarray(lats, dtype=np.float64)
+    lon = np.asarray(lons, dtype=np.float64)
+    if lat_ref is None:
+        lat_ref = float(lat.mean()) if len(lat) else 0.0
+    k = math.pi / 180 * R_TERRA_KM
+    x = lon * k * math.cos(math.radians(lat_ref))
+    y = lat * k
+    return x, y
+
+
+class SpatialIndex:
+    """
+    KD-tree sobre pontos projetados (km) com remoção lógica. As consultas
+    ignoram pontos removidos; quando sobra metade dos pontos a árvore é
+    reconstruída só com os vivos, mantendo cada consulta ~O(log n).
+    """
+
+    K_INICIAL = 8
+
+    def __init__(self, xs, ys):
+        self.pts = np.column_stack([np.asarray(xs, dtype=np.float64),
+                                    np.asarray(ys, dtype=np.float64)])
+        self.vivo = np.ones(len(self.pts), dtype=bool)
+        self.vivos = len(self.pts)
+        self._construir()
+
+    def __len__(self):
+        return self.vivos
+
+    def _construir(self):
+        self._ids = np.flatnonzero(self.vivo)
+        self._arvore = cKDTree(self.pts[self._ids]) if len(self._ids) else None
+
+    def remover(self, i: int):
+        if not self.vivo[i]:
+            return
+        self.vivo[i] = False
+        self.vivos -= 1
+        if self.vivos and self.vivos * 2 < len(self._ids) and len(self._ids) > 64:
+            self._construir()
+
+    def mais_proximo(self, x: float, y: float):
+        """Retorna (id, distância_km) do ponto vivo mais próximo, ou (-1, inf)."""
+        if not self.vivos:
+            return -1, math.inf
+        base = len(self._ids)
+        k = min(self.K_INICIAL, base)
+        while True:
+            d, loc = self._arvore.query((x, y), k=k)
+            d, loc = np.atleast_1d(d), np.atleast_1d(loc)
+            ids = self._ids[loc]
+            ok = self.vivo[ids]
+            if ok.any():
+                j = int(np.argmax(ok))
+                return int(ids[j]), float(d[j])
+            if k == base:
+                return -1, math.inf
+            k = min(k * 4, base)
+
+    def vizinhos(self, k: int) -> np.ndarray:
+        """
+        Matriz n×k (int32) com os k vizinhos mais próximos de cada ponto
+        (todos os pontos, vivos ou não), do mais perto ao mais longe.
+        """
+        n = len(self.pts)
+        k = min(k, n - 1)
+        if k <= 0:
+            return np.zeros((n, 0), dtype=np.int32)
+        _d, loc = cKDTree(self.pts).query(self.pts, k=k + 1)
+        return loc[:, 1:].astype(np.int32)
+
+
+def rota_vizinho_mais_proximo(lats, lons, inicio: int = 0) -> list[int]:
+    """
+    Tour de vizinho mais próximo a partir de `inicio`, usando SpatialIndex
+    em vez de matriz completa. Retorna a lista de índices na ordem de visita.
+    """
+    n = len(lats)
+    if n == 0:
+        return []
+    xs, ys = projetar_km(lats, lons)
+    idx = SpatialIndex(xs, ys)
+    route = [inicio]
+    idx.remover(inicio)
+    cur = inicio
+    for _ in range(n - 1):
+        nxt, _d = idx.mais_proximo(xs[cur], ys[cur])
+        idx.remover(nxt)
+        route.append(nxt)
+        cur = nxt
+    return route
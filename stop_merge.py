@@ -0,0 +1,101 @@
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from jornada import intersecao
+from spatial_index import projetar_km
+
+CASAS_PARADA = 5    # ~1 m: clientes com lat/lon iguais até aqui são a mesma parada
+
+
+class Paradas:
+    """
+    Clientes agrupados em paradas (mesmo prédio/endereço). Cada parada é
+    roteada como um único nó, na coordenada do seu primeiro cliente.
+
+    grupo:   parada de cada cliente (n)
+    membros: índices dos clientes de cada parada, na ordem original
+    lat/lon: coordenada de cada parada
+    """
+
+    __slots__ = ("grupo", "membros", "lat", "lon")
+
+    def __init__(self, grupo, lats, lons):
+        grupo = np.asarray(grupo, dtype=np.int64)
+        ordem = np.argsort(grupo, kind="stable")
+        cortes = np.flatnonzero(np.diff(grupo[ordem])) + 1
+        self.grupo = grupo
+        self.membros = [m.tolist() for m in np.split(ordem, cortes)] if len(grupo) else []
+        primeiro = np.array([m[0] for m in self.membros], dtype=np.int64)
+        self.lat = np.asarray(lats, dtype=np.float64)[primeiro]
+        self.lon = np.asarray(lons, dtype=np.float64)[primeiro]
+
+    def __len__(self):
+        return len(self.membros)
+
+    @property
+    def tamanhos(self) -> np.ndarray:
+        return np.fromiter((len(m) for m in self.membros), dtype=np.int64, count=len(self.membros))
+
+    def expandir(self, ordem) -> list[int]:
+        """Ordem de paradas → ordem de clientes (os de uma parada ficam seguidos)."""
+        return [i for p in ordem for i in self.membros[p]]
+
+
+def _renumerar(rotulo: np.ndarray) -> np.ndarray:
+    """Renumera os grupos pela ordem da primeira aparição (0, 1, 2, ...)."""
+    _, primeiro, inv = np.unique(rotulo, return_index=True, return_inverse=True)
+    posto = np.empty(len(primeiro), dtype=np.int64)
+    posto[np.argsort(primeiro, kind="stable")] = np.arange(len(primeiro))
+    return posto[inv.ravel()]
+
+
+def agrupar_paradas(lats, lons, casas: int = CASAS_PARADA, raio_m: float = None) -> Paradas:
+    """
+    Agrupa clientes co-localizados. Por padrão, pelas coordenadas
+    arredondadas em `casas` decimais; com `raio_m`, une clientes a até
+    `raio_m` metros uns dos outros (componentes conexas — use raios
+    pequenos, pois vizinhos em cadeia caem no mesmo grupo).
+    """
+    lat = np.asarray(lats, dtype=np.float64)
+    lon = np.asarray(lons, dtype=np.float64)
+    n = len(lat)
+    if n == 0:
+        return Paradas(np.zeros(0, dtype=np.int64), lat, lon)
+    if raio_m:
+        xs, ys = projetar_km(lat, lon)
+        pares = cKDTree(np.column_stack([xs, ys])).query_pairs(raio_m / 1000, output_type="ndarray")
+        grafo = coo_matrix((np.ones(len(pares)), (pares[:, 0], pares[:, 1])), shape=(n, n))
+        _, rotulo = connected_components(grafo, directed=False)
+    else:
+        chaves = np.column_stack([np.round(lat, casas), np.round(lon, casas)])
+        _, rotulo = np.unique(chaves, axis=0, return_inverse=True)
+    return Paradas(_renumerar(rotulo), lat, lon)
+
+
+def separar_por_janela(paradas: Paradas, janelas, lats, lons) -> Paradas:
+    """
+    Divide as paradas cujos clientes não têm um horário em comum: cada
+    cliente entra no primeiro subgrupo da parada com que a sua janela
+    (abre, fecha) se cruza, senão abre outro. Assim a janela de toda
+    parada (jornada.intersecao) é cumprível por todos os seus clientes.
+    """
+    grupo = np.empty(len(paradas.grupo), dtype=np.int64)
+    proximo = 0
+    for membros in paradas.membros:
+        subgrupos = []   # [janela comum, rótulo]
+        for i in membros:
+            j = janelas[i]
+            for sub in subgrupos:
+                try:
+                    sub[0] = intersecao([sub[0], j])
+                except ValueError:
+                    continue
+                grupo[i] = sub[1]
+                break
+            else:
+                subgrupos.append([j, proximo])
+                grupo[i] = proximo
+                proximo += 1
+    return Paradas(_renumerar(grupo), lats, lons)
@@ -0,0 +1,66 @@
+import io
+
+import numpy as np
+import pytest
+
+from processor.client_table import load_clients
+
+CSV = """codcli,nomcli,clilatitude,clilongitude
+00123,Padaria,-23.5,-46.6
+456.0,Mercado,-23.6,-46.7
+789,Sem longitude,-23.7,
+790,Lat zero,0,-46.8
+791,Lon zero,-23.8,0
+792,Origem,0,0
+793,Fora de faixa,-123.5,-46.6
+794,,-23.9,-46.9
+"""
+
+
+def _carregar(texto=CSV, **kw):
+    return load_clients(io.StringIO(texto), **kw)
+
+
+def test_zero_qualquer_descarta_lat_ou_lon_zerada():
+    t = _carregar()
+    assert t.cod.tolist() == ["123", "456", "793"]
+    assert t.nome.tolist() == ["Padaria", "Mercado", "Fora de faixa"]
+
+
+def test_zero_ambos_so_descarta_a_origem_e_sem_nome_e_opcional():
+    t = _carregar(zero="ambos", exigir_nome=False)
+    assert t.cod.tolist() == ["123", "456", "790", "791", "793", "794"]
+
+
+def test_faixa_e_opcional():
+    assert "793" not in _carregar(faixa=True).cod.tolist()
+    t = _carregar(faixa=True, zero="ambos", exigir_nome=False)
+    assert (np.abs(t.lat) <= 90).all() and (np.abs(t.lon) <= 180).all()
+
+
+def test_codigo_inteiro_e_o_padrao_do_roteador():
+    assert _carregar().cod.tolist()[:2] == ["123", "456"]
+    with pytest.raises(ValueError):
+        _carregar(CSV + "A-10,Letra,-23.1,-46.1\n")
+
+
+def test_codigo_texto_mantem_zeros_e_letras():
+    t = _carregar(CSV + "A-10,Letra,-23.1,-46.1\n", codigo="texto")
+    assert t.cod.tolist() == ["00123", "456", "793", "A-10"]
+
+
+@pytest.mark.parametrize("linhas,esperado", [
+    # coluna só com números: int, como o pandas leria
+    (["1,a,-23.5,-46.6", "002,b,-23.6,-46.7"], ["1", "2"]),
+    # um código vazio deixa a coluna float: "1.0"
+    (["1,a,-23.5,-46.6", ",b,-23.6,-46.7", "3,c,-23.7,-46.8"], ["1.0", "3.0"]),
+    # algum texto: tudo fica como está no arquivo
+    (["001,a,-23.5,-46.6", "X9,b,-23.6,-46.7"], ["001", "X9"]),
+])
+def test_codigo_inferido_como_o_pandas(linhas, esperado):
+    texto = "codcli,nomcli,clilatitude,clilongitude\n" + "\n".join(linhas) + "\n"
+    assert _carregar(texto, codigo="inferido").cod.tolist() == esperado
+
+
+def test_csv_so_com_cabecalho():
+    assert len(_carregar("codcli,nomcli,clilatitude,clilongitude\n")) == 0
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from day_partition import _atribuir_balanceado, clusters_balanceados, particionar_dias
+from spatial_index import rota_vizinho_mais_proximo
+
+
+def _pontos(n, seed=0):
+    rng = np.random.default_rng(seed)
+    # três "cidades" de tamanhos diferentes: força o balanceamento
+    centros = np.array([[-23.5, -46.6], [-22.9, -47.1], [-23.2, -45.9]])
+    c = rng.choice(3, size=n, p=[0.6, 0.3, 0.1])
+    pts = centros[c] + rng.normal(0, 0.03, size=(n, 2))
+    return pts[:, 0], pts[:, 1]
+
+
+@pytest.mark.parametrize("n,k", [(100, 10), (37, 5), (5, 5), (3, 7)])
+def test_atribuicao_balanceada_pesos_unitarios(n, k):
+    rng = np.random.default_rng(n)
+    D = rng.random((n, k))
+    cap = np.full(k, int(np.ceil(n / k)))
+    rotulo = _atribuir_balanceado(D, cap)
+    assert rotulo.min() >= 0 and rotulo.max() < k
+    cont = np.bincount(rotulo, minlength=k)
+    assert cont.sum() == n and (cont <= cap).all()
+
+
+def test_atribuicao_respeita_capacidade_com_pesos():
+    rng = np.random.default_rng(1)
+    n, k = 60, 4
+    pesos = rng.integers(1, 4, size=n)
+    cap = np.full(k, int(np.ceil(pesos.sum() / k)) + 3)   # folga para o maior peso
+    rotulo = _atribuir_balanceado(rng.random((n, k)), cap, pesos)
+    carga = np.bincount(rotulo, weights=pesos, minlength=k)
+    assert (rotulo >= 0).all()
+    assert carga.sum() == pesos.sum() and (carga <= cap).all()
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n,k", [(200, 10), (53, 5), (11, 10)])
+def test_clusters_com_tamanho_equilibrado(n, k, seed):
+    lats, lons = _pontos(n, seed)
+    cont = np.bincount(clusters_balanceados(lats, lons, k, seed=seed), minlength=k)
+    assert cont.sum() == n
+    assert cont.max() - cont.min() <= 1
+
+
+@pytest.mark.parametrize("n,dias", [(200, 10), (7, 10), (0, 5)])
+def test_particionar_dias_atribui_cada_indice_uma_vez(n, dias):
+    lats, lons = _pontos(n)
+    route = rota_vizinho_mais_proximo(lats, lons) if n else []
+    slices = particionar_dias(lats, lons, route, dias)
+    assert len(slices) == dias
+    assert sorted(i for s in slices for i in s) == list(range(n))
+    tamanhos = [len(s) for s in slices if s]
+    if tamanhos:
+        assert max(tamanhos) - min(tamanhos) <= 1
+
+
+def test_particionar_dias_com_pesos_equilibra_as_visitas():
+    lats, lons = _pontos(120, seed=3)
+    pesos = np.random.default_rng(3).integers(1, 3, size=120)
+    route = rota_vizinho_mais_proximo(lats, lons)
+    slices = particionar_dias(lats, lons, route, 6, pesos=pesos)
+    assert sorted(i for s in slices for i in s) == list(range(120))
+    cap = int(np.ceil(pesos.sum() / 6))
+    assert max(int(pesos[s].sum()) for s in slices) <= cap + pesos.max()
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from day_solvers import costurar, dividir_dia, janelas_trechos
+
+
+def _clientes(n, seed):
+    rng = np.random.default_rng(seed)
+    return [
+        {"latitude": float(-23.55 + rng.uniform(-0.2, 0.2)),
+         "longitude": float(-46.63 + rng.uniform(-0.2, 0.2)),
+         "servico": 300}
+        for _ in range(n)
+    ]
+
+
+@pytest.mark.parametrize("n", [71, 140, 333, 1000])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_dividir_e_costurar_visita_cada_cliente_uma_vez(n, seed):
+    clientes = _clientes(n + 5, seed)
+    day = list(range(5, n + 5))           # índices não começam em 0
+    max_jobs = 70
+    trechos = dividir_dia(day, clientes, max_jobs)
+
+    # cada trecho cabe num pedido do ORS e termina onde o próximo começa
+    assert all(len(t.jobs) <= max_jobs for t in trechos)
+    assert trechos[0].entrada == day[0]
+    assert trechos[-1].saida is None and trechos[-1].fim == day[0]
+    for a, b in zip(trechos, trechos[1:]):
+        assert a.fim == a.saida
+
+    # com os miolos em qualquer ordem, o dia costurado é uma permutação
+    # do dia que começa pelo primeiro cliente
+    rng = np.random.default_rng(seed)
+    ordens = [list(rng.permutation(t.jobs)) for t in trechos]
+    rota = costurar(trechos, ordens)
+    assert rota[0] == day[0]
+    assert sorted(rota) == sorted(day)
+
+
+def test_dia_com_poucos_clientes_vira_um_trecho():
+    clientes = _clientes(10, 0)
+    trechos = dividir_dia(list(range(10)), clientes, 70)
+    assert len(trechos) == 1
+    assert costurar(trechos, [trechos[0].jobs]) == list(range(10))
+
+
+def test_janelas_trechos_fatiam_a_jornada_em_sequencia():
+    clientes = _clientes(300, 3)
+    trechos = dividir_dia(list(range(300)), clientes, 70)
+    janelas = janelas_trechos(trechos, clientes, (8 * 3600, 16 * 3600))
+    assert len(janelas) == len(trechos)
+    assert janelas[0][0] == 8 * 3600 and janelas[-1][1] == 16 * 3600
+    for (_, fim), (ini, _) in zip(janelas, janelas[1:]):
+        assert fim == ini
+    assert all(a < b for a, b in janelas)
@@ -0,0 +1,27 @@
+from instrumentation import Metricas
+
+
+def test_prometheus_escapa_valores_de_rotulo():
+    m = Metricas()
+    m.contar("chamadas", servico="llm", operacao='modelo "x"\\v1\nbeta')
+    texto = m.para_prometheus()
+    assert 'operacao="modelo \\"x\\"\\\\v1\\nbeta"' in texto
+    # cada amostra continua numa linha só
+    linhas = [l for l in texto.splitlines() if l and not l.startswith("#")]
+    assert len(linhas) == 1 and linhas[0].endswith(" 1")
+
+
+def test_span_e_chamada_externa_agregam():
+    m = Metricas()
+    with m.span("etapa", modelo="rota"):
+        pass
+    try:
+        with m.chamada_externa("ors", "matrix") as c:
+            c.bytes = 10
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    snap = m.snapshot()
+    assert {o["nome"] for o in snap["observacoes"]} == {"span", "chamada"}
+    cont = {(c["nome"], c.get("servico")): c["valor"] for c in snap["contadores"]}
+    assert cont[("erros", "ors")] == 1 and cont[("chamadas", "ors")] == 1 and cont[("bytes", "ors")] == 10
@@ -0,0 +1,108 @@
+import io
+
+import pytest
+
+from kml_loader import DiaKML, carregar_kml, parse_kml
+
+KML = """<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2" xmlns:atom="http://www.w3.org/2005/Atom">
+<Document>
+  <name>Rotas</name>
+  <Folder>
+    <name>Semana 1</name>
+    <name>ignorado</name>
+    <Folder>
+      <name>Dia 1</name>
+      <Placemark>
+        <name>001 - Padaria</name>
+        <name>segundo nome</name>
+        <atom:author><atom:name>fulano</atom:name></atom:author>
+        <Point><coordinates>-46.60,-23.50,0</coordinates></Point>
+      </Placemark>
+      <Placemark>
+        <name>002 - Mercado</name>
+        <Point><coordinates> -46.70,-23.60 </coordinates></Point>
+      </Placemark>
+      <Placemark><name>sem coordenada</name></Placemark>
+      <Placemark>
+        <name>003 - Dentro de MultiGeometry</name>
+        <MultiGeometry><Point><coordinates>-46.8,-23.7</coordinates></Point></MultiGeometry>
+      </Placemark>
+      <Folder>
+        <name>Subpasta</name>
+        <Placemark><name>004 - Fundo</name><Point><coordinates>-46.9,-23.8</coordinates></Point></Placemark>
+      </Folder>
+    </Folder>
+    <Folder><name>Dia 2</name></Folder>
+  </Folder>
+  <Folder>
+    <name>Semana 2</name>
+    <Folder>
+      <name>Dia 1</name>
+      <Placemark><name>005 - Farmácia</name><Point><coordinates>-47.0,-22.9,0</coordinates></Point></Placemark>
+    </Folder>
+  </Folder>
+</Document>
+</kml>
+""".encode("utf-8")
+
+
+def test_estrutura_semanas_dias_placemarks():
+    semanas = parse_kml(io.BytesIO(KML))
+    assert list(semanas) == ["Semana_1", "Semana_2"]
+    assert list(semanas["Semana_1"]) == ["Dia_1", "Dia_2"]
+    dia = semanas["Semana_1"]["Dia_1"]
+    assert isinstance(dia, DiaKML)
+    # primeiro <name> vale (como findtext); sem Point direto, o Placemark fica de fora
+    assert list(dia) == [
+        {"name": "001 - Padaria", "lat": -23.5, "lon": -46.6},
+        {"name": "002 - Mercado", "lat": -23.6, "lon": -46.7},
+    ]
+    assert len(semanas["Semana_1"]["Dia_2"]) == 0
+    assert semanas["Semana_2"]["Dia_1"][0]["name"] == "005 - Farmácia"
+    assert dia[0:1] == [dia[0]]
+
+
+def test_tags_fora_do_namespace_kml_sao_ignoradas():
+    sem_ns = KML.replace(b' xmlns="http://www.opengis.net/kml/2.2"', b"")
+    with pytest.raises(ValueError):
+        parse_kml(io.BytesIO(sem_ns))
+
+
+def test_sem_document():
+    with pytest.raises(ValueError):
+        parse_kml(io.BytesIO(b'<kml xmlns="http://www.opengis.net/kml/2.2"><Folder/></kml>'))
+
+
+def test_carregar_kml_usa_cache_e_aceita_latin1():
+    assert carregar_kml(KML) is carregar_kml(KML)
+    latin = KML.replace(b'encoding="UTF-8"', b'encoding="ISO-8859-1"').decode("utf-8").encode("latin1")
+    assert carregar_kml(latin)["Semana_2"]["Dia_1"][0]["name"] == "005 - Farmácia"
+    sem_declaracao = KML.split(b"\n", 1)[1].decode("utf-8").encode("latin1")
+    assert carregar_kml(sem_declaracao)["Semana_2"]["Dia_1"][0]["name"] == "005 - Farmácia"
+
+
+def _findtext_antigo(raw):
+    """O parser que o kml_loader substituiu (DOM + findtext com namespace)."""
+    import xml.etree.ElementTree as ET
+    ns = {"k": "http://www.opengis.net/kml/2.2"}
+    doc = ET.fromstring(raw.decode("utf-8")).find("k:Document", ns)
+    semanas = {}
+    for wk in doc.findall("k:Folder", ns):
+        dias = {}
+        for day in wk.findall("k:Folder", ns):
+            pts = []
+            for pm in day.findall("k:Placemark", ns):
+                nm = (pm.findtext("k:name", namespaces=ns) or "").strip()
+                co = (pm.findtext("k:Point/k:coordinates", namespaces=ns) or "").strip()
+                if nm and co:
+                    lon, lat, *_ = co.split(",")
+                    pts.append({"name": nm, "lat": float(lat), "lon": float(lon)})
+            dias[(day.findtext("k:name", namespaces=ns) or "").strip().replace(" ", "_")] = pts
+        semanas[(wk.findtext("k:name", namespaces=ns) or "").strip().replace(" ", "_")] = dias
+    return semanas
+
+
+def test_mesmo_resultado_do_parser_antigo():
+    novo = parse_kml(io.BytesIO(KML))
+    assert {w: {d: list(v) for d, v in ds.items()} for w, ds in novo.items()} == _findtext_antigo(KML)
@@ -0,0 +1,49 @@
+import pytest
+
+from pipeline import chave_entrada
+
+
+@pytest.mark.parametrize("var,valor", [
+    ("JORNADA_INICIO", "07:00"),
+    ("JORNADA_FIM", "18:00"),
+    ("ORS_MAX_JOBS", "40"),
+    ("ORS_BASE_URL", "http://127.0.0.1:8089"),
+])
+def test_configuracao_do_env_muda_a_chave(monkeypatch, var, valor):
+    for v in ("JORNADA_INICIO", "JORNADA_FIM", "ORS_MAX_JOBS", "ORS_BASE_URL"):
+        monkeypatch.delenv(v, raising=False)
+    antes = chave_entrada(b"codcli\n1\n", num_semanas=2)
+    assert chave_entrada(b"codcli\n1\n", num_semanas=2) == antes
+    monkeypatch.setenv(var, valor)
+    assert chave_entrada(b"codcli\n1\n", num_semanas=2) != antes
+
+
+def test_arquivo_e_parametros_mudam_a_chave():
+    k = chave_entrada(b"a", num_semanas=2)
+    assert chave_entrada(b"b", num_semanas=2) != k
+    assert chave_entrada(b"a", num_semanas=3) != k
+
+
+def test_refazer_ignora_o_cache_e_grava_por_cima(monkeypatch, tmp_path):
+    import pipeline
+    from ors_cache import CacheSQLite
+
+    cache = CacheSQLite(str(tmp_path / "pipeline.sqlite"))
+    chamadas = []
+
+    def gerar_rota(fonte, max_concorrencia=None, **params):
+        chamadas.append(params)
+        return None, [{"dia": 1, "visitas": [{"id": str(len(chamadas))}]}], {"clientes": []}
+
+    monkeypatch.setattr(pipeline, "cache_pipeline", lambda: cache)
+    monkeypatch.setattr(pipeline, "gerar_rota", gerar_rota)
+    monkeypatch.setattr(pipeline, "tabela_do_df", lambda df: None)
+    monkeypatch.setattr(pipeline, "exportar_kml_csv", lambda rota, tabela: (b"kml", b"csv"))
+
+    primeiro = pipeline.processar_csv(b"x", num_semanas=2)
+    assert not primeiro["do_cache"]
+    assert pipeline.processar_csv(b"x", num_semanas=2, max_concorrencia=3)["do_cache"]
+    refeito = pipeline.processar_csv(b"x", num_semanas=2, refazer=True)
+    assert not refeito["do_cache"] and len(chamadas) == 2
+    # o resultado refeito substitui o antigo no cache
+    assert pipeline.processar_csv(b"x", num_semanas=2)["rota_json"] == refeito["rota_json"]
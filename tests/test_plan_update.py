@@ -0,0 +1,90 @@
+import pytest
+
+from plan_update import _melhor_insercao, atualizar_plano, atualizar_rota, inserir_clientes, remover_clientes
+
+
+def _cliente(cod, lat, lon):
+    return {"cod_cliente": cod, "nome": f"Cliente {cod}", "latitude": lat, "longitude": lon,
+            "servico": 300, "janela": None}
+
+
+def _visita(c):
+    return {"id": c["cod_cliente"], "nome": c["nome"], "latitude": c["latitude"], "longitude": c["longitude"]}
+
+
+CLIENTES = [
+    _cliente("1", -23.50, -46.60), _cliente("2", -23.51, -46.61), _cliente("3", -23.52, -46.60),
+    _cliente("4", -22.90, -47.06), _cliente("5", -22.91, -47.07), _cliente("6", -22.92, -47.05),
+]
+ROTA = [
+    {"dia": 1, "visitas": [_visita(c) for c in CLIENTES[:3]]},
+    {"dia": 2, "visitas": [_visita(c) for c in CLIENTES[3:]]},
+    {"dia": 3, "visitas": []},
+]
+
+
+def _ids(rota):
+    return [[v["id"] for v in d["visitas"]] for d in rota]
+
+
+def test_remover_fecha_o_buraco_e_marca_o_dia():
+    rota, afetados = remover_clientes(ROTA, ["2", "999"])
+    assert _ids(rota) == [["1", "3"], ["4", "5", "6"], []]
+    assert afetados == {1}
+    assert _ids(ROTA)[0] == ["1", "2", "3"]          # a rota original não muda
+
+
+def test_remover_a_partida_faz_o_seguinte_virar_partida():
+    rota, afetados = remover_clientes(ROTA, ["4"])
+    assert _ids(rota)[1] == ["5", "6"] and afetados == {2}
+
+
+def test_insercao_vai_para_o_dia_mais_perto_sem_trocar_a_partida():
+    novo = _cliente("7", -22.905, -47.065)
+    d, k = _melhor_insercao(ROTA, novo["latitude"], novo["longitude"])
+    assert d == 1 and k >= 1
+    rota, afetados = inserir_clientes(ROTA, [novo])
+    assert afetados == {2} and rota[1]["visitas"][0]["id"] == "4" and "7" in _ids(rota)[1]
+
+
+def test_dia_lotado_fica_de_fora_e_dia_vazio_so_em_ultimo_caso():
+    novo = _cliente("7", -22.905, -47.065)
+    assert _melhor_insercao(ROTA, novo["latitude"], novo["longitude"], max_visitas=3)[0] == 2
+    cheio = [d for d in ROTA if d["visitas"]]
+    with pytest.raises(ValueError):
+        _melhor_insercao(cheio, novo["latitude"], novo["longitude"], max_visitas=3)
+
+
+@pytest.mark.parametrize("cod", ["2", "3", "5", "6"])
+def test_remover_e_inserir_de_volta_restaura_a_rota(cod):
+    c = next(c for c in CLIENTES if c["cod_cliente"] == cod)
+    rota, _ = remover_clientes(ROTA, [cod])
+    rota, _ = inserir_clientes(rota, [c])
+    assert sorted(sum(_ids(rota), [])) == sorted(sum(_ids(ROTA), []))
+    # volta para o mesmo dia, depois da partida (num circuito de 2 pontos,
+    # as duas posições custam o mesmo)
+    assert [sorted(d) for d in _ids(rota)] == [sorted(d) for d in _ids(ROTA)]
+    assert [d[:1] for d in _ids(rota)] == [d[:1] for d in _ids(ROTA)]
+
+
+def test_mudanca_de_endereco_move_o_cliente():
+    mudou = _cliente("2", -22.915, -47.06)
+    rota, afetados = atualizar_rota(ROTA, [mudou], solver=None)
+    assert "2" not in _ids(rota)[0] and "2" in _ids(rota)[1]
+    assert afetados == [1, 2]
+
+
+def test_atualizar_plano_mantem_clientes_e_agenda():
+    full = {"clientes": CLIENTES, "agenda": {}}
+    df, rota, novo_full = atualizar_plano(full, ROTA, [_cliente("7", -23.505, -46.605)], ["6"], solver=None)
+    cods = [c["cod_cliente"] for c in novo_full["clientes"]]
+    assert "6" not in cods and "7" in cods and len(cods) == 6
+    assert len(df) == 6
+    assert novo_full["agenda"]["Semana 1"]["Segunda-feira"][0] == "1 - Cliente 1"
+
+
+def test_resequenciar_mantem_a_partida_de_cada_dia():
+    rota, _ = atualizar_rota(ROTA, [_cliente("7", -23.505, -46.605)], ["1"], solver="heuristica",
+                             max_concorrencia=1, clientes=CLIENTES)
+    assert _ids(rota)[0][0] == "2"                   # "1" saiu: "2" é a nova partida
+    assert sorted(_ids(rota)[0]) == ["2", "3", "7"]
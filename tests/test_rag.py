@@ -0,0 +1,52 @@
+import pytest
+
+rag = pytest.importorskip("rag")   # importa o cliente do LLM (langchain_groq)
+from route_checks import Issue  # noqa: E402
+
+SALTO = Issue("salto", 1, "a", "b", 150.0, 100.0)
+ORS = Issue("ors", 1, "a", "b", 90.0, 20.0)
+OUTLIER = Issue("outlier", 2, "c", "d", 40.0, 8.0)
+
+
+@pytest.fixture
+def verificador(monkeypatch):
+    monkeypatch.setenv("FEEDBACK_CACHE", "false")
+    monkeypatch.setattr(rag, "_feedback_mem", rag.OrderedDict())
+    v = object.__new__(rag.RouteVerifier)   # sem cliente ORS nem LLM
+    v.usar_templates = True
+    v.chamadas_llm = []
+
+    def llm(issues):
+        v.chamadas_llm.append(list(issues))
+        return f"llm: {len(issues)}"
+    v._llm_feedback = llm
+    return v
+
+
+@pytest.mark.parametrize("issues,vai_ao_llm", [
+    ([SALTO], False),
+    ([ORS], False),
+    ([SALTO, ORS], False),
+    ([OUTLIER], True),
+    ([SALTO, OUTLIER], True),
+])
+def test_so_tipos_sem_template_chegam_ao_llm(verificador, issues, vai_ao_llm):
+    texto = verificador.feedback(issues)
+    assert bool(verificador.chamadas_llm) == vai_ao_llm
+    assert texto.startswith("llm") == vai_ao_llm
+
+
+def test_sem_templates_tudo_vai_ao_llm_uma_vez_por_lista(verificador):
+    verificador.usar_templates = False
+    verificador.feedback([SALTO])
+    verificador.feedback([SALTO])          # mesma lista: vem da memória
+    assert len(verificador.chamadas_llm) == 1
+
+
+def test_memoria_do_feedback_e_limitada(verificador, monkeypatch):
+    monkeypatch.setattr(rag, "FEEDBACK_MEM_MAX", 3)
+    for d in range(5):
+        verificador.feedback([Issue("outlier", d, "c", "d", 40.0, 8.0)])
+    assert len(rag._feedback_mem) == 3
+    verificador.feedback([Issue("outlier", 0, "c", "d", 40.0, 8.0)])   # saiu da LRU
+    assert len(verificador.chamadas_llm) == 6
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+from route_checks import AnaliseRota, Issue, RotaArrays
+from route_matrix import haversine_km
+
+
+def _dia(dia, pontos, prefixo=None):
+    prefixo = prefixo or f"d{dia}"
+    return {"dia": dia, "visitas": [
+        {"id": f"{prefixo}_{i}", "latitude": la, "longitude": lo} for i, (la, lo) in enumerate(pontos)
+    ]}
+
+
+def _km_trechos(pontos):
+    return sum(float(haversine_km(a[0], a[1], b[0], b[1])) for a, b in zip(pontos, pontos[1:]))
+
+
+SP = [(-23.55, -46.63), (-23.56, -46.64), (-23.57, -46.62)]
+RJ = [(-22.90, -43.17), (-22.91, -43.18)]
+BH = [(-19.92, -43.94), (-19.93, -43.95), (-19.94, -43.93), (-19.91, -43.92)]
+
+
+def test_trechos_nao_atravessam_dias_com_numeracao_com_buracos():
+    rota = [_dia(3, SP), _dia(1, RJ), _dia(5, []), _dia(7, BH)]
+    a = AnaliseRota(rota)
+    # 2 + 1 + 0 + 3 trechos; SP→RJ e RJ→BH (> 100 km) não entram
+    assert len(a.km) == 6
+    assert not a.salto.any()
+    resumo = {r["dia"]: r for r in a.resumo_dias()}
+    assert set(resumo) == {1, 3, 7}     # dia sem visitas não aparece
+    assert resumo[3]["km"] == pytest.approx(_km_trechos(SP))
+    assert resumo[1]["km"] == pytest.approx(_km_trechos(RJ))
+    assert resumo[7]["km"] == pytest.approx(_km_trechos(BH))
+    assert [resumo[d]["visitas"] for d in (1, 3, 7)] == [2, 3, 4]
+    assert resumo[3]["minutos"] == pytest.approx(resumo[3]["km"] / 40 * 60)
+
+
+def test_dia_repetido_em_entradas_vizinhas_nao_liga_as_duas():
+    rota = [_dia(2, SP, "a"), _dia(2, RJ, "b")]
+    arr = RotaArrays(rota)
+    assert arr.trecho.tolist() == [0, 1, 3]
+    a = AnaliseRota(rota)
+    assert not a.issues()
+    assert a.resumo_dias() == [{"dia": 2, "visitas": 5, "km": pytest.approx(_km_trechos(SP) + _km_trechos(RJ)),
+                                "minutos": pytest.approx((_km_trechos(SP) + _km_trechos(RJ)) / 40 * 60)}]
+
+
+def test_salto_vira_issue_no_formato_antigo():
+    rota = [_dia(4, [SP[0], RJ[0], RJ[1]])]
+    issues = AnaliseRota(rota).issues()
+    assert len(issues) == 1
+    i = issues[0]
+    assert (i.tipo, i.dia, i.origem, i.destino, i.referencia) == ("salto", 4, "d4_0", "d4_1", 100.0)
+    km = float(haversine_km(*SP[0], *RJ[0]))
+    assert i.valor == pytest.approx(km)
+    assert str(i) == f"Dia 4: salto de {km:.1f} km entre d4_0 e d4_1"
+
+
+def test_outlier_pelo_z_score_robusto():
+    # trechos de ~1, 2, 3, 2, 1, 2 km e um de ~40 km no mesmo dia
+    lat0, lon0 = -23.5, -46.6
+    passos = [1, 2, 3, 2, 1, 2, 40]
+    pontos, lon = [(lat0, lon0)], lon0
+    for km in passos:
+        lon += km / (111.32 * np.cos(np.radians(lat0)))
+        pontos.append((lat0, lon))
+    a = AnaliseRota([_dia(1, pontos)])
+    assert np.argmax(a.z) == len(passos) - 1
+    assert a.z[-1] > 6 > a.z[:-1].max()
+    assert a.issues() == []
+    (i,) = a.issues(incluir_outliers=True)
+    assert (i.tipo, i.origem, i.destino) == ("outlier", "d1_6", "d1_7")
+    assert i.valor == pytest.approx(40, rel=0.01)
+    assert i.referencia == pytest.approx(float(a.z[-1]))
+    assert str(i) == f"Dia 1: trecho atípico de {i.valor:.1f} km entre d1_6 e d1_7 (z={i.referencia:.1f})"
+    # cada dia tem a sua mediana: o mesmo dia deslocado não muda o z
+    b = AnaliseRota([_dia(9, BH), _dia(1, pontos)])
+    np.testing.assert_allclose(b.z[-len(passos):], a.z)
+
+
+def test_mad_zero_nao_gera_outlier():
+    # vai e volta entre dois pontos: trechos idênticos, MAD = 0
+    pontos = [(-23.5, -46.6), (-23.5, -46.59)] * 3
+    a = AnaliseRota([_dia(1, pontos)])
+    assert np.all(a.z == 0)
+    assert a.issues(incluir_outliers=True) == []
+
+
+def test_rota_vazia():
+    a = AnaliseRota([])
+    assert a.issues(incluir_outliers=True) == []
+    assert a.resumo_dias() == []
+
+
+def test_issue_str_ors_e_tipo_generico():
+    assert str(Issue("ors", 2, "a", "b", 75.0, 20.04)) == \
+        "Inconsistência entre a e b: ORS 75.0min vs haversine 20.0min"
+    assert str(Issue("vazio", 3)) == "Dia 3: vazio"
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("ortools")
+
+from route_matrix import insercao_mais_barata  # noqa: E402
+from route_optimizer import optimize_days  # noqa: E402
+
+DIA_INTEIRO = (0, 23 * 3600)
+
+
+def _dias(tamanhos, seed=0, espalhamento=0.05):
+    rng = np.random.default_rng(seed)
+    dias = []
+    for d, n in enumerate(tamanhos):
+        pts = rng.normal(0, espalhamento, size=(n, 2)) + [-23.5, -46.6]
+        dias.append([{"id": f"{d}-{i}", "lat": float(la), "lon": float(lo)} for i, (la, lo) in enumerate(pts)])
+    return dias
+
+
+def _conferir(dias, res):
+    """Cada id sai uma vez, o 1º de cada dia continua nele, dias vazios ficam vazios."""
+    assert sorted(i for d in res for i in d) == sorted(c["id"] for d in dias for c in d)
+    for orig, novo in zip(dias, res):
+        if orig:
+            assert novo[0] == orig[0]["id"]
+        else:
+            assert novo == []
+
+
+def test_respeita_a_capacidade_por_dia():
+    dias = _dias([13, 1, 1, 0, 1])
+    res, stats = optimize_days(dias, max_visits_per_day=3, workday=DIA_INTEIRO,
+                               time_limit_ms=1000, return_stats=True)
+    _conferir(dias, res)
+    assert stats["nao_atendidos"] == []
+    assert all(len(d) - 1 <= 3 for d in res if d)
+
+
+def test_minimo_suave_nao_deixa_dia_vazio():
+    # 1º dia com tudo; os outros só com o ponto de partida, perto da mesma região
+    dias = _dias([16, 1, 1, 1], seed=1)
+    res = optimize_days(dias, max_visits_per_day=8, min_visits_per_day=3,
+                        workday=DIA_INTEIRO, time_limit_ms=1000)
+    _conferir(dias, res)
+    assert all(len(d) - 1 >= 3 for d in res)
+
+
+def test_quem_nao_cabe_na_jornada_entra_pela_insercao_mais_barata():
+    # meia hora de jornada e 5 min de atendimento: no máximo ~5 visitas por dia
+    dias = _dias([12, 2], seed=2, espalhamento=0.01)
+    res, stats = optimize_days(dias, workday=(8 * 3600, 8 * 3600 + 1800), service_s=300,
+                               time_limit_ms=1000, return_stats=True)
+    _conferir(dias, res)
+    assert stats["nao_atendidos"]
+    ids = {c["id"] for d in dias for c in d}
+    assert set(stats["nao_atendidos"]) <= ids
+    # reinserir na mesma ordem, um a um, reproduz a saída (capacidade padrão: 8)
+    coord = {c["id"]: (c["lat"], c["lon"]) for d in dias for c in d}
+    refeito = [[i for i in d if i not in stats["nao_atendidos"]] for d in res]
+    for i in stats["nao_atendidos"]:
+        pts = [([coord[j][0] for j in d], [coord[j][1] for j in d]) for d in refeito]
+        d, k = insercao_mais_barata(pts, *coord[i], max_visitas=9)
+        refeito[d].insert(k, i)
+    assert refeito == res
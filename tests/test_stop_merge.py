@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from jornada import intersecao
+from stop_merge import Paradas, agrupar_paradas, separar_por_janela
+
+# três clientes no mesmo prédio (0, 2, 4), dois noutro (1, 3) e um sozinho (5)
+LATS = [-23.5, -23.6, -23.5, -23.6, -23.5, -23.7]
+LONS = [-46.6, -46.7, -46.6, -46.7, -46.6, -46.8]
+
+
+def test_agrupa_coordenadas_iguais_na_ordem_da_primeira_aparicao():
+    p = agrupar_paradas(LATS, LONS)
+    assert p.grupo.tolist() == [0, 1, 0, 1, 0, 2]
+    assert p.membros == [[0, 2, 4], [1, 3], [5]]
+    assert p.tamanhos.tolist() == [3, 2, 1]
+    assert p.lat.tolist() == [-23.5, -23.6, -23.7]
+
+
+def test_casas_decimais_e_raio():
+    lats = [-23.500000, -23.500004, -23.5003]   # 0 e 1 a ~0,4 m; 2 a ~33 m
+    lons = [-46.6, -46.6, -46.6]
+    assert len(agrupar_paradas(lats, lons)) == 2
+    assert len(agrupar_paradas(lats, lons, raio_m=50)) == 1
+    assert len(agrupar_paradas(lats, lons, raio_m=10)) == 2
+
+
+def test_entrada_vazia():
+    p = agrupar_paradas([], [])
+    assert len(p) == 0 and p.expandir([]) == []
+
+
+def test_expandir_devolve_cada_cliente_uma_vez_com_a_parada_seguida():
+    p = agrupar_paradas(LATS, LONS)
+    assert p.expandir([2, 0, 1]) == [5, 0, 2, 4, 1, 3]
+    assert sorted(p.expandir(range(len(p)))) == list(range(len(LATS)))
+
+
+def test_sem_agrupamento_cada_cliente_e_uma_parada():
+    p = Paradas(range(len(LATS)), LATS, LONS)
+    assert p.expandir(range(len(p))) == list(range(len(LATS)))
+
+
+def test_janelas_sem_intersecao_separam_a_parada():
+    h = 3600
+    janelas = [(8 * h, 12 * h), None, (10 * h, 16 * h), None, (13 * h, 17 * h), None]
+    p = separar_por_janela(agrupar_paradas(LATS, LONS), janelas, LATS, LONS)
+    # 0 e 2 se cruzam (10h–12h); 4 só abre às 13h e vira outra parada
+    assert sorted(map(sorted, p.membros)) == [[0, 2], [1, 3], [4], [5]]
+    for m in p.membros:
+        janela = intersecao(janelas[i] for i in m)
+        assert janela is None or janela[0] <= janela[1]
+
+
+def test_intersecao():
+    assert intersecao([None, None]) is None
+    assert intersecao([(1, 5), None, (3, 9)]) == (3, 5)
+    with pytest.raises(ValueError):
+        intersecao([(1, 2), (3, 4)])
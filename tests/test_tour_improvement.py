@@ -0,0 +1,53 @@
+import time
+
+import numpy as np
+import pytest
+
+from spatial_index import projetar_km, rota_vizinho_mais_proximo
+from tour_improvement import METODOS, melhorar_rota
+
+
+def _instancia(n, seed):
+    rng = np.random.default_rng(seed)
+    return -23.5 + rng.uniform(-0.2, 0.2, n), -46.6 + rng.uniform(-0.2, 0.2, n)
+
+
+def _comprimento(route, lats, lons):
+    """Rota aberta (sem volta ao início), na mesma projeção do refinamento."""
+    xs, ys = projetar_km(lats, lons)
+    r = np.asarray(route)
+    return float(np.hypot(np.diff(xs[r]), np.diff(ys[r])).sum())
+
+
+@pytest.mark.parametrize("metodo", METODOS)
+@pytest.mark.parametrize("n,seed", [(4, 0), (5, 1), (30, 2), (200, 3)])
+def test_permutacao_com_inicio_fixo_e_sem_piorar(metodo, n, seed):
+    lats, lons = _instancia(n, seed)
+    for inicial in (rota_vizinho_mais_proximo(lats, lons),
+                    np.random.default_rng(seed).permutation(n).tolist()):
+        nova = melhorar_rota(inicial, lats, lons, metodo=metodo, tempo_limite_s=2.0)
+        assert sorted(nova) == list(range(n))
+        assert nova[0] == inicial[0]
+        assert _comprimento(nova, lats, lons) <= _comprimento(inicial, lats, lons) + 1e-9
+
+
+def test_rotas_pequenas_voltam_iguais():
+    lats, lons = _instancia(3, 0)
+    assert melhorar_rota([2, 0, 1], lats, lons) == [2, 0, 1]
+
+
+def test_respeita_o_orcamento_de_tempo():
+    lats, lons = _instancia(5000, 4)
+    inicial = np.random.default_rng(4).permutation(5000).tolist()   # longe do ótimo local
+    t = time.perf_counter()
+    nova = melhorar_rota(inicial, lats, lons, tempo_limite_s=0.2)
+    gasto = time.perf_counter() - t
+    assert sorted(nova) == list(range(5000))
+    assert gasto < 0.2 + 1.0      # + montagem das listas de vizinhos
+    assert _comprimento(nova, lats, lons) < _comprimento(inicial, lats, lons)
+
+
+def test_metodo_desconhecido():
+    lats, lons = _instancia(10, 0)
+    with pytest.raises(ValueError):
+        melhorar_rota(list(range(10)), lats, lons, metodo="3opt")
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from route_matrix import empacotar_trechos
+
+
+def _trechos(dias, por_dia, seed=0):
+    rng = np.random.default_rng(seed)
+    trechos = []
+    for d in range(dias):
+        pts = [(float(-46.6 + rng.uniform(-0.1, 0.1)), float(-23.5 + rng.uniform(-0.1, 0.1)))
+               for _ in range(por_dia)]
+        trechos += [((d, i), pts[i], pts[i + 1]) for i in range(por_dia - 1)]
+    return trechos
+
+
+@pytest.mark.parametrize("max_locs,max_elems", [(50, 3500), (10, 30), (3, 4)])
+def test_lotes_respeitam_limites_e_cobrem_todos_os_trechos(max_locs, max_elems):
+    trechos = _trechos(dias=4, por_dia=30)
+    lotes = empacotar_trechos(trechos, max_locs=max_locs, max_elems=max_elems)
+
+    vistos = []
+    for lote in lotes:
+        locs = [tuple(p) for p in lote["locations"]]
+        assert len(locs) <= max_locs
+        assert len(set(locs)) == len(locs)
+        assert len(lote["sources"]) * len(lote["destinations"]) <= max_elems
+        for chave, ia, ib in lote["trechos"]:
+            assert ia in lote["sources"] and ib in lote["destinations"]
+            vistos.append((chave, locs[ia], locs[ib]))
+    # cada trecho aparece uma vez, com as coordenadas certas
+    assert sorted(vistos) == sorted((k, tuple(a), tuple(b)) for k, a, b in trechos)
+
+
+def test_trechos_seguidos_compartilham_o_ponto_do_meio():
+    trechos = _trechos(dias=1, por_dia=20)
+    lotes = empacotar_trechos(trechos)
+    assert len(lotes) == 1
+    assert len(lotes[0]["locations"]) == 20
+
+
+class _ORSInstavel:
+    """distance_matrix falso: lotes com 'ruim' no 1º ponto sempre falham na rede."""
+
+    def __init__(self, falhas_transitorias=0):
+        self.chamadas = 0
+        self.transitorias = falhas_transitorias
+
+    def distance_matrix(self, locations, metrics, sources, destinations):
+        import requests
+        self.chamadas += 1
+        if locations[0][0] > 0:
+            raise requests.exceptions.ConnectionError("sem rede")
+        if self.transitorias:
+            self.transitorias -= 1
+            raise requests.exceptions.Timeout("lento")
+        return {"durations": [[60.0] * len(destinations) for _ in sources]}
+
+
+def _verificador():
+    vr = pytest.importorskip("verificacao_rota")
+    return vr, object.__new__(vr.RouteVerifier)   # sem LLM nem cliente ORS
+
+
+def test_lote_com_erro_de_rede_vira_none_sem_derrubar_os_outros(monkeypatch):
+    vr, verificador = _verificador()
+    monkeypatch.setattr(vr, "MAX_RETRIES", 3)
+    monkeypatch.setattr(vr.time, "sleep", lambda s: None)
+    lotes = [
+        {"locations": [[-46.6, -23.5], [-46.7, -23.6]], "sources": [0], "destinations": [1], "trechos": [("a", 0, 1)]},
+        {"locations": [[10.0, 50.0], [10.1, 50.1]], "sources": [0], "destinations": [1], "trechos": [("b", 0, 1)]},
+    ]
+    ors = _ORSInstavel(falhas_transitorias=1)
+    respostas = verificador._matrizes(lotes, ors)
+    assert respostas[0] == {"durations": [[60.0]]}   # refeito depois do Timeout
+    assert respostas[1] is None                       # esgotou as tentativas
+    assert ors.chamadas == 2 + 3
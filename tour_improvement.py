@@ -0,0 +1,182 @@
+import time
+from collections import deque
+from math import hypot
+
+from spatial_index import SpatialIndex, projetar_km
+
+METODOS = ("2opt", "oropt", "2opt+oropt")
+EPS = 1e-9
+
+
+class _Tour:
+    """
+    Rota aberta (início fixo em t[0], fim livre) em arrays planos:
+    t[i] = nó na posição i, pos[v] = posição do nó v. As distâncias são
+    euclidianas sobre coordenadas projetadas em km.
+    """
+
+    def __init__(self, route, xs, ys):
+        self.t = list(route)
+        self.pos = [0] * len(xs)
+        for i, v in enumerate(self.t):
+            self.pos[v] = i
+        self.xs, self.ys = xs, ys
+        self.n = len(self.t)
+
+    def d(self, a, b):
+        if a is None or b is None:
+            return 0.0
+        return hypot(self.xs[a] - self.xs[b], self.ys[a] - self.ys[b])
+
+    def at(self, i):
+        return self.t[i] if 0 <= i < self.n else None
+
+    def inverter(self, i, j):
+        """Inverte t[i..j] (inclusive) e atualiza pos."""
+        t, pos = self.t, self.pos
+        t[i:j + 1] = t[i:j + 1][::-1]
+        for k in range(i, j + 1):
+            pos[t[k]] = k
+
+    def mover(self, s, e, j, invertido):
+        """Move o segmento t[s..e] para logo depois da posição j (fora do segmento)."""
+        t, pos = self.t, self.pos
+        seg = t[s:e + 1]
+        if invertido:
+            seg.reverse()
+        if j > e:
+            lo, hi = s, j
+            t[lo:hi + 1] = t[e + 1:j + 1] + seg
+        else:
+            lo, hi = j + 1, e
+            t[lo:hi + 1] = seg + t[j + 1:s]
+        for k in range(lo, hi + 1):
+            pos[t[k]] = k
+
+
+def _two_opt_no(tr, a, viz):
+    """Tenta um movimento 2-opt envolvendo o nó `a`. Retorna nós afetados ou None."""
+    d, at, pos = tr.d, tr.at, tr.pos
+    i = pos[a]
+    b = at(i + 1)
+    if b is not None:
+        dab = d(a, b)
+        for c in viz[a]:
+            dac = d(a, c)
+            if dac >= dab:
+                break
+            j = pos[c]
+            if j <= i + 1:
+                continue
+            e = at(j + 1)
+            ganho = dab + d(c, e) - dac - d(b, e)
+            if ganho > EPS:
+                tr.inverter(i + 1, j)
+                return (a, b, c, e)
+    if i >= 1:
+        p = at(i - 1)
+        dpa = d(p, a)
+        for c in viz[a]:
+            dca = d(c, a)
+            if dca >= dpa:
+                break
+            j = pos[c]
+            if j < 1 or j >= i - 1:
+                continue
+            cp = at(j - 1)
+            ganho = d(cp, c) + dpa - d(cp, p) - dca
+            if ganho > EPS:
+                tr.inverter(j, i - 1)
+                return (cp, c, p, a)
+    return None
+
+
+def _or_opt_no(tr, a, viz, max_seg=3):
+    """Tenta mover um segmento de 1..max_seg nós começando em `a` para perto de um vizinho."""
+    d, at, pos = tr.d, tr.at, tr.pos
+    s = pos[a]
+    if s == 0:
+        return None
+    for L in range(1, max_seg + 1):
+        e = s + L - 1
+        if e >= tr.n:
+            break
+        s0, e0 = tr.t[s], tr.t[e]
+        prev, nxt = at(s - 1), at(e + 1)
+        remocao = d(prev, s0) + d(e0, nxt) - d(prev, nxt)
+        if remocao <= EPS:
+            continue
+        for extremo in (s0, e0):
+            for c in viz[extremo]:
+                if d(extremo, c) >= remocao:
+                    break
+                j = pos[c]
+                if s <= j <= e:
+                    continue
+                # arestas candidatas: (c_ant, c) e (c, c_prox)
+                for u, v, ju in ((at(j - 1), c, j - 1), (c, at(j + 1), j)):
+                    if u is None or (s <= ju <= e) or (v is not None and s <= ju + 1 <= e):
+                        continue
+                    base = d(u, v)
+                    custo_f = d(u, s0) + d(e0, v) - base
+                    custo_r = d(u, e0) + d(s0, v) - base
+                    inv = custo_r < custo_f
+                    custo = custo_r if inv else custo_f
+                    if remocao - custo > EPS:
+                        tr.mover(s, e, ju, inv)
+                        return (prev, nxt, u, v, s0, e0)
+    return None
+
+
+def melhorar_rota(
+    route,
+    lats,
+    lons,
+    metodo: str = "2opt+oropt",
+    tempo_limite_s: float = 5.0,
+    k_vizinhos: int = 8
+) -> list[int]:
+    """
+    Melhora uma rota global (lista de índices, início fixo) com 2-opt e/ou
+    Or-opt restritos a listas de k vizinhos, até um ótimo local ou até
+    estourar `tempo_limite_s`. Retorna a nova lista de índices.
+    """
+    if metodo not in METODOS:
+        raise ValueError(f"Método de melhoria desconhecido: {metodo!r} (use {METODOS})")
+    n = len(route)
+    if n < 4:
+        return list(route)
+
+    limite = time.perf_counter() + tempo_limite_s
+    xs, ys = projetar_km(lats, lons)
+    viz = SpatialIndex(xs, ys).vizinhos(k_vizinhos).tolist()
+    tr = _Tour(route, xs.tolist(), ys.tolist())
+
+    movimentos = []
+    if metodo in ("2opt", "2opt+oropt"):
+        movimentos.append(_two_opt_no)
+    if metodo in ("oropt", "2opt+oropt"):
+        movimentos.append(_or_opt_no)
+
+    # fila de nós "ativos" (don't-look bits)
+    fila = deque(tr.t)
+    na_fila = [True] * len(xs)
+    passos = 0
+    while fila:
+        passos += 1
+        if passos % 256 == 0 and time.perf_counter() > limite:
+            break
+        a = fila.popleft()
+        na_fila[a] = False
+        for mov in movimentos:
+            afetados = mov(tr, a, viz)
+            if afetados:
+                for v in afetados:
+                    if v is not None and not na_fila[v]:
+                        na_fila[v] = True
+                        fila.append(v)
+                if not na_fila[a]:
+                    na_fila[a] = True
+                    fila.append(a)
+                break
+    return tr.t
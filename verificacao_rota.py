@@ -1,12 +1,19 @@
 import os
-import math
 import json
 import time
+import random
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import openrouteservice
-from openrouteservice.exceptions import ApiError
+import requests
+from openrouteservice.exceptions import ApiError, HTTPError, Timeout
 from langchain_groq import ChatGroq
 
+from instrumentation import chamada_externa, falha
+from ors_cache import com_cache
+from rate_limit import limitador_ors
+from route_matrix import empacotar_trechos, haversine_km, trechos_km
+
 # Carrega configuração
 load_dotenv()
 ORS_API_KEY       = os.getenv("ORS_API_KEY")
@@ -14,14 +21,21 @@ GROQ_API_KEY      = os.getenv("GROQ_API_KEY")
 MAX_JUMP_KM       = float(os.getenv("MAX_JUMP_KM", 100))
 MAX_TIME_DIFF_MIN = float(os.getenv("MAX_DIFF_MIN", 30))
 WORKING_SPEED_KMH = float(os.getenv("SPEED_KMH", 40))
-REQUEST_DELAY_SEC = float(os.getenv("ORS_DELAY_SEC", 2))
 MAX_RETRIES       = int(os.getenv("ORS_MAX_RETRIES", 5))
 ORS_ENABLED       = os.getenv("ORS_ENABLED", "true").lower() == "true"
+VERIFY_MODE       = os.getenv("VERIFY_MODE", "completo")  # "completo" ou "amostra"
+MATRIX_MAX_LOCS   = int(os.getenv("ORS_MATRIX_MAX_LOCATIONS", 50))
+MATRIX_MAX_ELEMS  = int(os.getenv("ORS_MATRIX_MAX_ELEMENTS", 3500))
+MAX_CONCORRENCIA  = int(os.getenv("ORS_MAX_CONCORRENCIA", 4))
+
+# erros da API e de transporte: o lote é refeito na próxima rodada
+ERROS_ORS = (ApiError, HTTPError, Timeout, requests.exceptions.RequestException)
+
 
 class RouteVerifier:
     def __init__(self):
         # Cliente ORS opcional
-        self.ors = openrouteservice.Client(key=ORS_API_KEY) if (ORS_API_KEY and ORS_ENABLED) else None
+        self.ors = com_cache(openrouteservice.Client(key=ORS_API_KEY)) if (ORS_API_KEY and ORS_ENABLED) else None
         self.cache = {}  # cache para amostras ORS
         # LLM Groq
         self.llm = ChatGroq(
@@ -33,65 +47,134 @@ class RouteVerifier:
     @staticmethod
     def haversine(a, b):
         """Distância em km entre dois pares (lat, lon)."""
-        R = 6371
-        φ1, φ2 = math.radians(a[0]), math.radians(b[0])
-        dφ = math.radians(b[0] - a[0])
-        dλ = math.radians(b[1] - a[1])
-        h = math.sin(dφ/2)**2 + math.cos(φ1)*math.cos(φ2)*math.sin(dλ/2)**2
-        return R * 2 * math.atan2(math.sqrt(h), math.sqrt(1-h))
+        return float(haversine_km(a[0], a[1], b[0], b[1]))
 
     def get_sample_duration(self, dia, visitas):
-        """Consulta ORS apenas para o primeiro par de visitas no dia."""
+        """Duração ORS (s) só do primeiro par de visitas do dia (ou None)."""
         if not self.ors or len(visitas) < 2:
             return None
         key = f"sample_{dia}"
-        if key in self.cache:
-            return self.cache[key]
-        v1, v2 = visitas[0], visitas[1]
-        c1 = [v1['longitude'], v1['latitude']]
-        c2 = [v2['longitude'], v2['latitude']]
-        for attempt in range(1, MAX_RETRIES+1):
-            try:
-                mat = self.ors.distance_matrix(
-                    locations=[c1, c2], metrics=["duration"],
-                    sources=[0], destinations=[1]
-                )
-                sec = mat['durations'][0][0]
-                self.cache[key] = sec
-                time.sleep(REQUEST_DELAY_SEC)
-                return sec
-            except ApiError as e:
+        if key not in self.cache:
+            self.cache[key] = self.get_all_leg_durations(
+                [{"dia": dia, "visitas": visitas[:2]}]
+            ).get((dia, 0))
+        return self.cache[key]
+
+    def _matrizes(self, lotes, ors):
+        """
+        Uma requisição de matriz por lote, em paralelo. Os lotes que falham
+        (erro da API ou de rede) são refeitos em rodadas, com backoff
+        exponencial (com jitter) entre elas; quem esgota as tentativas fica
+        None, sem derrubar os lotes que deram certo. O ritmo das requisições
+        é do limitador do `ors`.
+        """
+        respostas = [None] * len(lotes)
+        pendentes = list(range(len(lotes)))
+        with ThreadPoolExecutor(max_workers=MAX_CONCORRENCIA) as pool:
+            for attempt in range(1, MAX_RETRIES+1):
+                futuros = {
+                    i: pool.submit(
+                        ors.distance_matrix, locations=lotes[i]["locations"], metrics=["duration"],
+                        sources=lotes[i]["sources"], destinations=lotes[i]["destinations"]
+                    )
+                    for i in pendentes
+                }
+                erros = {}
+                for i, fut in futuros.items():
+                    try:
+                        respostas[i] = fut.result()
+                    except ERROS_ORS as e:
+                        erros[i] = e
+                pendentes = list(erros)
+                if not pendentes:
+                    break
                 if attempt == MAX_RETRIES:
-                    print(f"Erro ORS amostra dia {dia}: {e}")
-                    return None
-                time.sleep(REQUEST_DELAY_SEC * attempt)
-        return None
+                    for i, e in erros.items():
+                        falha("ors", "matrix", e, trechos=len(lotes[i]["trechos"]))
+                    break
+                # uma espera por rodada, fora das threads do pool
+                time.sleep(min(30, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0))
+        return respostas
+
+    def get_all_leg_durations(self, rota):
+        """
+        Duração ORS (s) de todos os trechos consecutivos de todos os dias,
+        empacotados em poucas requisições de matriz disparadas em paralelo.
+        Retorna {(dia, i): segundos} para o trecho visitas[i] → visitas[i+1];
+        trechos de lotes que falharam ficam de fora.
+        """
+        if not self.ors:
+            return {}
+        trechos = []
+        for day in rota:
+            visitas = day.get('visitas', [])
+            for i in range(len(visitas) - 1):
+                v1, v2 = visitas[i], visitas[i+1]
+                trechos.append((
+                    (day['dia'], i),
+                    (v1['longitude'], v1['latitude']),
+                    (v2['longitude'], v2['latitude'])
+                ))
+        lotes = empacotar_trechos(trechos, MATRIX_MAX_LOCS, MATRIX_MAX_ELEMS)
+        # cota gasta só nas idas à rede; lotes em cache respondem na hora
+        respostas = self._matrizes(lotes, com_cache(self.ors, limitador_ors()))
+
+        duracoes = {}
+        for lote, mat in zip(lotes, respostas):
+            if mat is None:
+                continue
+            linha = {s: k for k, s in enumerate(lote["sources"])}
+            coluna = {d: k for k, d in enumerate(lote["destinations"])}
+            for chave, ia, ib in lote["trechos"]:
+                sec = mat["durations"][linha[ia]][coluna[ib]]
+                if sec is not None:
+                    duracoes[chave] = sec
+        return duracoes
 
-    def verify(self, rota):
+    def verify(self, rota, modo=None):
+        """
+        modo: "completo" (todos os trechos, em lotes de matriz) ou "amostra"
+              (só o 1º trecho de cada dia). Padrão: VERIFY_MODE do .env.
+        """
+        modo = modo or VERIFY_MODE
         issues = []
+        if modo == "completo":
+            completo = self.get_all_leg_durations(rota)
+        else:
+            # as amostras de todos os dias também vão num lote só
+            amostras = self.get_all_leg_durations(
+                [{"dia": d['dia'], "visitas": d.get('visitas', [])[:2]} for d in rota]
+            )
+            completo = None
         for day in rota:
             visitas = day.get('visitas', [])
-            # calcula amostra ORS
-            sample_sec = self.get_sample_duration(day['dia'], visitas)
+            sample_sec = amostras.get((day['dia'], 0)) if completo is None else None
+            dists = trechos_km(
+                [v['latitude'] for v in visitas],
+                [v['longitude'] for v in visitas]
+            )
             for i in range(len(visitas) - 1):
                 v1, v2 = visitas[i], visitas[i+1]
-                c1 = (v1['latitude'], v1['longitude'])
-                c2 = (v2['latitude'], v2['longitude'])
                 # 1) Haversine
-                dist_km = self.haversine(c1, c2)
+                dist_km = float(dists[i])
                 if dist_km > MAX_JUMP_KM:
                     issues.append(
                         f"Dia {day['dia']}: salto de {dist_km:.1f} km entre {v1['id']} → {v2['id']}"
                     )
                     continue
-                # 2) ORS sample
-                if sample_sec is not None and i == 0:
-                    min_ors = sample_sec / 60
+                # 2) ORS: todos os trechos (modo completo) ou só a amostra
+                if completo is not None:
+                    ors_sec = completo.get((day['dia'], i))
+                else:
+                    ors_sec = sample_sec if i == 0 else None
+                if ors_sec is not None:
+                    min_ors = ors_sec / 60
                     min_hav = dist_km / WORKING_SPEED_KMH * 60
                     diff = abs(min_ors - min_hav)
                     if diff > MAX_TIME_DIFF_MIN:
                         issues.append(
                             f"Dia {day['dia']}: tempo ORS {min_ors:.1f} min vs haversine {min_hav:.1f} min"
+                            + (f" entre {v1['id']} → {v2['id']}" if completo is not None else "")
                         )
         if not issues:
             return "✅ Rota validada sem inconsistências detectadas."
@@ -101,11 +184,14 @@ class RouteVerifier:
             "Você é um assistente especialista em verificação de rotas. "
             "Explique possíveis causas para cada item abaixo e sugira correções." 
         )
-        resp = self.llm.create(messages=[
+        messages = [
             {"role": "system", "content": system},
             {"role": "user",   "content": f"Problemas detectados:\n{summary}"}
-        ])
-        return resp.choices[0].message.content
+        ]
+        with chamada_externa("llm", "groq") as c:
+            resp = self.llm.invoke(messages)
+            c.bytes = len(resp.content.encode("utf-8"))
+        return resp.content
 
 if __name__ == '__main__':
     rota = json.load(open('rota.json','r',encoding='utf-8'))